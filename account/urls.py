@@ -1,9 +1,10 @@
 from django.urls import path
 from account.views import register, password_reset
 from django.contrib.auth import views as auth_view
+from myblog.ratelimit import ratelimit
 
 urlpatterns = [
-    path('login/',auth_view.LoginView.as_view(template_name = 'login.html'), name='login'),
+    path('login/',ratelimit('login')(auth_view.LoginView.as_view(template_name = 'login.html')), name='login'),
     path('logout/',auth_view.LogoutView.as_view(), name = 'logout'),
     path('register/', register, name = 'register'),
     path('password-reset/',password_reset, name='password_reset'),
@@ -2,7 +2,9 @@ from django.shortcuts import render, redirect
 from .forms import RegisterForm
 from django.contrib.auth import login
 from .forms import CustomPasswordResetForm
+from myblog.ratelimit import ratelimit
 
+@ratelimit('register')
 def register(request):
     """
     Views for user registration.
@@ -28,6 +30,7 @@ def register(request):
     }
     return render(request, 'register.html', context)
 
+@ratelimit('password_reset')
 def password_reset(request):
     """
     Views for password reset
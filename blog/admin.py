@@ -1,12 +1,56 @@
 from django.contrib import admin
-from .models import Category, Post, Comment
+from .models import Category, Post, Comment, PostDailyViews
+from .deletion import delete_posts
+from .moderation import moderate_posts
 # Register your models here.
-admin.site.register(Category)
 admin.site.register(Comment)
 
+class CategoryAdmin(admin.ModelAdmin):
+    list_display = ('title', 'slug', 'parent', 'post_count', 'published_count')
+    ordering = ['path']
+
+admin.site.register(Category, CategoryAdmin)
+
 class PostAdmin(admin.ModelAdmin):
     list_display = ('title', 'author', 'views', 'created_at', 'status')
     search_fields = ('author', 'title')
     ordering = ['status']
+    actions = ['approve_posts', 'reject_posts', 'delete_posts_with_comments']
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        # The changelist does not show the body: do not load and decompress it
+        if request.resolver_match and request.resolver_match.url_name == 'blog_post_changelist':
+            queryset = queryset.defer('content')
+        return queryset
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        # Its confirmation page loads every comment of the selected posts
+        actions.pop('delete_selected', None)
+        return actions
+
+    def delete_model(self, request, obj):
+        delete_posts([obj.pk])
+
+    @admin.action(description='Опублікувати вибрані пости')
+    def approve_posts(self, request, queryset):
+        moderate_posts(list(queryset.values_list('pk', flat=True)), 'published')
+
+    @admin.action(description='Відхилити вибрані пости')
+    def reject_posts(self, request, queryset):
+        moderate_posts(list(queryset.values_list('pk', flat=True)), 'rejected')
+
+    @admin.action(description='Видалити вибрані пости з коментарями', permissions=['delete'])
+    def delete_posts_with_comments(self, request, queryset):
+        background = delete_posts(list(queryset.values_list('pk', flat=True)))
+        if background:
+            self.message_user(request, f'Пости з великою кількістю коментарів видаляються у фоні: {len(background)}')
+
+admin.site.register(Post, PostAdmin)
+
+class PostDailyViewsAdmin(admin.ModelAdmin):
+    list_display = ('post', 'day', 'count')
+    ordering = ['-day']
 
-admin.site.register(Post, PostAdmin)
\ No newline at end of file
+admin.site.register(PostDailyViews, PostDailyViewsAdmin)
\ No newline at end of file
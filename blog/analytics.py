@@ -0,0 +1,108 @@
+"""
+Buffered per-day view counters.
+
+Views are counted in process memory and written to PostDailyViews in batches,
+one INSERT ... ON CONFLICT DO UPDATE statement per flush.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.utils import timezone
+
+from .events import post_channel, publish_many
+from .models import Post, PostDailyViews
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_buffer = Counter()
+_last_flush = time.monotonic()
+
+
+def record_view(post_id):
+    """
+    Count one view of the post for the current day.
+
+    The buffer is flushed when it holds VIEWS_FLUSH_THRESHOLD views
+    or VIEWS_FLUSH_INTERVAL seconds have passed since the last flush.
+    """
+    day = timezone.localdate()
+    with _lock:
+        _buffer[(post_id, day)] += 1
+        pending = sum(_buffer.values())
+        elapsed = time.monotonic() - _last_flush
+
+    if pending >= settings.VIEWS_FLUSH_THRESHOLD or elapsed >= settings.VIEWS_FLUSH_INTERVAL:
+        try:
+            flush_views()
+        except DatabaseError:
+            logger.exception("Failed to flush daily views")
+
+
+def flush_views():
+    """
+    Write buffered views to the database.
+
+    Rows of posts deleted since the view was counted are skipped.
+    If the statement fails, the counts are returned to the buffer.
+
+    Returns the number of (post, day) rows written.
+    """
+    global _buffer, _last_flush
+    with _lock:
+        rows, _buffer = _buffer, Counter()
+        _last_flush = time.monotonic()
+
+    if not rows:
+        return 0
+
+    quote = connection.ops.quote_name
+    table = quote(PostDailyViews._meta.db_table)
+    post_table = quote(Post._meta.db_table)
+    values = ', '.join(['(%s, %s::date, %s)'] * len(rows))
+    params = []
+    for (post_id, day), count in rows.items():
+        params.extend([post_id, day, count])
+
+    sql = (
+        f'INSERT INTO {table} ("post_id", "day", "count") '
+        f'SELECT v.post_id, v.day, v.count FROM (VALUES {values}) AS v (post_id, day, count) '
+        f'JOIN {post_table} ON {post_table}."id" = v.post_id '
+        f'ON CONFLICT ("post_id", "day") DO UPDATE SET "count" = {table}."count" + EXCLUDED."count"'
+    )
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+    except DatabaseError:
+        with _lock:
+            _buffer.update(rows)
+        raise
+
+    try:
+        _publish_views({post_id for post_id, day in rows})
+    except DatabaseError:
+        logger.exception("Failed to publish view counts")
+    return len(rows)
+
+
+def _publish_views(post_ids):
+    """
+    Send the current view counts to the live readers, once per flush rather than per view.
+    """
+    views = Post.objects.filter(pk__in = post_ids).values_list('pk', 'views')
+    publish_many((post_channel(pk), {'type': 'views', 'views': count}) for pk, count in views)
+
+
+def _flush_at_exit():
+    try:
+        flush_views()
+    except Exception:
+        logger.exception("Failed to flush daily views at exit")
+
+
+atexit.register(_flush_at_exit)
@@ -0,0 +1,236 @@
+"""
+Read-only JSON API for posts, categories and authors.
+
+Rows go straight from values_list() to JSON without building model instances.
+?fields= selects the columns that are loaded, so content is read only when asked for.
+Lists are paged with an opaque keyset cursor instead of OFFSET, and every response
+carries an ETag of its body, answered with 304 when the client already has it.
+"""
+import base64
+import hashlib
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.http import require_GET
+
+from .models import AuthorStats, Category, Post
+
+# API field name -> ORM lookup
+POST_FIELDS = {
+    'id': 'id',
+    'slug': 'slug',
+    'title': 'title',
+    'content': 'content',
+    'category': 'category__slug',
+    'author': 'author__username',
+    'views': 'views',
+    'created_at': 'created_at',
+    'updated_at': 'updated_at',
+}
+POST_LIST_FIELDS = [name for name in POST_FIELDS if name != 'content']
+# Fields readable only by logged-in users, like detail_post
+PRIVATE_POST_FIELDS = {'content'}
+
+CATEGORY_FIELDS = {
+    'id': 'id',
+    'slug': 'slug',
+    'title': 'title',
+    'parent': 'parent__slug',
+    'post_count': 'published_count',
+}
+
+AUTHOR_FIELDS = {
+    'username': 'user__username',
+    'post_count': 'published_count',
+}
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def api_view(view):
+    """
+    Allow only GET and turn ApiError into a JSON error response.
+    """
+    @require_GET
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except ApiError as error:
+            return JsonResponse({'error': str(error)}, status=error.status)
+    return wrapper
+
+
+def api_response(request, data):
+    """
+    Compact JSON response with an ETag of its body, or 304 when If-None-Match matches it.
+    """
+    body = json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':'), ensure_ascii=False).encode()
+    etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+def requested_fields(request, available, default):
+    """
+    Return the field names of ?fields=a,b (in the order given) or the default ones.
+    """
+    value = request.GET.get('fields')
+    if not value:
+        return list(default)
+    fields = list(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+    unknown = [name for name in fields if name not in available]
+    if unknown or not fields:
+        raise ApiError(f"Невідомі поля: {', '.join(unknown)}. Доступні: {', '.join(available)}")
+    return fields
+
+
+def page_size(request):
+    try:
+        limit = int(request.GET.get('limit', settings.API_PAGE_SIZE))
+    except ValueError:
+        raise ApiError('limit має бути числом')
+    return max(1, min(limit, settings.API_MAX_PAGE_SIZE))
+
+
+def encode_cursor(*values):
+    raw = '|'.join(str(value) for value in values)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, parts):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+    except (ValueError, UnicodeDecodeError):
+        raise ApiError('Некоректний cursor')
+    values = raw.split('|')
+    if len(values) != parts:
+        raise ApiError('Некоректний cursor')
+    return values
+
+
+def rows(queryset, field_map, fields, extra=()):
+    """
+    Select only the requested columns. Extra lookups are fetched after them and returned
+    as a separate tuple per row, e.g. the keys of the cursor.
+    """
+    paths = [field_map[name] for name in fields] + list(extra)
+    results, keys = [], []
+    for row in queryset.values_list(*paths):
+        results.append(dict(zip(fields, row)))
+        keys.append(row[len(fields):])
+    return results, keys
+
+
+def paginated(request, results, keys, limit, cursor_of):
+    """
+    Build the page body. A page that is full links to the next one.
+    """
+    next_url = None
+    if len(results) > limit:
+        results = results[:limit]
+        query = request.GET.copy()
+        query['cursor'] = cursor_of(keys[limit - 1])
+        next_url = f'{request.path}?{query.urlencode()}'
+    return {'results': results, 'next': next_url}
+
+
+@api_view
+def post_list(request):
+    """
+    Published posts, newest first.
+
+    Query parameters:
+        - fields: comma-separated POST_FIELDS, all but content by default
+        - category: category slug
+        - author: author username
+        - limit: page size, at most API_MAX_PAGE_SIZE
+        - cursor: the cursor of the next link of the previous page
+    """
+    fields = requested_fields(request, POST_FIELDS, POST_LIST_FIELDS)
+    if PRIVATE_POST_FIELDS.intersection(fields) and not request.user.is_authenticated:
+        raise ApiError('Потрібно увійти', status=401)
+    limit = page_size(request)
+
+    posts = Post.objects.filter(status = 'published')
+    if request.GET.get('category'):
+        posts = posts.filter(category__slug = request.GET['category'])
+    if request.GET.get('author'):
+        posts = posts.filter(author__username = request.GET['author'])
+    if request.GET.get('cursor'):
+        created_at, pk = decode_cursor(request.GET['cursor'], 2)
+        created_at = parse_datetime(created_at)
+        if created_at is None or not pk.isdigit():
+            raise ApiError('Некоректний cursor')
+        # The created_at bound is a range on the (status, created_at) index, the id breaks ties
+        posts = posts.filter(created_at__lte = created_at).filter(
+            Q(created_at__lt = created_at) | Q(id__lt = int(pk))
+        )
+    posts = posts.order_by('-created_at', '-id')[:limit + 1]
+
+    results, keys = rows(posts, POST_FIELDS, fields, extra=('created_at', 'id'))
+    response = api_response(request, paginated(
+        request, results, keys, limit, lambda key: encode_cursor(key[0].isoformat(), key[1]),
+    ))
+    if PRIVATE_POST_FIELDS.intersection(fields):
+        patch_vary_headers(response, ['Cookie'])
+    return response
+
+
+@api_view
+def post_detail(request, slug):
+    """
+    One published post, with content unless ?fields= says otherwise. Requires login, like detail_post.
+    """
+    if not request.user.is_authenticated:
+        raise ApiError('Потрібно увійти', status=401)
+    fields = requested_fields(request, POST_FIELDS, POST_FIELDS)
+    results, keys = rows(Post.objects.filter(status = 'published', slug = slug), POST_FIELDS, fields)
+    if not results:
+        raise ApiError('Пост не знайдено', status=404)
+    response = api_response(request, results[0])
+    patch_vary_headers(response, ['Cookie'])
+    return response
+
+
+@api_view
+def category_list(request):
+    """
+    All categories by title with the number of published posts.
+    """
+    fields = requested_fields(request, CATEGORY_FIELDS, CATEGORY_FIELDS)
+    results, keys = rows(Category.objects.order_by('title'), CATEGORY_FIELDS, fields)
+    return api_response(request, {'results': results, 'next': None})
+
+
+@api_view
+def author_list(request):
+    """
+    Authors with published posts, paged by user id.
+    """
+    fields = requested_fields(request, AUTHOR_FIELDS, AUTHOR_FIELDS)
+    limit = page_size(request)
+    authors = AuthorStats.objects.filter(published_count__gt = 0)
+    if request.GET.get('cursor'):
+        (pk,) = decode_cursor(request.GET['cursor'], 1)
+        if not pk.isdigit():
+            raise ApiError('Некоректний cursor')
+        authors = authors.filter(user_id__gt = int(pk))
+    authors = authors.order_by('user_id')[:limit + 1]
+
+    results, keys = rows(authors, AUTHOR_FIELDS, fields, extra=('user_id',))
+    return api_response(request, paginated(request, results, keys, limit, lambda key: encode_cursor(key[0])))
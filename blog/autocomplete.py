@@ -0,0 +1,169 @@
+"""
+In-memory prefix index of published post titles for search-as-you-type.
+
+Every published post adds sorted (key, post id) entries: its title from each word
+onwards, so 'orm' finds 'Django ORM tips', and its slug. A query is a bisect to the
+first key starting with the typed prefix and a short scan, without the database.
+
+The index is loaded with one query on first use and kept up to date by the Post
+signals in this process. Posts changed by other processes arrive through the
+invalidation bus (blog/invalidation.py) and are reloaded with one query before
+the next search. The index is also reloaded after AUTOCOMPLETE_MAX_AGE seconds,
+in case a message was missed.
+"""
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.conf import settings
+
+from .invalidation import ensure_listening, listen
+from .models import Post
+
+WORD = re.compile(r'\w+')
+# Entries looked at per query: a one-letter prefix may match thousands of them
+MAX_SCANNED = 200
+
+
+def normalize(text):
+    return ' '.join(WORD.findall(text.casefold()))
+
+
+def entry(title, slug):
+    """
+    Return the index keys of a post and the key of its whole title.
+    """
+    title_key = normalize(title)
+    words = title_key.split(' ')
+    keys = {' '.join(words[index:]) for index in range(len(words)) if words[index]}
+    keys.add(slug.casefold())
+    return keys, title_key
+
+
+class PrefixIndex:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = []
+        # post id -> (title, slug, keys, title key)
+        self.posts = {}
+        self.loaded_at = None
+        # Ids of posts changed by other processes since the last search
+        self.pending = set()
+
+    def load_if_stale(self):
+        """
+        Reload the index when it is stale. Other threads wait for the reload instead of
+        running the same query, and a post added by a signal meanwhile is not overwritten.
+        """
+        if not self.is_stale():
+            return False
+        with self.lock:
+            if not self.is_stale():
+                return False
+            entries, posts = [], {}
+            for pk, title, slug in Post.objects.filter(status='published').values_list('pk', 'title', 'slug').iterator():
+                keys, title_key = entry(title, slug)
+                posts[pk] = (title, slug, keys, title_key)
+                entries.extend((key, pk) for key in keys)
+            entries.sort()
+            self.entries, self.posts, self.loaded_at = entries, posts, time.monotonic()
+            self.pending = set()
+        return True
+
+    def is_stale(self):
+        return self.loaded_at is None or time.monotonic() - self.loaded_at > settings.AUTOCOMPLETE_MAX_AGE
+
+    def changed(self, pks):
+        """
+        Mark posts changed elsewhere, or the whole index with None.
+        """
+        with self.lock:
+            if pks is None:
+                self.loaded_at = None
+            else:
+                self.pending.update(pks)
+
+    def refresh(self):
+        """
+        Reload the posts marked by changed() with one query.
+        """
+        with self.lock:
+            pks, self.pending = self.pending, set()
+        if not pks:
+            return
+        published = {}
+        for pk, title, slug in Post.objects.filter(pk__in=pks, status='published').values_list('pk', 'title', 'slug'):
+            published[pk] = (title, slug)
+        for pk in pks:
+            if pk in published:
+                self.add(pk, *published[pk])
+            else:
+                self.remove(pk)
+
+    def add(self, pk, title, slug):
+        keys, title_key = entry(title, slug)
+        with self.lock:
+            self._remove(pk)
+            self.posts[pk] = (title, slug, keys, title_key)
+            for key in keys:
+                insort(self.entries, (key, pk))
+
+    def remove(self, pk):
+        with self.lock:
+            self._remove(pk)
+
+    def _remove(self, pk):
+        post = self.posts.pop(pk, None)
+        if post is None:
+            return
+        for key in post[2]:
+            index = bisect_left(self.entries, (key, pk))
+            if index < len(self.entries) and self.entries[index] == (key, pk):
+                del self.entries[index]
+
+    def search(self, query, limit):
+        """
+        Return up to limit (title, slug) pairs, titles starting with the query first.
+        """
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        found = {}
+        with self.lock:
+            entries = self.entries
+            index = bisect_left(entries, (prefix,))
+            for key, pk in entries[index:index + MAX_SCANNED]:
+                if not key.startswith(prefix):
+                    break
+                title, slug, keys, title_key = self.posts[pk]
+                found[pk] = min(found.get(pk, (True, title)), (key != title_key, title))
+            ranked = sorted(found, key=found.get)[:limit]
+            return [self.posts[pk][:2] for pk in ranked]
+
+
+index = PrefixIndex()
+listen('post', index.changed)
+
+
+def suggest(query, limit=None):
+    ensure_listening()
+    if not index.load_if_stale():
+        index.refresh()
+    return index.search(query, limit or settings.AUTOCOMPLETE_LIMIT)
+
+
+def post_changed(pk, title, slug, status):
+    """
+    Update the index after a post is saved. Not loaded yet means nothing to update.
+    """
+    if index.loaded_at is None:
+        return
+    if status == 'published':
+        index.add(pk, title, slug)
+    else:
+        index.remove(pk)
+
+
+def post_deleted(pk):
+    index.remove(pk)
@@ -0,0 +1,119 @@
+"""
+Shared page cache for the public pages.
+
+Cached pages are keyed on a generation number stored in the cache.
+Bumping the generation invalidates every cached page at once without
+scanning keys. The category tree of the navigation is rendered in a fragment of
+base.html keyed on the same generation.
+
+A process-local cache backend (LocMemCache) keeps a generation per process:
+changes made in other processes bump it through the bus.
+"""
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils.cache import has_vary_header, patch_cache_control
+from django.views.decorators.cache import cache_page
+
+from myblog.compression import compress_response, negotiate_encoding
+
+from .invalidation import ensure_listening, listen
+
+GENERATION_KEY = 'page_cache:generation'
+
+
+def get_generation():
+    """
+    Return the current page cache generation.
+
+    A missing key is recreated from the clock, so a generation evicted
+    from the cache never comes back with an old value.
+    """
+    ensure_listening()
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        cache.add(GENERATION_KEY, time.time_ns(), None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def invalidate_pages():
+    """
+    Drop every cached page by moving to the next generation.
+    """
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, time.time_ns(), None)
+
+
+def _changed_elsewhere(keys):
+    # A shared cache was already bumped by the process making the change
+    if isinstance(caches[DEFAULT_CACHE_ALIAS], LocMemCache):
+        invalidate_pages()
+
+
+listen('post', _changed_elsewhere)
+listen('category', _changed_elsewhere)
+
+
+def public_page(view):
+    """
+    Cache a page once for everyone.
+
+    The view and its templates must not depend on the current user:
+    the per-user header is loaded separately from the user_header view.
+    Responses that vary on Cookie are stored but never marked public.
+    Pages are stored minified and compressed, one entry per content coding.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        timeout = settings.PAGE_CACHE_TIMEOUT
+        if not timeout:
+            return view(request, *args, **kwargs)
+
+        def compressed_view(request, *args, **kwargs):
+            return compress_response(request, view(request, *args, **kwargs))
+
+        # Before the cache lookup: the key includes the normalized Accept-Encoding
+        negotiate_encoding(request)
+        key_prefix = f'page:{get_generation()}'
+        response = cache_page(timeout, key_prefix=key_prefix)(compressed_view)(request, *args, **kwargs)
+
+        if not has_vary_header(response, 'Cookie'):
+            patch_cache_control(response, public=True, max_age=timeout)
+        return response
+    return wrapper
+
+
+def _sum_subtrees(nodes):
+    for node in nodes:
+        node['subcategories'].sort(key=lambda child: child['pk'])
+        node['published_count'] += _sum_subtrees(node['subcategories'])
+    return sum(node['published_count'] for node in nodes)
+
+
+def category_tree():
+    """
+    Return the top-level categories as nested dicts with title, slug, subcategories
+    and published_count, which includes the posts of the subcategories.
+
+    Not cached here: the nav fragment of base.html that renders it is.
+    """
+    from .models import Category
+
+    nodes, roots = {}, []
+    # Ordered by path: a parent always comes before its subcategories
+    rows = Category.objects.order_by('path').values_list('pk', 'parent_id', 'title', 'slug', 'published_count')
+    for pk, parent_id, title, slug, published_count in rows:
+        node = nodes[pk] = {
+            'pk': pk, 'title': title, 'slug': slug, 'published_count': published_count, 'subcategories': [],
+        }
+        parent = nodes.get(parent_id)
+        (parent['subcategories'] if parent else roots).append(node)
+    roots.sort(key=lambda node: node['pk'])
+    _sum_subtrees(roots)
+    return roots
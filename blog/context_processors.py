@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+
+from .cache import category_tree, get_generation
+from .models import MonthlyPostCount
+
+
+def navigation(request):
+    """
+    Context for the cached fragments of base.html and the post cards.
+
+    Values are lazy: when the nav fragment is served from the cache,
+    the categories are never queried.
+
+    Context:
+        - categories: tree of the categories for the navigation, see blog.cache.category_tree
+        - archive_months: months with published posts, newest first, for the archive sidebar
+        - page_generation: page cache generation, changes whenever a post or category changes
+        - fragment_cache_timeout: timeout of the {% cache %} fragments
+    """
+    return {
+        'categories': SimpleLazyObject(category_tree),
+        'archive_months': SimpleLazyObject(
+            lambda: list(MonthlyPostCount.objects.filter(published_count__gt=0).order_by('-month'))
+        ),
+        'page_generation': SimpleLazyObject(get_generation),
+        'fragment_cache_timeout': settings.FRAGMENT_CACHE_TIMEOUT,
+    }
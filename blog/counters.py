@@ -0,0 +1,98 @@
+"""
+Denormalized post counters.
+
+Category.post_count / published_count and AuthorStats are changed with F()
+updates only, one statement per affected category or author, so reading a
+count never needs a GROUP BY over Post. MonthlyPostCount is changed the same
+way, one upsert per affected month.
+"""
+from collections import Counter, defaultdict
+
+from django.db import connection
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import AuthorStats, Category, MonthlyPostCount
+
+
+def _deltas(changes):
+    categories = defaultdict(lambda: [0, 0])
+    authors = defaultdict(lambda: [0, 0])
+    for previous, current in changes:
+        for state, sign in ((previous, -1), (current, 1)):
+            if state is None:
+                continue
+            category_id, author_id, status = state
+            published = sign if status == 'published' else 0
+            categories[category_id][0] += sign
+            categories[category_id][1] += published
+            authors[author_id][0] += sign
+            authors[author_id][1] += published
+
+    def non_zero(deltas):
+        return {key: value for key, value in deltas.items() if value != [0, 0]}
+    return non_zero(categories), non_zero(authors)
+
+
+def apply_post_changes(changes):
+    """
+    Update the counters for a batch of post changes.
+
+    Each change is a (previous, current) pair of (category_id, author_id, status)
+    tuples; previous is None for a new post and current is None for a deleted one.
+    """
+    categories, authors = _deltas(changes)
+
+    for category_id, (posts, published) in categories.items():
+        Category.objects.filter(pk=category_id).update(
+            post_count=Greatest(F('post_count') + posts, 0),
+            published_count=Greatest(F('published_count') + published, 0),
+        )
+
+    for author_id, (posts, published) in authors.items():
+        if posts > 0 or published > 0:
+            _upsert_author(author_id, posts, published)
+        else:
+            # The row exists while the author has posts. Never insert here:
+            # this also runs while the author is being deleted.
+            AuthorStats.objects.filter(user_id=author_id).update(
+                post_count=Greatest(F('post_count') + posts, 0),
+                published_count=Greatest(F('published_count') + published, 0),
+            )
+
+
+def _upsert_author(author_id, posts, published):
+    table = connection.ops.quote_name(AuthorStats._meta.db_table)
+    sql = (
+        f'INSERT INTO {table} ("user_id", "post_count", "published_count") '
+        f'VALUES (%s, GREATEST(%s, 0), GREATEST(%s, 0)) '
+        f'ON CONFLICT ("user_id") DO UPDATE SET '
+        f'"post_count" = GREATEST({table}."post_count" + %s, 0), '
+        f'"published_count" = GREATEST({table}."published_count" + %s, 0)'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [author_id, posts, published, posts, published])
+
+
+def month_of(created_at):
+    return timezone.localdate(created_at).replace(day=1)
+
+
+def apply_month_changes(changes):
+    """
+    Update MonthlyPostCount for a batch of (created_at, delta) changes of published posts.
+    """
+    months = Counter()
+    for created_at, delta in changes:
+        months[month_of(created_at)] += delta
+
+    table = connection.ops.quote_name(MonthlyPostCount._meta.db_table)
+    sql = (
+        f'INSERT INTO {table} ("month", "published_count") VALUES (%s, GREATEST(%s, 0)) '
+        f'ON CONFLICT ("month") DO UPDATE SET "published_count" = GREATEST({table}."published_count" + %s, 0)'
+    )
+    with connection.cursor() as cursor:
+        for month, delta in sorted(months.items()):
+            if delta:
+                cursor.execute(sql, [month, delta, delta])
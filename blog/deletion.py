@@ -0,0 +1,125 @@
+"""
+Deletion of posts with many comments.
+
+Comments are deleted by post_id in chunks of POST_DELETE_CHUNK rows, every chunk
+in its own short transaction when called outside of one, so no comment is loaded
+into memory and no lock is held on all of them at once. Post.delete() then finds
+no comments left and deletes the post, updating the counters and caches through
+its signals.
+
+Posts with more than POST_DELETE_BACKGROUND_COMMENTS comments are hidden at once
+with the 'deleting' status, set with one UPDATE like blog.moderation does, and
+deleted in a background thread after the request.
+Posts left in that status by a stopped process are finished by the
+purge_deleted_posts command.
+"""
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.db.models import Count
+
+from . import autocomplete
+from .cache import invalidate_pages
+from .counters import apply_month_changes, apply_post_changes
+from .invalidation import invalidate
+from .models import Comment, CommentNotification, Post
+
+logger = logging.getLogger(__name__)
+
+# The notifications of the chunk go in the same statement: the database does not cascade
+DELETE_COMMENTS = f"""
+    WITH chunk AS (
+        SELECT id FROM {Comment._meta.db_table} WHERE post_id = %s ORDER BY id LIMIT %s
+    ), notifications AS (
+        DELETE FROM {CommentNotification._meta.db_table} WHERE comment_id IN (SELECT id FROM chunk)
+    )
+    DELETE FROM {Comment._meta.db_table} WHERE id IN (SELECT id FROM chunk)
+"""
+
+
+def delete_comments(post_id, chunk=None):
+    """
+    Delete the comments of a post chunk by chunk. Returns the number of deleted comments.
+    """
+    chunk = chunk or settings.POST_DELETE_CHUNK
+    deleted = 0
+    while True:
+        # Outside of a transaction every chunk commits on its own
+        with connection.cursor() as cursor:
+            cursor.execute(DELETE_COMMENTS, [post_id, chunk])
+            count = cursor.rowcount
+        deleted += count
+        if count < chunk:
+            return deleted
+
+
+def purge_post(post_id):
+    """
+    Delete the comments of a post in chunks, then the post.
+    """
+    delete_comments(post_id)
+    post = Post.objects.filter(pk=post_id).first()
+    if post is not None:
+        post.delete()
+
+
+def _purge_in_background(post_ids):
+    try:
+        for post_id in post_ids:
+            try:
+                purge_post(post_id)
+            except Exception:
+                logger.exception("Failed to delete post %s", post_id)
+    finally:
+        connections.close_all()
+
+
+def hide_posts(post_ids):
+    """
+    Give posts the 'deleting' status with one UPDATE, without the save signals:
+    there is nothing to recompute for posts about to be deleted.
+    """
+    with transaction.atomic():
+        rows = list(
+            Post.objects.filter(pk__in=post_ids).exclude(status='deleting').select_for_update()
+            .values_list('pk', 'category_id', 'author_id', 'status', 'created_at')
+        )
+        Post.objects.filter(pk__in=[row[0] for row in rows]).update(status='deleting')
+        apply_post_changes(
+            ((category_id, author_id, status), (category_id, author_id, 'deleting'))
+            for _, category_id, author_id, status, _ in rows
+        )
+        apply_month_changes((created_at, -1) for _, _, _, status, created_at in rows if status == 'published')
+    invalidate_pages()
+    invalidate('post', post_ids)
+    # Dropped from the suggestions of this process before the next search
+    autocomplete.index.changed(post_ids)
+
+
+def delete_posts(post_ids):
+    """
+    Delete posts with their comments.
+
+    Posts with few comments are deleted before returning. The others get the
+    'deleting' status, so they disappear from the pages at once, and are deleted
+    in a background thread once the current transaction commits.
+
+    Returns the list of post ids deleted in the background.
+    """
+    comment_counts = dict(
+        Comment.objects.filter(post_id__in=post_ids).values('post_id').annotate(count=Count('id'))
+        .values_list('post_id', 'count')
+    )
+    background = [pk for pk in post_ids if comment_counts.get(pk, 0) > settings.POST_DELETE_BACKGROUND_COMMENTS]
+    for pk in post_ids:
+        if pk not in background:
+            purge_post(pk)
+
+    if background:
+        hide_posts(background)
+        transaction.on_commit(lambda: threading.Thread(
+            target=_purge_in_background, args=(background,), name='blog-post-deletion', daemon=True,
+        ).start())
+    return background
@@ -0,0 +1,247 @@
+"""
+Live events for readers of a post: new comments and view counts.
+
+Events are published to a channel per post ('post-<id>'). With the 'postgres'
+backend they are sent with NOTIFY, and one listener thread per process receives
+them with LISTEN and hands them to the local subscribers. The 'local' backend
+only delivers within the process (tests, a single-process server).
+
+Subscribers are asyncio queues of the SSE connections served by myblog/asgi.py.
+Delivery costs one call_soon_threadsafe per event loop, not per subscriber.
+Handlers are plain callables for other in-process consumers, like the cache
+invalidation of blog/invalidation.py; they run in the thread that dispatches.
+"""
+import asyncio
+import json
+import logging
+import os
+import select
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection, connections
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = 'blog_events'
+# Postgres rejects NOTIFY payloads of 8000 bytes or more
+MAX_PAYLOAD = 7900
+SUBSCRIBER_QUEUE_SIZE = 100
+
+_lock = threading.Lock()
+# channel -> {queue: event loop of the connection}
+_subscribers = defaultdict(dict)
+# channel -> callables
+_handlers = defaultdict(list)
+_listener = None
+
+
+def post_channel(post_id):
+    return f'post-{post_id}'
+
+
+def subscribe(channel):
+    """
+    Return a queue receiving the events of the channel, for the running event loop.
+    """
+    queue = asyncio.Queue(SUBSCRIBER_QUEUE_SIZE)
+    with _lock:
+        _subscribers[channel][queue] = asyncio.get_running_loop()
+    if settings.LIVE_EVENTS_BACKEND == 'postgres':
+        ensure_listener()
+    return queue
+
+
+def add_handler(channel, handler):
+    """
+    Call handler(data) for every event of the channel received by this process.
+
+    Handlers are also called with None when the postgres listener (re)connects:
+    events sent while it was disconnected are lost. Handlers must be quick and thread-safe.
+    """
+    with _lock:
+        _handlers[channel].append(handler)
+
+
+def unsubscribe(channel, queue):
+    with _lock:
+        _subscribers[channel].pop(queue, None)
+        if not _subscribers[channel]:
+            del _subscribers[channel]
+
+
+def _deliver(items):
+    for queue, data in items:
+        try:
+            queue.put_nowait(data)
+        except asyncio.QueueFull:
+            # A client that does not read its stream misses events, it catches up on reconnect
+            pass
+
+
+def dispatch(events):
+    """
+    Hand (channel, data) events to the subscribers of this process. Safe to call from any thread.
+    """
+    by_loop = defaultdict(list)
+    calls = []
+    with _lock:
+        for channel, data in events:
+            for queue, loop in _subscribers.get(channel, {}).items():
+                by_loop[loop].append((queue, data))
+            calls.extend((handler, data) for handler in _handlers.get(channel, ()))
+    for handler, data in calls:
+        _call(handler, data)
+    for loop, items in by_loop.items():
+        try:
+            loop.call_soon_threadsafe(_deliver, items)
+        except RuntimeError:
+            # The loop was closed, its connections are gone
+            pass
+
+
+def _call(handler, data):
+    try:
+        handler(data)
+    except Exception:
+        logger.exception('Live events handler %r failed', handler)
+
+
+def _reconnected():
+    with _lock:
+        handlers = [handler for channel_handlers in _handlers.values() for handler in channel_handlers]
+    for handler in handlers:
+        _call(handler, None)
+
+
+def _encode(event):
+    return json.dumps(event, separators=(',', ':'), ensure_ascii=False)
+
+
+def payload_size(channel, data):
+    """
+    Bytes of a NOTIFY payload holding only this event, to compare with MAX_PAYLOAD.
+    """
+    return len(_encode((channel, data)).encode()) + 2
+
+
+def _payloads(events):
+    payload = []
+    size = 2
+    for event in events:
+        encoded = _encode(event)
+        length = len(encoded.encode()) + 1
+        if length + 1 > MAX_PAYLOAD:
+            raise ValueError(f'Event of {event[0]} does not fit in one notification, see payload_size()')
+        if payload and size + length > MAX_PAYLOAD:
+            yield '[' + ','.join(payload) + ']'
+            payload, size = [], 2
+        payload.append(encoded)
+        size += length
+    if payload:
+        yield '[' + ','.join(payload) + ']'
+
+
+def publish_many(events):
+    """
+    Publish (channel, data) events to the subscribers of every process.
+
+    With the postgres backend the notifications are sent in the current transaction,
+    so they are delivered only if it commits. Every event must encode under MAX_PAYLOAD,
+    see payload_size().
+    """
+    events = list(events)
+    if not events:
+        return
+    if settings.LIVE_EVENTS_BACKEND != 'postgres':
+        dispatch(events)
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT pg_notify(%s, payload) FROM unnest(%s::text[]) AS payload',
+            [NOTIFY_CHANNEL, list(_payloads(events))],
+        )
+
+
+def publish(channel, data):
+    publish_many([(channel, data)])
+
+
+class PostgresListener(threading.Thread):
+    """
+    LISTEN on NOTIFY_CHANNEL with a dedicated connection and dispatch the notifications.
+
+    Reconnects after errors; events sent while disconnected are lost and
+    clients catch up through the comments endpoint when their stream reconnects.
+    Handlers are called with None on every connect for the same reason.
+    """
+
+    def __init__(self, using='default'):
+        super().__init__(name='blog-events-listener', daemon=True)
+        self.using = using
+        self.pid = os.getpid()
+        self.ready = threading.Event()
+        self.stopped = threading.Event()
+
+    def connect(self):
+        wrapper = connections[self.using]
+        raw = wrapper.get_new_connection(wrapper.get_connection_params())
+        raw.autocommit = True
+        with raw.cursor() as cursor:
+            cursor.execute(f'LISTEN {NOTIFY_CHANNEL}')
+        return raw
+
+    def run(self):
+        while not self.stopped.is_set():
+            try:
+                raw = self.connect()
+            except Exception:
+                logger.exception('Failed to connect the live events listener')
+                self.stopped.wait(5)
+                continue
+            self.ready.set()
+            _reconnected()
+            try:
+                self.listen(raw)
+            except Exception:
+                logger.exception('Live events listener lost its connection')
+                self.stopped.wait(1)
+            finally:
+                self.ready.clear()
+                raw.close()
+
+    def listen(self, raw):
+        while not self.stopped.is_set():
+            if select.select([raw], [], [], 1)[0]:
+                raw.poll()
+                events = []
+                while raw.notifies:
+                    notify = raw.notifies.pop(0)
+                    try:
+                        events.extend(tuple(event) for event in json.loads(notify.payload))
+                    except (ValueError, TypeError):
+                        logger.warning('Malformed live event payload: %.200s', notify.payload)
+                dispatch(events)
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def ensure_listener():
+    global _listener
+    with _lock:
+        # A forked worker does not inherit the parent's thread
+        if _listener is None or _listener.pid != os.getpid() or not _listener.is_alive():
+            _listener = PostgresListener()
+            _listener.start()
+        return _listener
+
+
+def stop_listener():
+    global _listener
+    with _lock:
+        listener, _listener = _listener, None
+    if listener is not None and listener.pid == os.getpid():
+        listener.stop()
@@ -0,0 +1,75 @@
+"""
+Model fields of the blog app.
+
+CompressedRichTextField keeps rich text in a binary column, compressed with zlib
+or, when the zstandard package is installed and POST_CONTENT_CODEC is 'zstd',
+with zstd. The first byte of the stored value names its codec, so rows written
+with different settings stay readable. Values are decompressed when loaded.
+"""
+import zlib
+
+from ckeditor_uploader.fields import RichTextUploadingField
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+RAW = b'\x00'
+ZLIB = b'\x01'
+ZSTD = b'\x02'
+
+
+def compress(text):
+    data = text.encode()
+    if len(data) < settings.POST_CONTENT_COMPRESS_MIN_BYTES:
+        return RAW + data
+    if settings.POST_CONTENT_CODEC == 'zstd' and zstandard is not None:
+        codec, compressed = ZSTD, zstandard.ZstdCompressor(level=settings.POST_CONTENT_LEVEL).compress(data)
+    else:
+        codec, compressed = ZLIB, zlib.compress(data, settings.POST_CONTENT_LEVEL)
+    if len(compressed) >= len(data):
+        return RAW + data
+    return codec + compressed
+
+
+def decompress(value):
+    value = bytes(value)
+    codec, data = value[:1], value[1:]
+    if codec == RAW:
+        return data.decode()
+    if codec == ZLIB:
+        return zlib.decompress(data).decode()
+    if codec == ZSTD:
+        if zstandard is None:
+            raise ImproperlyConfigured('Post content compressed with zstd needs the zstandard package')
+        return zstandard.ZstdDecompressor().decompress(data).decode()
+    raise ValueError(f'Unknown compression codec {codec!r}')
+
+
+class CompressedRichTextField(RichTextUploadingField):
+    """
+    RichTextUploadingField stored compressed in a bytea column.
+
+    Works like a text field in forms, templates and the admin. The column cannot
+    be searched or compared with text lookups.
+    """
+
+    description = 'Rich text stored compressed'
+
+    def get_internal_type(self):
+        return 'BinaryField'
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        value = super().get_db_prep_value(value, connection, prepared)
+        if value is None:
+            return None
+        return connection.Database.Binary(compress(value))
+
+    def from_db_value(self, value, expression, connection):
+        if value is None or isinstance(value, str):
+            # A text column not converted yet (before migration 0018)
+            return value
+        return decompress(value)
@@ -1,11 +1,6 @@
-from django import forms
-from django.forms import ModelForm
-from .models import Post, Category,Comment
 from ckeditor.widgets import CKEditorWidget
-from django.contrib.auth.forms import UserCreationForm
-from django.contrib.auth.models import User
 from django import forms
-from taggit.models import Tag
+from .models import Post, Category,Comment
 
 class CreatePostForm(forms.ModelForm):
     """
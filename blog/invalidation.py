@@ -0,0 +1,169 @@
+"""
+Cache invalidation across processes.
+
+invalidate() drops the matching entries of this process at once and publishes a
+message on the live events bus (blog/events.py): NOTIFY with the 'postgres'
+backend, so every worker's listener thread receives it once the transaction
+commits. Workers then clear their LocalCache instances of the topic and call
+the handlers registered with listen(). The 'local' backend stays in the
+process, which is enough for tests and a single-process server.
+
+Long key lists are split over several messages, each under the NOTIFY payload limit.
+
+Messages sent while a listener is disconnected are lost, so on every
+(re)connect the handlers are called with None and the local caches cleared.
+"""
+import json
+import os
+import socket
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+
+from . import events
+
+CHANNEL = 'cache-invalidation'
+HOST = socket.gethostname()
+
+_lock = threading.Lock()
+# topic -> LocalCache instances
+_caches = defaultdict(list)
+# topic -> callables of listen()
+_handlers = defaultdict(list)
+_listening_pid = None
+
+
+def origin():
+    # Computed on every call: a forked worker is another origin than its parent
+    return f'{HOST}:{os.getpid()}'
+
+
+class LocalCache:
+    """
+    A dict of values computed in this process, cleared when any process invalidates one of its topics.
+    """
+
+    def __init__(self, name, topics):
+        self.name = name
+        self.lock = threading.Lock()
+        self.entries = {}
+        with _lock:
+            for topic in topics:
+                _caches[topic].append(self)
+
+    def get(self, key, default=None):
+        ensure_listening()
+        with self.lock:
+            return self.entries.get(key, default)
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+
+    def get_or_set(self, key, compute):
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def evict(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __repr__(self):
+        return f'<LocalCache {self.name}>'
+
+
+def listen(topic, handler):
+    """
+    Call handler(keys) when another process invalidates the topic.
+
+    keys is the list passed to invalidate(), or None when everything of the topic
+    may have changed. Handlers run in the listener thread and must be quick.
+    """
+    with _lock:
+        _handlers[topic].append(handler)
+
+
+def _clear_local(topic):
+    with _lock:
+        caches = list(_caches.get(topic, ()))
+    for local_cache in caches:
+        local_cache.clear()
+
+
+def invalidate(topic, keys=None):
+    """
+    Drop what the caches of every process hold for the topic and keys (all of the topic with None).
+
+    Local caches are cleared again once the transaction commits, in case a request
+    of this process cached the old rows meanwhile. Other processes receive the
+    message only if the transaction commits.
+    """
+    _clear_local(topic)
+    transaction.on_commit(lambda: _clear_local(topic))
+    events.publish_many((CHANNEL, data) for data in _messages(topic, keys))
+
+
+def _messages(topic, keys):
+    data = {'topic': topic, 'keys': None, 'origin': origin()}
+    if keys is None:
+        yield data
+        return
+    # What is left of one NOTIFY payload once the message around the keys is encoded
+    room = events.MAX_PAYLOAD - events.payload_size(CHANNEL, {**data, 'keys': []})
+    chunk, size = [], 0
+    for key in keys:
+        # The key and its comma
+        length = len(json.dumps(key, ensure_ascii=False).encode()) + 1
+        if chunk and size + length > room:
+            yield {**data, 'keys': chunk}
+            chunk, size = [], 0
+        chunk.append(key)
+        size += length
+    yield {**data, 'keys': chunk}
+
+
+def receive(data):
+    """
+    Apply a message of another process. None means messages may have been lost.
+    """
+    if data is None:
+        with _lock:
+            topics = set(_caches) | set(_handlers)
+        for topic in topics:
+            _receive(topic, None)
+        return
+    if data.get('origin') == origin():
+        return
+    _receive(data['topic'], data.get('keys'))
+
+
+def _receive(topic, keys):
+    _clear_local(topic)
+    with _lock:
+        handlers = list(_handlers.get(topic, ()))
+    for handler in handlers:
+        handler(keys)
+
+
+events.add_handler(CHANNEL, receive)
+
+
+def ensure_listening():
+    """
+    Start the listener of this process with the 'postgres' backend. Cheap after the first call.
+    """
+    global _listening_pid
+    if _listening_pid == os.getpid() or settings.LIVE_EVENTS_BACKEND != 'postgres':
+        return
+    events.ensure_listener()
+    _listening_pid = os.getpid()
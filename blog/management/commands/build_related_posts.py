@@ -0,0 +1,18 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from blog.related import build_related_posts
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the related posts of every published post from TF-IDF similarity (run it periodically, e.g. nightly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=settings.RELATED_POSTS_COUNT, help='related posts per post')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        total = build_related_posts(k=options['top_k'])
+        self.stdout.write(f'Related posts of {total} posts built in {time.perf_counter() - start:.2f} s')
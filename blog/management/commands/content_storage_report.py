@@ -0,0 +1,92 @@
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.template.loader import render_to_string
+from django.test import RequestFactory, override_settings
+
+from blog.forms import CommentForm
+from blog.models import Post
+
+NO_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+
+def percentile(values, share):
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+class Command(BaseCommand):
+    help = ('Report the size of blog_post and its TOAST table, TOAST block reads and detail page latency, '
+            'to compare the storage of Post.content before and after a change')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=20, help='number of largest posts to load and render')
+        parser.add_argument('--iterations', type=int, default=20)
+
+    def table_sizes(self, cursor):
+        table = Post._meta.db_table
+        cursor.execute(
+            """
+            SELECT pg_relation_size(c.oid), pg_indexes_size(c.oid),
+                   COALESCE(pg_total_relation_size(NULLIF(c.reltoastrelid, 0)), 0), pg_total_relation_size(c.oid)
+            FROM pg_class c WHERE c.oid = %s::regclass
+            """,
+            [table],
+        )
+        return cursor.fetchone()
+
+    def toast_blocks(self, cursor):
+        cursor.execute(
+            'SELECT COALESCE(toast_blks_read, 0), COALESCE(toast_blks_hit, 0) FROM pg_statio_user_tables WHERE relid = %s::regclass',
+            [Post._meta.db_table],
+        )
+        return cursor.fetchone() or (0, 0)
+
+    def handle(self, *args, **options):
+        with connection.cursor() as cursor:
+            heap, indexes, toast, total = self.table_sizes(cursor)
+            cursor.execute(
+                'SELECT count(*), COALESCE(sum(octet_length(content)), 0), COALESCE(sum(pg_column_size(content)), 0) FROM blog_post'
+            )
+            count, stored, on_disk = cursor.fetchone()
+            cursor.execute('SELECT id FROM blog_post ORDER BY octet_length(content) DESC LIMIT %s', [options['posts']])
+            post_ids = [row[0] for row in cursor.fetchall()]
+
+        text = sum(len(content.encode()) for content in Post.objects.values_list('content', flat=True).iterator())
+        kb = lambda value: f'{value / 1024:.0f} KB'
+        self.stdout.write(f'posts: {count}')
+        self.stdout.write(f'content: {kb(text)} as text, {kb(stored)} stored, {kb(on_disk)} on disk after TOAST')
+        self.stdout.write(f'blog_post: heap {kb(heap)}, indexes {kb(indexes)}, TOAST {kb(toast)}, total {kb(total)}')
+
+        if not post_ids:
+            return
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        loads, renders = [], []
+        with connection.cursor() as cursor:
+            reads_before, hits_before = self.toast_blocks(cursor)
+        # No fragment cache, so every render uses the content
+        with override_settings(CACHES=NO_CACHES):
+            for _ in range(options['iterations']):
+                for post_id in post_ids:
+                    start = time.perf_counter()
+                    post = Post.objects.select_related('author').get(pk=post_id)
+                    loaded = time.perf_counter()
+                    render_to_string('detail_post.html', {'post': post, 'comment_form': CommentForm()}, request=request)
+                    loads.append((loaded - start) * 1000)
+                    renders.append((time.perf_counter() - loaded) * 1000)
+        with connection.cursor() as cursor:
+            reads_after, hits_after = self.toast_blocks(cursor)
+
+        loads.sort()
+        renders.sort()
+        self.stdout.write(
+            f'detail page, {len(post_ids)} largest posts: load p50 {percentile(loads, 0.5):.3f} ms '
+            f'p95 {percentile(loads, 0.95):.3f} ms, render p50 {percentile(renders, 0.5):.3f} ms '
+            f'p95 {percentile(renders, 0.95):.3f} ms'
+        )
+        # pg_statio counters are updated by the statistics collector, they may lag a little
+        self.stdout.write(
+            f'TOAST blocks during the run: {reads_after - reads_before} read, {hits_after - hits_before} hit'
+        )
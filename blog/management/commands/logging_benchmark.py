@@ -0,0 +1,101 @@
+import logging
+import tempfile
+import time
+from pathlib import Path
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+
+from blog.views import user_header
+from myblog.log_handlers import CompressedRotatingFileHandler, QueueFileHandler
+
+
+def percentile(values, share):
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+class SlowStream:
+    """
+    File stream whose writes take extra time, standing in for slow or contended storage.
+    """
+
+    def __init__(self, stream, delay):
+        self.stream = stream
+        self.delay = delay
+
+    def write(self, data):
+        time.sleep(self.delay)
+        return self.stream.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+class SlowFileMixin:
+    write_delay = 0
+
+    def _open(self):
+        stream = super()._open()
+        return SlowStream(stream, self.write_delay) if self.write_delay else stream
+
+
+class SlowFileHandler(SlowFileMixin, logging.FileHandler):
+    pass
+
+
+class SlowRotatingFileHandler(SlowFileMixin, CompressedRotatingFileHandler):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Compare request latency without logging, with FileHandler and with QueueFileHandler'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--lines', type=int, default=50, help='log lines written per request')
+        parser.add_argument('--write-delay-ms', type=float, default=0,
+                            help='extra time taken by every write() to the log file, to simulate slow storage')
+
+    def handle(self, *args, **options):
+        factory = RequestFactory()
+        formatter = logging.Formatter('%(levelname)s %(asctime)s %(message)s')
+
+        SlowFileMixin.write_delay = options['write_delay_ms'] / 1000
+
+        with tempfile.TemporaryDirectory() as log_dir:
+            queue_handler = QueueFileHandler(Path(log_dir) / 'queue.log')
+            queue_handler.target = SlowRotatingFileHandler(Path(log_dir) / 'queue.log', max_bytes=5 * 1024 * 1024)
+            setups = [
+                ('no logging', None),
+                ('FileHandler', SlowFileHandler(Path(log_dir) / 'file.log')),
+                ('QueueFileHandler', queue_handler),
+            ]
+            self.stdout.write(f"{'handler':<18} {'mean us':>9} {'p50 us':>9} {'p95 us':>9} {'p99 us':>9}")
+            for name, handler in setups:
+                logger = logging.getLogger(f'blog.benchmark.{name}')
+                logger.propagate = False
+                logger.setLevel(logging.INFO)
+                if handler is not None:
+                    handler.setFormatter(formatter)
+                    logger.addHandler(handler)
+
+                timings = []
+                for number in range(options['requests']):
+                    request = factory.get('/header/user/')
+                    request.user = AnonymousUser()
+                    start = time.perf_counter()
+                    user_header(request)
+                    for line in range(options['lines']):
+                        logger.info('request %s line %s', number, line)
+                    timings.append((time.perf_counter() - start) * 1e6)
+
+                if handler is not None:
+                    logger.removeHandler(handler)
+                    handler.close()
+
+                timings.sort()
+                self.stdout.write(
+                    f"{name:<18} {sum(timings) / len(timings):>9.1f} {percentile(timings, 0.5):>9.1f} "
+                    f"{percentile(timings, 0.95):>9.1f} {percentile(timings, 0.99):>9.1f}"
+                )
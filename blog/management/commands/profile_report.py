@@ -0,0 +1,44 @@
+import json
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+class Command(BaseCommand):
+    help = 'Aggregate the JSON lines written by ProfilingMiddleware per URL name'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', default=str(settings.PROFILING_LOG_FILE))
+
+    def handle(self, *args, **options):
+        rows = defaultdict(list)
+        try:
+            with open(options['file'], encoding='utf-8') as log_file:
+                for line in log_file:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    rows[record.get('url_name') or record['path']].append(record)
+        except FileNotFoundError:
+            raise CommandError(f"No profiling log at {options['file']}")
+
+        header = f"{'url_name':<24} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'sql':>6} {'sql ms':>9} {'tpl ms':>9} {'bytes':>9}"
+        self.stdout.write(header)
+        for name, records in sorted(rows.items(), key=lambda item: -sum(r['wall_ms'] for r in item[1])):
+            count = len(records)
+            wall = [r['wall_ms'] for r in records]
+            sizes = [r['response_bytes'] for r in records if r['response_bytes'] is not None]
+            self.stdout.write(
+                f"{name:<24} {count:>7} {percentile(wall, 0.5):>9.1f} {percentile(wall, 0.95):>9.1f} "
+                f"{sum(r['sql_count'] for r in records) / count:>6.1f} "
+                f"{sum(r['sql_ms'] for r in records) / count:>9.1f} "
+                f"{sum(r['template_ms'] for r in records) / count:>9.1f} "
+                f"{(sum(sizes) / len(sizes) if sizes else 0):>9.0f}"
+            )
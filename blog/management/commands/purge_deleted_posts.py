@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from blog.deletion import purge_post
+from blog.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Finish deleting posts left in the "deleting" status, e.g. by a worker stopped during a background deletion'
+
+    def handle(self, *args, **options):
+        post_ids = list(Post.objects.filter(status='deleting').values_list('pk', flat=True))
+        for post_id in post_ids:
+            purge_post(post_id)
+        self.stdout.write(f'Deleted {len(post_ids)} posts')
@@ -0,0 +1,35 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from blog.notifications import send_digests
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Send the authors one email each with the new comments to their posts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='keep sending every --interval seconds')
+        parser.add_argument('--interval', type=int, default=settings.COMMENT_DIGEST_INTERVAL)
+
+    def handle(self, *args, **options):
+        if not options['loop']:
+            self.send()
+            return
+        while True:
+            try:
+                self.send()
+            except Exception:
+                # The SMTP server may be down, the notifications wait for the next run
+                logger.exception('Failed to send comment digests')
+            close_old_connections()
+            time.sleep(options['interval'])
+
+    def send(self):
+        emails, comments = send_digests()
+        self.stdout.write(f'Sent {emails} digests with {comments} comments')
@@ -0,0 +1,60 @@
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter: the current process has already imported everything
+STARTUP_CODE = """
+import time
+start = time.perf_counter()
+import django
+django.setup()
+setup = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+print(setup - start, time.perf_counter() - start)
+"""
+
+IMPORT_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+class Command(BaseCommand):
+    help = 'Report import time per module (like python -X importtime) and the time to reach app-ready'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=25, help='number of modules and packages to show')
+
+    def handle(self, *args, **options):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE}
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', STARTUP_CODE],
+            env=env, capture_output=True, text=True, cwd=settings.BASE_DIR,
+        )
+        if result.returncode:
+            raise CommandError(result.stderr[-2000:])
+
+        modules = []
+        packages = defaultdict(int)
+        for line in result.stderr.splitlines():
+            match = IMPORT_LINE.match(line)
+            if not match:
+                continue
+            self_us, cumulative_us, name = int(match[1]), int(match[2]), match[4]
+            modules.append((cumulative_us, self_us, name))
+            packages[name.split('.')[0]] += self_us
+
+        setup_seconds, ready_seconds = map(float, result.stdout.split())
+        self.stdout.write(f'django.setup(): {setup_seconds * 1000:.1f} ms')
+        self.stdout.write(f'app-ready with URLconf loaded: {ready_seconds * 1000:.1f} ms')
+
+        self.stdout.write(f"\n{'package':<32} {'self ms':>9}")
+        for name, self_us in sorted(packages.items(), key=lambda item: -item[1])[:options['top']]:
+            self.stdout.write(f'{name:<32} {self_us / 1000:>9.1f}')
+
+        self.stdout.write(f"\n{'module':<48} {'cumulative ms':>14} {'self ms':>9}")
+        for cumulative_us, self_us, name in sorted(modules, reverse=True)[:options['top']]:
+            self.stdout.write(f'{name:<48} {cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}')
@@ -0,0 +1,89 @@
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.template.loader import render_to_string
+from django.test import RequestFactory, override_settings
+from django.utils import timezone
+
+from blog.forms import CommentForm
+from blog.models import Category, Comment, Post
+
+BENCHMARK_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'template-benchmark',
+    }
+}
+
+
+def percentile(values, share):
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+class Command(BaseCommand):
+    help = 'Measure render time of each template with realistic contexts, with cold and warm fragment caches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument('--categories', type=int, default=12)
+        parser.add_argument('--comments', type=int, default=50)
+
+    def build_contexts(self, options):
+        now = timezone.now()
+        author = User(pk=1, username='author')
+        categories = [
+            Category(pk=number, title=f'Категорія {number}', slug=f'category-{number}', post_count=40, published_count=30)
+            for number in range(1, options['categories'] + 1)
+        ]
+        content = '<p>' + 'Освітні тренди та новини EdEra. ' * 200 + '</p>'
+        posts = [
+            Post(pk=number, title=f'Пост номер {number}', slug=f'post-{number}', content=content,
+                 category=categories[number % len(categories)], author=author, status='published',
+                 created_at=now - timedelta(hours=number), updated_at=now - timedelta(hours=number))
+            for number in range(1, 61)
+        ]
+        page_obj = Paginator(posts, 6).get_page(1)
+        comments = [
+            Comment(pk=number, post=posts[0], user=author, comment=f'Коментар {number}', created_at=now)
+            for number in range(options['comments'])
+        ]
+        listing = {'categories': categories, 'page_obj': page_obj, 'posts': posts, 'status': 'published'}
+        return {
+            'index.html': listing,
+            'post_by_category.html': {**listing, 'category': categories[0]},
+            'post_by_author.html': {**listing, 'author': author, 'author_stats': None},
+            'detail_post.html': {'categories': categories, 'post': posts[0], 'comments': comments,
+                                 'comment_form': CommentForm()},
+            'moderation.html': {'categories': categories, 'page_obj': Paginator(posts, 50).get_page(1)},
+            'user_header.html': {},
+        }
+
+    def measure(self, template_name, context, request, iterations, cold):
+        timings = []
+        for _ in range(iterations):
+            if cold:
+                cache.clear()
+            start = time.perf_counter()
+            render_to_string(template_name, context, request=request)
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        return timings
+
+    def handle(self, *args, **options):
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+
+        with override_settings(CACHES=BENCHMARK_CACHES):
+            contexts = self.build_contexts(options)
+            self.stdout.write(f"{'template':<24} {'cold p50 ms':>12} {'cold p95 ms':>12} {'warm p50 ms':>12} {'warm p95 ms':>12}")
+            for template_name, context in contexts.items():
+                cold = self.measure(template_name, context, request, options['iterations'], cold=True)
+                warm = self.measure(template_name, context, request, options['iterations'], cold=False)
+                self.stdout.write(
+                    f"{template_name:<24} {percentile(cold, 0.5):>12.3f} {percentile(cold, 0.95):>12.3f} "
+                    f"{percentile(warm, 0.5):>12.3f} {percentile(warm, 0.95):>12.3f}"
+                )
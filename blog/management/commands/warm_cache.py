@@ -0,0 +1,116 @@
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import Sum
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+
+from blog.forms import CommentForm
+from blog.models import Category, Post
+from blog.views import POSTS_PER_PAGE
+from myblog.compression import ENCODINGS
+
+
+class Command(BaseCommand):
+    help = ('Fill the page and fragment caches with the index, category pages and the most viewed posts '
+            'before traffic is switched over. Needs a cache shared with the web workers (CACHE_BACKEND).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=3, help='listing pages to render per listing')
+        parser.add_argument('--posts', type=int, default=50, help='number of most viewed posts to render')
+        parser.add_argument('--workers', type=int, default=4, help='size of the thread pool')
+        parser.add_argument('--host', default=settings.DEFAULT_DOMAIN,
+                            help='host the pages are cached for, it is part of the page cache key')
+
+    def listing_urls(self, pages):
+        published = Category.objects.aggregate(total=Sum('published_count'))['total'] or 0
+        urls = self.paged(reverse('index'), published, pages)
+        categories = list(Category.objects.values_list('slug', 'path', 'post_count'))
+        for slug, path, _ in categories:
+            # A category page lists the posts of its subcategories too
+            count = sum(posts for _, other, posts in categories if other.startswith(path))
+            urls += self.paged(reverse('post_by_category', kwargs={'slug': slug}), count, pages)
+        return urls
+
+    def paged(self, url, count, pages):
+        # The first page is linked without ?page=, it is a separate cache entry
+        last = min(pages, max(1, math.ceil(count / POSTS_PER_PAGE)))
+        return [url] + [f'{url}?page={number}' for number in range(2, last + 1)]
+
+    def request(self, url, host, encoding=''):
+        request = RequestFactory().get(
+            url, HTTP_HOST=host, HTTP_ACCEPT_ENCODING=encoding, secure=settings.DEFAULT_PROTOCOL == 'https',
+        )
+        request.user = AnonymousUser()
+        return request
+
+    def warm_listing(self, url, host, encoding):
+        """
+        Run the view itself: public_page stores the response and the templates fill the fragments.
+
+        The encoding is part of the page cache key, so every listing is warmed once per encoding.
+        """
+        try:
+            request = self.request(url, host, encoding)
+            match = resolve(request.path_info)
+            response = match.func(request, *match.args, **match.kwargs)
+            return response.status_code
+        finally:
+            connections.close_all()
+
+    def warm_post(self, post_id, host):
+        """
+        Render the post template only: running detail_post would count a view.
+        """
+        try:
+            post = Post.objects.select_related('author').get(pk=post_id)
+            request = self.request(reverse('detail_post', kwargs={'slug': post.slug}), host)
+            render_to_string('detail_post.html', {'post': post, 'comment_form': CommentForm()}, request=request)
+            return 200
+        finally:
+            connections.close_all()
+
+    def handle(self, *args, **options):
+        if isinstance(caches['default'], LocMemCache):
+            self.stderr.write(self.style.WARNING(
+                'The default cache is local to this process: warming it does not help the web workers.'
+            ))
+
+        host = options['host']
+        post_ids = list(
+            Post.objects.filter(status='published').order_by('-views').values_list('pk', flat=True)[:options['posts']]
+        )
+        urls = self.listing_urls(options['pages'])
+
+        start = time.perf_counter()
+        failed = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            jobs = {
+                executor.submit(self.warm_listing, url, host, encoding): f'{url} ({encoding or "identity"})'
+                for url in urls for encoding in ENCODINGS
+            }
+            jobs.update({executor.submit(self.warm_post, post_id, host): f'post {post_id}' for post_id in post_ids})
+            for job in as_completed(jobs):
+                try:
+                    status = job.result()
+                except Exception as error:
+                    status = error
+                if status != 200:
+                    failed += 1
+                    self.stderr.write(f'{jobs[job]}: {status}')
+                elif options['verbosity'] > 1:
+                    self.stdout.write(f'{jobs[job]}: {status}')
+
+        self.stdout.write(
+            f'Warmed {len(jobs) - failed} of {len(jobs)} pages '
+            f'({len(urls)} listings in {len(ENCODINGS)} encodings, {len(post_ids)} posts) '
+            f'in {time.perf_counter() - start:.2f} s'
+        )
@@ -0,0 +1,164 @@
+import cProfile
+import heapq
+import json
+import logging
+import random
+import threading
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.base import Template
+
+profiling_logger = logging.getLogger('blog.profiling')
+
+_request_stats = ContextVar('request_stats', default=None)
+
+
+class RequestStats:
+    """
+    Measurements collected while a sampled request is handled.
+    """
+
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_count += 1
+            self.sql_time += time.perf_counter() - start
+
+
+def _patch_template_render():
+    """
+    Time the outermost Template.render call of sampled requests.
+
+    Included templates render inside the outer call and are not counted twice.
+    """
+    if getattr(Template.render, 'profiled', False):
+        return
+    render = Template.render
+
+    def profiled_render(self, context):
+        stats = _request_stats.get()
+        if stats is None or stats.template_depth:
+            return render(self, context)
+
+        stats.template_depth += 1
+        start = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            stats.template_time += time.perf_counter() - start
+            stats.template_depth -= 1
+
+    profiled_render.profiled = True
+    Template.render = profiled_render
+
+
+class ProfilingMiddleware:
+    """
+    Per-request profiling with sampled structured output.
+
+    PROFILING_SAMPLE_RATE of the requests are measured: wall time, number and total
+    time of SQL queries, template render time and response size. Each measurement is
+    written as one JSON line to the 'blog.profiling' logger, with the URL name to
+    aggregate on (see the profile_report command).
+
+    When PROFILING_CPROFILE_TOP is set, sampled requests also run under cProfile and
+    the dumps of the slowest N requests of the process are kept in PROFILING_CPROFILE_DIR.
+
+    The middleware is disabled when the sample rate is 0.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = settings.PROFILING_SAMPLE_RATE
+        if not self.sample_rate:
+            raise MiddlewareNotUsed
+
+        self.cprofile_top = settings.PROFILING_CPROFILE_TOP
+        self.cprofile_dir = Path(settings.PROFILING_CPROFILE_DIR)
+        self.slowest = []
+        self.lock = threading.Lock()
+        _patch_template_render()
+
+    def __call__(self, request):
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        profiler = self.start_profiler()
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(stats.execute_wrapper))
+                response = self.get_response(request)
+        finally:
+            duration = time.perf_counter() - start
+            if profiler is not None:
+                profiler.disable()
+            _request_stats.reset(token)
+
+        self.log(request, response, stats, duration)
+        if profiler is not None:
+            self.keep_profile(profiler, request, duration)
+        return response
+
+    def start_profiler(self):
+        if not self.cprofile_top:
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already active in this process
+            return None
+        return profiler
+
+    def log(self, request, response, stats, duration):
+        match = request.resolver_match
+        record = {
+            'time': time.time(),
+            'method': request.method,
+            'path': request.path,
+            'url_name': match.url_name if match else None,
+            'status': response.status_code,
+            'wall_ms': round(duration * 1000, 3),
+            'sql_count': stats.sql_count,
+            'sql_ms': round(stats.sql_time * 1000, 3),
+            'template_ms': round(stats.template_time * 1000, 3),
+            'response_bytes': None if response.streaming else len(response.content),
+        }
+        profiling_logger.info(json.dumps(record))
+
+    def keep_profile(self, profiler, request, duration):
+        """
+        Dump the profile if the request is among the slowest N seen by this process.
+        """
+        with self.lock:
+            if len(self.slowest) >= self.cprofile_top and duration <= self.slowest[0][0]:
+                return
+
+            match = request.resolver_match
+            name = match.url_name if match and match.url_name else 'unknown'
+            self.cprofile_dir.mkdir(parents=True, exist_ok=True)
+            path = self.cprofile_dir / f'{name}-{round(duration * 1000)}ms-{time.time_ns()}.prof'
+            profiler.dump_stats(path)
+
+            heapq.heappush(self.slowest, (duration, str(path)))
+            if len(self.slowest) > self.cprofile_top:
+                _, evicted = heapq.heappop(self.slowest)
+                Path(evicted).unlink(missing_ok=True)
@@ -0,0 +1,27 @@
+# Generated by Django 5.0 on 2026-10-19 14:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0011_remove_post_tags'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostDailyViews',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_views', to='blog.post')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='postdailyviews',
+            constraint=models.UniqueConstraint(fields=('post', 'day'), name='unique_post_daily_views'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.0 on 2026-10-19 14:25
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0012_postdailyviews'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='post',
+            name='status',
+            field=models.CharField(choices=[('checkout', 'На перевірці'), ('published', 'Опубліковано'), ('rejected', 'Відхилено')], default='checkout'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['status', 'created_at'], name='post_status_created_idx'),
+        ),
+    ]
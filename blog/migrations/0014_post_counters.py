@@ -0,0 +1,54 @@
+# Generated by Django 5.0 on 2026-10-19 14:27
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def count_posts(apps, schema_editor):
+    Category = apps.get_model('blog', 'Category')
+    Post = apps.get_model('blog', 'Post')
+    AuthorStats = apps.get_model('blog', 'AuthorStats')
+    counts = dict(posts=Count('id'), published=Count('id', filter=Q(status='published')))
+
+    categories = []
+    for row in Post.objects.values('category_id').annotate(**counts):
+        categories.append(Category(pk=row['category_id'], post_count=row['posts'], published_count=row['published']))
+    Category.objects.bulk_update(categories, ['post_count', 'published_count'], batch_size=500)
+
+    authors = [
+        AuthorStats(user_id=row['author_id'], post_count=row['posts'], published_count=row['published'])
+        for row in Post.objects.values('author_id').annotate(**counts)
+    ]
+    AuthorStats.objects.bulk_create(authors, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('blog', '0013_post_moderation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='post_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('post_count', models.PositiveIntegerField(default=0)),
+                ('published_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='post_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='published_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_posts, migrations.RunPython.noop),
+    ]
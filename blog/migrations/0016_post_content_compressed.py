@@ -0,0 +1,26 @@
+# Generated by Django 5.0 on 2026-10-19 16:02
+
+import blog.fields
+import ckeditor_uploader.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0015_comment_post_id_idx'),
+    ]
+
+    operations = [
+        # Nullable until 0018 removes it, so that migrating back can re-add it before copying the text back
+        migrations.AlterField(
+            model_name='post',
+            name='content',
+            field=ckeditor_uploader.fields.RichTextUploadingField(null=True),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='content_compressed',
+            field=blog.fields.CompressedRichTextField(null=True),
+        ),
+    ]
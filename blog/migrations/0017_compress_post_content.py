@@ -0,0 +1,44 @@
+# Generated by Django 5.0 on 2026-10-19 16:02
+
+from django.db import migrations, transaction
+
+BATCH_SIZE = 500
+
+
+def copy_content(apps, source, target):
+    """
+    Copy one content column into the other in pk batches, one transaction per batch,
+    so a large table is not rewritten under a single long lock.
+    """
+    Post = apps.get_model('blog', 'Post')
+    last_pk = 0
+    while True:
+        with transaction.atomic():
+            posts = list(Post.objects.filter(pk__gt=last_pk).order_by('pk').only('pk', source)[:BATCH_SIZE])
+            if not posts:
+                return
+            for post in posts:
+                setattr(post, target, getattr(post, source))
+            Post.objects.bulk_update(posts, [target])
+        last_pk = posts[-1].pk
+
+
+def compress_content(apps, schema_editor):
+    copy_content(apps, 'content', 'content_compressed')
+
+
+def decompress_content(apps, schema_editor):
+    copy_content(apps, 'content_compressed', 'content')
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('blog', '0016_post_content_compressed'),
+    ]
+
+    operations = [
+        migrations.RunPython(compress_content, decompress_content),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.0 on 2026-10-19 16:02
+
+import blog.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0017_compress_post_content'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='post',
+            name='content',
+        ),
+        migrations.RenameField(
+            model_name='post',
+            old_name='content_compressed',
+            new_name='content',
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='content',
+            field=blog.fields.CompressedRichTextField(),
+        ),
+        # The values are compressed already: keep Postgres from trying pglz on them again
+        migrations.RunSQL(
+            'ALTER TABLE blog_post ALTER COLUMN content SET STORAGE EXTERNAL',
+            'ALTER TABLE blog_post ALTER COLUMN content SET STORAGE EXTENDED',
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0 on 2026-10-19 15:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0019_relatedpost'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='post',
+            name='status',
+            field=models.CharField(choices=[('checkout', 'На перевірці'), ('published', 'Опубліковано'), ('rejected', 'Відхилено'), ('deleting', 'Видаляється')], default='checkout'),
+        ),
+    ]
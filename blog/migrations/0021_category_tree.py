@@ -0,0 +1,37 @@
+# Generated by Django 5.0 on 2026-10-19 15:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import CharField, Value
+from django.db.models.functions import Cast, Concat
+
+
+def set_root_paths(apps, schema_editor):
+    # Every existing category becomes a top-level one
+    Category = apps.get_model('blog', 'Category')
+    Category.objects.update(path=Concat(Cast('id', CharField()), Value('/'), output_field=CharField()))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0020_post_status_deleting'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='children', to='blog.category'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(default='', editable=False),
+        ),
+        migrations.RunPython(set_root_paths, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['path'], name='category_path_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.0 on 2026-10-19 15:10
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncMonth
+
+
+def count_months(apps, schema_editor):
+    Post = apps.get_model('blog', 'Post')
+    MonthlyPostCount = apps.get_model('blog', 'MonthlyPostCount')
+    rows = (
+        Post.objects.filter(status='published')
+        .annotate(month=TruncMonth('created_at', output_field=models.DateField()))
+        .values('month').annotate(count=Count('id'))
+    )
+    MonthlyPostCount.objects.bulk_create(
+        [MonthlyPostCount(month=row['month'], published_count=row['count']) for row in rows], batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0021_category_tree'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyPostCount',
+            fields=[
+                ('month', models.DateField(primary_key=True, serialize=False)),
+                ('published_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(count_months, migrations.RunPython.noop),
+    ]
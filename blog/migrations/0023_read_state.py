@@ -0,0 +1,23 @@
+# Generated by Django 5.0 on 2026-10-19 15:18
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('blog', '0022_monthly_post_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReadState',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='read_state', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('posts', models.BinaryField(default=b'')),
+            ],
+        ),
+    ]
@@ -1,28 +1,101 @@
-from django.db import models
-from ckeditor_uploader.fields import RichTextUploadingField
+from django.core.exceptions import ValidationError
+from django.db import models, router, transaction
+from django.db.models import Value
+from django.db.models.functions import Concat, Substr
+from .fields import CompressedRichTextField
 from django.contrib.auth.models import User
-from slugify import slugify
 
 
 class Category(models.Model):
     """
     Model for category of posts
 
+    Categories form a tree through parent. path is the materialized path of ids
+    from the root, like '3/8/', kept by save(), so the posts of a category and all
+    its subcategories are found with one path LIKE '3/8/%' join.
+
+    post_count and published_count are kept by blog.counters with F() updates
+    and are never written by save() of an existing category. They count the
+    category's own posts only.
+
     Fields:
         - title: CharField
         - slug: SlugField
+        - parent: ForeignKey to Category, empty for top-level categories; a category
+          with subcategories cannot be deleted until they are moved or deleted
+        - path: CharField
+        - post_count: PositiveIntegerField
+        - published_count: PositiveIntegerField
     """
 
+    COUNTER_FIELDS = ('post_count', 'published_count')
+
     title = models.CharField(max_length=255,blank=False)
     slug = models.SlugField(blank=True)
+    parent = models.ForeignKey('self', null=True, blank=True, on_delete=models.PROTECT, related_name='children')
+    path = models.CharField(default='', editable=False)
+    post_count = models.PositiveIntegerField(default=0, editable=False)
+    published_count = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            # varchar_pattern_ops: LIKE 'prefix%' uses the index whatever the database collation
+            models.Index(fields=['path'], name='category_path_idx', opclasses=['varchar_pattern_ops']),
+        ]
 
     def __str__(self):
         return self.title
-    
+
+    @property
+    def depth(self):
+        return self.path.count('/') - 1
+
+    def clean(self):
+        if self.parent_id is not None and self.pk is not None:
+            parent_path = Category.objects.filter(pk=self.parent_id).values_list('path', flat=True).first() or ''
+            if f'/{self.pk}/' in f'/{parent_path}':
+                raise ValidationError({'parent': 'Категорію не можна перенести в неї саму або в її підкатегорію.'})
+
     def save(self, *args, **kwargs):
         if not self.slug:
+            from slugify import slugify
             self.slug = slugify(self.title)
-        super().save(*args, **kwargs)
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS + ('path',)
+            ]
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self.move_to(self.parent_id)
+
+    def move_to(self, parent_id):
+        """
+        Set the path of the category under parent_id, and of its whole subtree
+        with the same UPDATE. Does nothing when the path does not change.
+        """
+        categories = Category.objects.using(router.db_for_write(Category, instance=self))
+        old_path = categories.filter(pk=self.pk).values_list('path', flat=True).get()
+        parent_path = categories.filter(pk=parent_id).values_list('path', flat=True).get() if parent_id else ''
+        new_path = f'{parent_path}{self.pk}/'
+        if old_path == new_path:
+            return
+        if old_path and parent_path.startswith(old_path):
+            raise ValueError('A category cannot be moved under itself')
+        if old_path:
+            categories.filter(path__startswith=old_path).update(
+                path=Concat(Value(new_path), Substr('path', len(old_path) + 1), output_field=models.CharField()),
+            )
+        else:
+            categories.filter(pk=self.pk).update(path=new_path)
+        self.path = new_path
+
+    def subtree(self):
+        """
+        The category and all its subcategories.
+        """
+        return Category.objects.filter(path__startswith=self.path)
+
 
 class Post(models.Model):
     """
@@ -35,11 +108,13 @@ class Post(models.Model):
     Available statuses:
     - 'checkout'`: 'На перевірці' (Pending review)
     - 'published'`: 'Опубліковано' (Published)
+    - 'rejected'`: 'Відхилено' (Rejected by a moderator)
+    - 'deleting'`: 'Видаляється' (Hidden while its comments are deleted in the background)
 
     Fields:
         - title: CharField
         - category: ForeignKey
-        - content: RichTextUploadingField
+        - content: CompressedRichTextField (rich text stored compressed)
         - slug: SlugField
         - author: ForeignKey
         - created_at: DateTimeField
@@ -50,12 +125,14 @@ class Post(models.Model):
 
     STATUS_POST = (
         ('checkout','На перевірці'),
-        ('published','Опубліковано')
+        ('published','Опубліковано'),
+        ('rejected','Відхилено'),
+        ('deleting','Видаляється'),
     )
 
     title = models.CharField(blank = False, unique=True, max_length=255)
     category = models.ForeignKey(Category, blank = False, on_delete=models.CASCADE, default=0)
-    content = RichTextUploadingField(blank = False)
+    content = CompressedRichTextField(blank = False)
     slug = models.SlugField(blank=False)
     author = models.ForeignKey(User, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -63,13 +140,80 @@ class Post(models.Model):
     views = models.PositiveIntegerField(default=0)
     status = models.CharField(blank=False, choices=STATUS_POST, default='checkout')
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='post_status_created_idx'),
+        ]
+
     def __str__(self):
         return self.title
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._counted_state = instance.counted_state()
+        return instance
+
+    def counted_state(self):
+        """
+        Return (category_id, author_id, status), the values the post counters depend on,
+        or None if some of them were not loaded.
+        """
+        if any(field in self.get_deferred_fields() for field in ('category', 'author', 'status')):
+            return None
+        return (self.category_id, self.author_id, self.status)
     
     def save(self, *args, **kwargs):
+        from .counters import apply_month_changes, apply_post_changes
+
         if not self.slug:
+            from slugify import slugify
             self.slug = slugify(self.title)
-        super().save(*args, **kwargs)
+
+        if self._state.adding:
+            previous = None
+        else:
+            previous = getattr(self, '_counted_state', None)
+            if previous is None:
+                previous = (
+                    Post.objects.using(router.db_for_write(Post, instance=self))
+                    .filter(pk=self.pk).values_list('category_id', 'author_id', 'status').first()
+                )
+
+        current = (self.category_id, self.author_id, self.status)
+        update_fields = kwargs.get('update_fields')
+        if previous is not None and update_fields is not None:
+            current = tuple(
+                value if {name, f'{name}_id'} & set(update_fields) else old
+                for name, value, old in zip(('category', 'author', 'status'), current, previous)
+            )
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if previous != current:
+                apply_post_changes([(previous, current)])
+            was_published = previous is not None and previous[2] == 'published'
+            if was_published != (current[2] == 'published'):
+                apply_month_changes([(self.created_at, -1 if was_published else 1)])
+        self._counted_state = current
+
+class AuthorStats(models.Model):
+    """
+    Model for denormalized post counters of an author
+
+    Kept by blog.counters with F() updates, so reading it is a single-row lookup.
+
+    Fields:
+        - user: OneToOneField
+        - post_count: PositiveIntegerField
+        - published_count: PositiveIntegerField
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='post_stats')
+    post_count = models.PositiveIntegerField(default=0)
+    published_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user}: {self.published_count}/{self.post_count}"
 
 class Comment(models.Model):
     """
@@ -86,5 +230,125 @@ class Comment(models.Model):
     comment = models.CharField(blank=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Serves "comments of a post newer than id n" without a sort
+            models.Index(fields=['post', 'id'], name='comment_post_id_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user} commited {self.post.title}"
+
+    def to_json(self):
+        return {
+            'id': self.id,
+            'user': self.user.username,
+            'comment': self.comment,
+            'created_at': self.created_at.isoformat(),
+        }
+
+
+class PostDailyViews(models.Model):
+    """
+    Model for daily views of posts
+
+    Rows are written in batches by blog.analytics, one row per post and day
+
+    Fields:
+        - post: ForeignKey
+        - day: DateField
+        - count: PositiveIntegerField
+    """
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='daily_views')
+    day = models.DateField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'day'], name='unique_post_daily_views'),
+        ]
+
+    def __str__(self):
+        return f"{self.post.title} {self.day}: {self.count}"
+
+
+class MonthlyPostCount(models.Model):
+    """
+    Model for the number of published posts per month, for the archive
+
+    Kept by blog.counters with upserts whenever a post is published, unpublished
+    or deleted, so the archive sidebar never aggregates over Post.
+
+    Fields:
+        - month: DateField, the first day of the month
+        - published_count: PositiveIntegerField
+    """
+    month = models.DateField(primary_key=True)
+    published_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.month:%Y-%m}: {self.published_count}"
+
+
+class RelatedPost(models.Model):
+    """
+    Model for precomputed related posts
+
+    Rows are written by blog.related, rank 0 is the most similar post
+
+    Fields:
+        - post: ForeignKey
+        - related: ForeignKey
+        - rank: PositiveSmallIntegerField
+        - score: FloatField (cosine similarity)
+    """
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='related_posts')
+    related = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='related_to')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'rank'], name='unique_related_post_rank'),
+        ]
+
+    def __str__(self):
+        return f"{self.post.title} -> {self.related.title}"
+
+
+class ReadState(models.Model):
+    """
+    Model for the posts a user has read
+
+    One row per user instead of one per read post: the ids are a run-length
+    encoded set, written and read by blog.readstate.
+
+    Fields:
+        - user: OneToOneField
+        - posts: BinaryField
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='read_state')
+    posts = models.BinaryField(default=b'')
+
+    def __str__(self):
+        return f"{self.user}: {len(self.posts)} bytes"
+
+
+class CommentNotification(models.Model):
+    """
+    Model for a new comment the author of the post has not been told about
+
+    Rows are written when a comment is saved and deleted once blog.notifications
+    has sent them in a digest email.
+
+    Fields:
+        - recipient: ForeignKey
+        - comment: ForeignKey
+        - created_at: DateTimeField
+    """
+    recipient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='comment_notifications')
+    comment = models.ForeignKey(Comment, on_delete=models.CASCADE, related_name='notifications')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.recipient}: comment {self.comment_id}"
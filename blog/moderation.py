@@ -0,0 +1,40 @@
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import invalidate_pages
+from .counters import apply_month_changes, apply_post_changes
+from .invalidation import invalidate
+from .models import Post
+from .signals import posts_moderated
+
+
+def moderate_posts(post_ids, status):
+    """
+    Set the status of pending posts with a single UPDATE ... WHERE id IN (...).
+
+    Posts that are no longer pending are skipped. Post counters are changed with
+    one statement per affected category, author and month. The page cache and the caches of
+    every process are invalidated and posts_moderated is sent once for the whole batch, not per post.
+
+    Returns the list of moderated post ids.
+    """
+    with transaction.atomic():
+        pending = Post.objects.filter(status='checkout')
+        if post_ids is not None:
+            pending = pending.filter(pk__in=post_ids)
+        rows = list(pending.select_for_update().values_list('pk', 'category_id', 'author_id', 'created_at'))
+        moderated = [pk for pk, _, _, _ in rows]
+        if moderated:
+            Post.objects.filter(pk__in=moderated).update(status=status, updated_at=timezone.now())
+            apply_post_changes(
+                ((category_id, author_id, 'checkout'), (category_id, author_id, status))
+                for _, category_id, author_id, _ in rows
+            )
+            if status == 'published':
+                apply_month_changes((created_at, 1) for _, _, _, created_at in rows)
+
+    if moderated:
+        invalidate_pages()
+        invalidate('post', moderated)
+        posts_moderated.send(sender=Post, post_ids=moderated, status=status)
+    return moderated
@@ -0,0 +1,112 @@
+"""
+Digest emails of new comments for post authors.
+
+Saving a comment only records a CommentNotification row, with one INSERT ... SELECT
+that takes the recipient from the post, so the request never waits for SMTP.
+send_digests() later groups the pending rows per author into one email each and
+sends them all over one SMTP connection. The send_comment_digests command runs it
+every COMMENT_DIGEST_INTERVAL seconds.
+
+Each batch is claimed with SELECT ... FOR UPDATE SKIP LOCKED and its rows are
+deleted in the same transaction once their email is sent, so runs that overlap
+never send the same comments twice. An email that fails keeps its rows for the
+next run.
+"""
+import logging
+from itertools import groupby
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection, transaction
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import CommentNotification, Post
+
+logger = logging.getLogger(__name__)
+
+RECORD_COMMENT = f"""
+    INSERT INTO {CommentNotification._meta.db_table} (recipient_id, comment_id, created_at)
+    SELECT author_id, %s, %s FROM {Post._meta.db_table} WHERE id = %s AND author_id <> %s
+"""
+
+
+def record_comment(comment):
+    """
+    Record a new comment for the author of its post, unless the author wrote it.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(RECORD_COMMENT, [comment.pk, timezone.now(), comment.post_id, comment.user_id])
+
+
+def site_url(path):
+    return f'{settings.DEFAULT_PROTOCOL}://{settings.DEFAULT_DOMAIN}{path}'
+
+
+def digest_message(recipient, notifications, email_connection):
+    """
+    One email listing the comments of the notifications, grouped by post.
+    """
+    posts = []
+    for post, post_notifications in groupby(notifications, key=lambda notification: notification.comment.post):
+        posts.append({
+            'title': post.title,
+            'url': site_url(reverse('detail_post', kwargs={'slug': post.slug})),
+            'comments': [notification.comment for notification in post_notifications],
+        })
+    context = {'recipient': recipient, 'posts': posts, 'count': len(notifications)}
+    return EmailMessage(
+        subject=render_to_string('comment_digest_subject.txt', context).strip(),
+        body=render_to_string('comment_digest.txt', context),
+        to=[recipient.email],
+        connection=email_connection,
+    )
+
+
+def send_digests(batch_size=None):
+    """
+    Send the pending notifications, one email per author, over one SMTP connection.
+
+    Authors are handled batch_size at a time. Returns (emails sent, comments in them).
+    """
+    batch_size = batch_size or settings.COMMENT_DIGEST_BATCH
+    recipient_ids = list(
+        CommentNotification.objects.order_by('recipient_id').values_list('recipient_id', flat=True).distinct()
+    )
+    if not recipient_ids:
+        return 0, 0
+    sent_emails = sent_comments = 0
+    email_connection = get_connection()
+    # Opened once here, send_messages() reuses it for every email
+    with email_connection:
+        for start in range(0, len(recipient_ids), batch_size):
+            # Rows locked by another run are its to send
+            with transaction.atomic():
+                pending = (
+                    CommentNotification.objects.filter(recipient_id__in=recipient_ids[start:start + batch_size])
+                    .select_for_update(skip_locked=True, of=('self',))
+                    .select_related('recipient', 'comment__user', 'comment__post')
+                    .only(
+                        'recipient', 'recipient__email', 'recipient__username',
+                        'comment', 'comment__comment', 'comment__created_at',
+                        'comment__user', 'comment__user__username',
+                        'comment__post', 'comment__post__title', 'comment__post__slug',
+                    )
+                    .order_by('recipient_id', 'comment__post_id', 'id')
+                )
+                done = []
+                for recipient, notifications in groupby(pending, key=lambda notification: notification.recipient):
+                    notifications = list(notifications)
+                    if recipient.email:
+                        try:
+                            email_connection.send_messages([digest_message(recipient, notifications, email_connection)])
+                        except Exception:
+                            logger.exception('Failed to send the comment digest of user %s', recipient.pk)
+                            continue
+                        sent_emails += 1
+                        sent_comments += len(notifications)
+                    # Without an email address there is nowhere to send them
+                    done.extend(notification.pk for notification in notifications)
+                CommentNotification.objects.filter(pk__in=done).delete()
+    return sent_emails, sent_comments
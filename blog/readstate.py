@@ -0,0 +1,120 @@
+"""
+Posts read by a user, stored as one compressed id set per user.
+
+Ids are kept as sorted runs of consecutive ids [start, end). A run is stored as
+two varints: the gap from the end of the previous run and its length, so a
+reader who went through posts 1..5000 costs a few bytes, and scattered reads
+about two to three bytes each. detail_post adds the opened post to the set of
+the user (ReadState), the listings ask read_post_ids() with one row fetch.
+"""
+from bisect import bisect_right
+
+from django.db import transaction
+
+from .models import ReadState
+
+
+def write_varint(value, out):
+    while value >= 0x80:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varints(data):
+    value = shift = 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            yield value
+            value = shift = 0
+    if shift:
+        raise ValueError('Truncated read state')
+
+
+class ReadSet:
+    """
+    A set of post ids as sorted, non-adjacent runs [start, end).
+    """
+
+    def __init__(self, runs=()):
+        self.starts = [start for start, end in runs]
+        self.ends = [end for start, end in runs]
+
+    @classmethod
+    def from_bytes(cls, data):
+        runs, end = [], 0
+        values = read_varints(bytes(data))
+        for gap in values:
+            start = end + gap
+            end = start + next(values)
+            runs.append((start, end))
+        return cls(runs)
+
+    def to_bytes(self):
+        out, previous = bytearray(), 0
+        for start, end in zip(self.starts, self.ends):
+            write_varint(start - previous, out)
+            write_varint(end - start, out)
+            previous = end
+        return bytes(out)
+
+    def __contains__(self, pk):
+        index = bisect_right(self.starts, pk) - 1
+        return index >= 0 and pk < self.ends[index]
+
+    def __len__(self):
+        return sum(end - start for start, end in zip(self.starts, self.ends))
+
+    def add(self, pk):
+        """
+        Add an id, merging it with the neighbouring runs. Returns False if it was already there.
+        """
+        index = bisect_right(self.starts, pk) - 1
+        if index >= 0 and pk < self.ends[index]:
+            return False
+        joins_previous = index >= 0 and self.ends[index] == pk
+        joins_next = index + 1 < len(self.starts) and self.starts[index + 1] == pk + 1
+        if joins_previous and joins_next:
+            self.ends[index] = self.ends.pop(index + 1)
+            del self.starts[index + 1]
+        elif joins_previous:
+            self.ends[index] = pk + 1
+        elif joins_next:
+            self.starts[index + 1] = pk
+        else:
+            self.starts.insert(index + 1, pk)
+            self.ends.insert(index + 1, pk + 1)
+        return True
+
+
+def load(user_id):
+    data = ReadState.objects.filter(user_id=user_id).values_list('posts', flat=True).first()
+    return ReadSet.from_bytes(data) if data is not None else ReadSet()
+
+
+def mark_read(user_id, post_id):
+    """
+    Add the post to the read set of the user. Posts read before cost one SELECT and no write.
+    """
+    if post_id in load(user_id):
+        return False
+    with transaction.atomic():
+        # Locked: two tabs opening posts at once must not drop each other's post
+        state, _ = ReadState.objects.select_for_update().get_or_create(user_id=user_id)
+        read = ReadSet.from_bytes(state.posts)
+        if not read.add(post_id):
+            return False
+        state.posts = read.to_bytes()
+        state.save(update_fields=['posts'])
+    return True
+
+
+def read_post_ids(user_id, post_ids):
+    """
+    Return the ids among post_ids the user has read.
+    """
+    read = load(user_id)
+    return [pk for pk in post_ids if pk in read]
@@ -0,0 +1,211 @@
+"""
+Related posts from TF-IDF cosine similarity.
+
+build_related_posts() vectorizes the titles and plain-text bodies of all published
+posts into a sparse matrix, finds the top-k neighbours of every post in batches and
+stores them in RelatedPost. The vocabulary, IDF weights and matrix are saved to
+RELATED_POSTS_PATH, so update_related_posts() can recompute the neighbours of a
+single saved post without rebuilding everything. Other posts' rows are refreshed
+by the next full build.
+"""
+import html
+import os
+import re
+import threading
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+from scipy import sparse
+from django.conf import settings
+from django.db import transaction
+from django.utils.html import strip_tags
+
+from .models import Post, RelatedPost
+
+WORD = re.compile(r'\w\w+')
+# Title words count as often as this many body words
+TITLE_WEIGHT = 3
+# Similarities computed at once, batch rows x posts
+BATCH_CELLS = 10_000_000
+
+_artifact_lock = threading.Lock()
+_artifact = None
+
+
+def tokens(title, content):
+    words = WORD.findall(html.unescape(strip_tags(content)).lower())
+    return words + WORD.findall(title.lower()) * TITLE_WEIGHT
+
+
+def term_rows(documents, vocabulary, grow):
+    """
+    Term counts of the documents as CSR arrays. With grow, new words are added to the vocabulary.
+    """
+    indptr, indices, counts = [0], [], []
+    for words in documents:
+        row = Counter()
+        for word in words:
+            index = vocabulary.get(word)
+            if index is None:
+                if not grow:
+                    continue
+                index = vocabulary[word] = len(vocabulary)
+            row[index] += 1
+        indices.extend(row.keys())
+        counts.extend(row.values())
+        indptr.append(len(indices))
+    return np.array(indptr, dtype=np.int64), np.array(indices, dtype=np.int64), np.array(counts, dtype=np.float32)
+
+
+def weigh(indptr, indices, counts, idf, shape):
+    """
+    Sublinear TF times IDF, rows scaled to unit length so dot products are cosines.
+    """
+    matrix = sparse.csr_matrix((1 + np.log(counts), indices, indptr), shape=shape, dtype=np.float32)
+    matrix = matrix.multiply(idf.reshape(1, -1)).tocsr()
+    norms = np.sqrt(matrix.multiply(matrix).sum(axis=1)).A1
+    norms[norms == 0] = 1
+    return sparse.diags(1 / norms).dot(matrix).tocsr().astype(np.float32)
+
+
+def top_neighbours(similarities, k):
+    """
+    Column indices and scores of the k highest positive similarities of each row, best first.
+    """
+    k = min(k, similarities.shape[1])
+    if k == 0:
+        return [], []
+    candidates = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+    scores = np.take_along_axis(similarities, candidates, axis=1)
+    order = np.argsort(-scores, axis=1)
+    candidates = np.take_along_axis(candidates, order, axis=1)
+    scores = np.take_along_axis(scores, order, axis=1)
+    return candidates, scores
+
+
+def store(post_ids, neighbours):
+    """
+    Replace the RelatedPost rows of the posts. neighbours: one list of (post id, score) per post.
+    """
+    rows = [
+        RelatedPost(post_id=post_id, related_id=int(related_id), rank=rank, score=float(score))
+        for post_id, related in zip(post_ids, neighbours)
+        for rank, (related_id, score) in enumerate(related)
+    ]
+    with transaction.atomic():
+        RelatedPost.objects.filter(post_id__in=post_ids).delete()
+        RelatedPost.objects.bulk_create(rows)
+
+
+def published_documents():
+    posts = Post.objects.filter(status='published').order_by('pk').values_list('pk', 'title', 'content')
+    post_ids, documents = [], []
+    for pk, title, content in posts.iterator(chunk_size=500):
+        post_ids.append(pk)
+        documents.append(tokens(title, content))
+    return post_ids, documents
+
+
+def build_related_posts(k=None, path=None):
+    """
+    Recompute the related posts of every published post and save the model to path.
+
+    Returns the number of posts processed.
+    """
+    k = k or settings.RELATED_POSTS_COUNT
+    path = Path(path or settings.RELATED_POSTS_PATH)
+    post_ids, documents = published_documents()
+    vocabulary = {}
+    indptr, indices, counts = term_rows(documents, vocabulary, grow=True)
+    del documents
+    total = len(post_ids)
+    if not total:
+        RelatedPost.objects.all().delete()
+        return 0
+
+    document_frequency = np.bincount(indices, minlength=len(vocabulary)).astype(np.float32)
+    idf = np.log((1 + total) / (1 + document_frequency)) + 1
+    matrix = weigh(indptr, indices, counts, idf, (total, len(vocabulary)))
+    ids = np.array(post_ids, dtype=np.int64)
+
+    batch_size = max(1, BATCH_CELLS // max(total, 1))
+    for start in range(0, total, batch_size):
+        end = min(start + batch_size, total)
+        similarities = (matrix[start:end] @ matrix.T).toarray()
+        # A post is not related to itself
+        similarities[np.arange(end - start), np.arange(start, end)] = -1
+        candidates, scores = top_neighbours(similarities, k)
+        store(post_ids[start:end], [
+            [(ids[column], score) for column, score in zip(row, row_scores) if score > 0]
+            for row, row_scores in zip(candidates, scores)
+        ])
+    RelatedPost.objects.exclude(post_id__in=Post.objects.filter(status='published')).delete()
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Replaced in one step: running processes never load a half-written file
+    temporary = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+    with open(temporary, 'wb') as file:
+        np.savez_compressed(
+            file, post_ids=ids, terms=np.array(list(vocabulary), dtype=str), idf=idf,
+            data=matrix.data, indices=matrix.indices, indptr=matrix.indptr, shape=np.array(matrix.shape),
+        )
+    os.replace(temporary, path)
+    return total
+
+
+def load_artifact(path):
+    """
+    The saved model, reloaded when the file changes. None if it was never built.
+    """
+    global _artifact
+    try:
+        mtime = path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+    with _artifact_lock:
+        if _artifact is None or _artifact['key'] != (path, mtime):
+            with np.load(path) as saved:
+                _artifact = {
+                    'key': (path, mtime),
+                    'post_ids': saved['post_ids'],
+                    'vocabulary': {term: index for index, term in enumerate(saved['terms'].tolist())},
+                    'idf': saved['idf'],
+                    'matrix': sparse.csr_matrix(
+                        (saved['data'], saved['indices'], saved['indptr']), shape=tuple(saved['shape']),
+                    ),
+                }
+        return _artifact
+
+
+def update_related_posts(post_id, k=None):
+    """
+    Recompute the related posts of one post against the saved model.
+
+    Does nothing until build_related_posts() has saved a model. Words unknown
+    to the model are ignored until the next full build.
+    """
+    artifact = load_artifact(Path(settings.RELATED_POSTS_PATH))
+    if artifact is None:
+        return
+    post = Post.objects.filter(pk=post_id).values_list('title', 'content', 'status').first()
+    if post is None:
+        return
+    title, content, status = post
+    if status != 'published':
+        RelatedPost.objects.filter(post_id=post_id).delete()
+        return
+
+    vocabulary, idf, matrix = artifact['vocabulary'], artifact['idf'], artifact['matrix']
+    indptr, indices, counts = term_rows([tokens(title, content)], vocabulary, grow=False)
+    vector = weigh(indptr, indices, counts, idf, (1, len(vocabulary)))
+    similarities = (vector @ matrix.T).toarray()
+    similarities[0, artifact['post_ids'] == post_id] = -1
+    k = k or settings.RELATED_POSTS_COUNT
+    # Posts unpublished or deleted since the build are skipped, take spare candidates for them
+    candidates, scores = top_neighbours(similarities, 2 * k)
+    related = [
+        (int(artifact['post_ids'][column]), score) for column, score in zip(candidates[0], scores[0]) if score > 0
+    ]
+    published = set(Post.objects.filter(pk__in=[pk for pk, score in related], status='published').values_list('pk', flat=True))
+    store([post_id], [[(pk, score) for pk, score in related if pk in published][:k]])
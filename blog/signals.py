@@ -0,0 +1,113 @@
+import logging
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver, Signal
+
+from . import autocomplete
+from .cache import invalidate_pages
+from .counters import apply_month_changes, apply_post_changes
+from .events import MAX_PAYLOAD, payload_size, post_channel, publish
+from .invalidation import invalidate
+from .models import Category, Comment, Post
+from .notifications import record_comment
+
+logger = logging.getLogger(__name__)
+
+# Longer comments, and comments whose event is over the NOTIFY limit in bytes, are
+# announced by id only, readers fetch them from post_comments
+LIVE_COMMENT_MAX_LENGTH = 2000
+
+# Sent once per bulk moderation action with post_ids and the new status
+posts_moderated = Signal()
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_page_cache(sender, instance, **kwargs):
+    """
+    Drop cached public pages when a post or a category changes, and what every process caches of it.
+    """
+    invalidate_pages()
+    invalidate(sender._meta.model_name, [instance.pk])
+
+
+@receiver(post_delete, sender=Post)
+def uncount_deleted_post(sender, instance, **kwargs):
+    """
+    Decrement the category, author and month counters of a deleted post.
+
+    A signal rather than Post.delete(), so posts deleted by a cascade are counted too.
+    """
+    apply_post_changes([((instance.category_id, instance.author_id, instance.status), None)])
+    if instance.status == 'published':
+        apply_month_changes([(instance.created_at, -1)])
+
+
+@receiver(post_save, sender=Comment)
+def publish_new_comment(sender, instance, created, **kwargs):
+    """
+    Send a new comment to the live readers of its post once it is committed.
+    """
+    if not created:
+        return
+    channel = post_channel(instance.post_id)
+    data = {'type': 'comment', **instance.to_json()}
+    if len(instance.comment) > LIVE_COMMENT_MAX_LENGTH or payload_size(channel, data) > MAX_PAYLOAD:
+        data = {'type': 'comment', 'id': instance.id}
+    transaction.on_commit(lambda: publish(channel, data))
+
+
+@receiver(post_save, sender=Comment)
+def notify_post_author(sender, instance, created, raw=False, **kwargs):
+    """
+    Record a new comment for the digest email of the post author, see blog/notifications.py.
+    """
+    if created and not raw:
+        record_comment(instance)
+
+
+@receiver(post_save, sender=Post)
+def refresh_related_posts(sender, instance, raw=False, **kwargs):
+    """
+    Recompute the related posts of a saved post once it is committed.
+    """
+    if raw:
+        return
+
+    def refresh():
+        # Imported here: numpy and scipy are only needed once a post is saved
+        from .related import update_related_posts
+        try:
+            update_related_posts(instance.pk)
+        except Exception:
+            logger.exception("Failed to update related posts of post %s", instance.pk)
+
+    transaction.on_commit(refresh)
+
+
+@receiver(post_save, sender=Post)
+def update_autocomplete(sender, instance, raw=False, **kwargs):
+    """
+    Add a saved post to the title autocomplete index, or drop it when it is not published.
+    """
+    if raw:
+        return
+    pk, title, slug, status = instance.pk, instance.title, instance.slug, instance.status
+    transaction.on_commit(lambda: autocomplete.post_changed(pk, title, slug, status))
+
+
+@receiver(post_delete, sender=Post)
+def remove_from_autocomplete(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: autocomplete.post_deleted(pk))
+
+
+@receiver(posts_moderated)
+def update_autocomplete_after_moderation(sender, post_ids, status, **kwargs):
+    if status != 'published' or autocomplete.index.loaded_at is None:
+        return
+    for pk, title, slug in Post.objects.filter(pk__in=post_ids).values_list('pk', 'title', 'slug'):
+        autocomplete.post_changed(pk, title, slug, status)
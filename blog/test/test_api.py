@@ -0,0 +1,109 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from blog.models import Category, Post
+
+
+@override_settings(API_PAGE_SIZE=2, API_MAX_PAGE_SIZE=3)
+class PostApiTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.category = Category.objects.create(title='Test Category', slug='test-category')
+        self.other_category = Category.objects.create(title='Other Category', slug='other-category')
+        self.posts = [
+            Post.objects.create(
+                title=f'Test Post {i}',
+                category=self.category if i % 2 else self.other_category,
+                content=f'Content {i}',
+                slug=f'test-post-{i}',
+                author=self.user,
+                status='published',
+            )
+            for i in range(5)
+        ]
+        Post.objects.create(title='Draft', category=self.category, content='Draft', slug='draft', author=self.user)
+        # Two posts share created_at, the cursor must not skip or repeat either of them
+        now = timezone.now()
+        for i, post in enumerate(self.posts):
+            Post.objects.filter(pk=post.pk).update(created_at=now - timedelta(hours=min(i, 3)))
+        self.url = reverse('api_post_list')
+
+    def collect(self, url):
+        slugs = []
+        while url:
+            data = self.client.get(url).json()
+            slugs.extend(post['slug'] for post in data['results'])
+            url = data['next']
+        return slugs
+
+    def test_pages_follow_cursor(self):
+        # Equal dates are ordered by id, newest first
+        self.assertEqual(self.collect(self.url), ['test-post-0', 'test-post-1', 'test-post-2', 'test-post-4', 'test-post-3'])
+
+    def test_filter_by_category(self):
+        self.assertEqual(self.collect(f'{self.url}?category=test-category'), ['test-post-1', 'test-post-3'])
+        self.assertEqual(self.collect(f'{self.url}?category=other-category'), ['test-post-0', 'test-post-2', 'test-post-4'])
+
+    def test_default_fields_skip_content(self):
+        with self.assertNumQueries(1):
+            post = self.client.get(self.url).json()['results'][0]
+        self.assertNotIn('content', post)
+        self.assertEqual(post['author'], 'testuser')
+        self.assertEqual(post['category'], 'other-category')
+
+    def test_sparse_fields(self):
+        data = self.client.get(self.url, {'fields': 'slug,title'}).json()
+        self.assertEqual(data['results'][0], {'slug': 'test-post-0', 'title': 'Test Post 0'})
+
+    def test_unknown_field(self):
+        response = self.client.get(self.url, {'fields': 'slug,password'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', response.json()['error'])
+
+    def test_content_needs_login(self):
+        self.assertEqual(self.client.get(self.url, {'fields': 'slug,content'}).status_code, 401)
+        self.client.login(username='testuser', password='testpassword')
+        data = self.client.get(self.url, {'fields': 'slug,content'}).json()
+        self.assertEqual(data['results'][0]['content'], 'Content 0')
+
+    def test_limit_is_capped(self):
+        data = self.client.get(self.url, {'limit': 100}).json()
+        self.assertEqual(len(data['results']), 3)
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get(self.url, {'cursor': 'abc'}).status_code, 400)
+
+    def test_etag(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        Post.objects.filter(pk=self.posts[0].pk).update(title='Changed')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_detail(self):
+        url = reverse('api_post_detail', kwargs={'slug': 'test-post-1'})
+        self.assertEqual(self.client.get(url).status_code, 401)
+        self.client.login(username='testuser', password='testpassword')
+        data = self.client.get(url).json()
+        self.assertEqual(data['content'], 'Content 1')
+        self.assertEqual(self.client.get(reverse('api_post_detail', kwargs={'slug': 'draft'})).status_code, 404)
+
+    def test_categories_and_authors(self):
+        categories = self.client.get(reverse('api_category_list')).json()['results']
+        self.assertEqual(
+            [(category['slug'], category['post_count']) for category in categories],
+            [('other-category', 3), ('test-category', 2)],
+        )
+        authors = self.client.get(reverse('api_author_list')).json()
+        self.assertEqual(authors, {'results': [{'username': 'testuser', 'post_count': 5}], 'next': None})
+
+    def test_only_get(self):
+        self.assertEqual(self.client.post(self.url).status_code, 405)
@@ -0,0 +1,135 @@
+import threading
+import time
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from blog import autocomplete
+from blog.models import Category, Post
+from blog.moderation import moderate_posts
+
+
+class PostAutocompleteTest(TestCase):
+    def setUp(self):
+        autocomplete.index.loaded_at = None
+        self.addCleanup(setattr, autocomplete.index, 'loaded_at', None)
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.category = Category.objects.create(title='Test Category', slug='test-category')
+        self.create_post('Django ORM tips', 'django-orm-tips')
+        self.create_post('Швидкий Django', 'shvydkyi-django')
+        self.create_post('Draft about Django', 'draft-django', status='checkout')
+
+    def create_post(self, title, slug, status='published'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Post.objects.create(
+                title=title, slug=slug, category=self.category, content='Test content',
+                author=self.user, status=status,
+            )
+
+    def titles(self, query):
+        response = self.client.get(reverse('post_autocomplete'), {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [result['title'] for result in response.json()['results']]
+
+    def test_prefix_of_title_and_words(self):
+        self.assertEqual(self.titles('dja'), ['Django ORM tips', 'Швидкий Django'])
+        self.assertEqual(self.titles('  ORM   T'), ['Django ORM tips'])
+        self.assertEqual(self.titles('швид'), ['Швидкий Django'])
+        self.assertEqual(self.titles('shvydkyi-'), ['Швидкий Django'])
+        self.assertEqual(self.titles('python'), [])
+        self.assertEqual(self.titles(''), [])
+
+    def test_answers_without_database(self):
+        self.titles('d')
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('post_autocomplete'), {'q': 'django'})
+        self.assertEqual(response.json()['results'][0]['url'], reverse('detail_post', kwargs={'slug': 'django-orm-tips'}))
+
+    def test_limit(self):
+        for number in range(10):
+            self.create_post(f'Django {number}', f'django-{number}')
+        with self.settings(AUTOCOMPLETE_LIMIT=3):
+            self.assertEqual(self.titles('django'), ['Django 0', 'Django 1', 'Django 2'])
+
+    def test_updated_by_signals(self):
+        self.titles('d')
+        post = self.create_post('Deploying with gunicorn', 'deploying')
+        self.assertEqual(self.titles('gun'), ['Deploying with gunicorn'])
+
+        post.title = 'Deploying with uvicorn'
+        with self.captureOnCommitCallbacks(execute=True):
+            post.save()
+        self.assertEqual(self.titles('gun'), [])
+        self.assertEqual(self.titles('uvi'), ['Deploying with uvicorn'])
+
+        post.status = 'rejected'
+        with self.captureOnCommitCallbacks(execute=True):
+            post.save()
+        self.assertEqual(self.titles('uvi'), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.get(slug='django-orm-tips').delete()
+        self.assertEqual(self.titles('orm'), [])
+
+    def test_moderated_posts_are_added(self):
+        self.titles('d')
+        moderate_posts(None, 'published')
+        self.assertIn('Draft about Django', self.titles('draft'))
+
+    def test_reloaded_when_old(self):
+        self.titles('d')
+        Post.objects.filter(slug='django-orm-tips').update(title='Flask tips')
+        self.assertEqual(self.titles('flask'), [])
+        with self.settings(AUTOCOMPLETE_MAX_AGE=-1):
+            self.assertEqual(self.titles('flask'), ['Flask tips'])
+
+
+class PrefixIndexReloadTest(SimpleTestCase):
+    def test_one_thread_reloads(self):
+        index = autocomplete.PrefixIndex()
+        queries = []
+
+        def rows():
+            queries.append(1)
+            # A slow query: the other threads arrive while it runs
+            time.sleep(0.05)
+            return iter([(1, 'Django ORM tips', 'django-orm-tips')])
+
+        barrier = threading.Barrier(10)
+        results = []
+
+        def search():
+            barrier.wait()
+            index.load_if_stale()
+            results.append(index.search('dja', 5))
+
+        with mock.patch.object(autocomplete.Post, 'objects') as objects:
+            objects.filter.return_value.values_list.return_value.iterator.side_effect = rows
+            threads = [threading.Thread(target=search) for _ in range(10)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(results, [[('Django ORM tips', 'django-orm-tips')]] * 10)
+
+    def test_add_during_reload_is_kept(self):
+        index = autocomplete.PrefixIndex()
+        started = threading.Event()
+
+        def rows():
+            started.set()
+            time.sleep(0.05)
+            return iter([])
+
+        with mock.patch.object(autocomplete.Post, 'objects') as objects:
+            objects.filter.return_value.values_list.return_value.iterator.side_effect = rows
+            thread = threading.Thread(target=index.load_if_stale)
+            thread.start()
+            started.wait()
+            # A signal of a post saved while the index loads
+            index.add(2, 'Flask tips', 'flask-tips')
+            thread.join()
+        self.assertEqual(index.search('flask', 5), [('Flask tips', 'flask-tips')])
@@ -0,0 +1,112 @@
+import gzip
+from unittest import mock, skipIf
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils.cache import has_vary_header, patch_vary_headers
+
+from blog.models import Category, Post
+from myblog import compression
+from myblog.compression import compress_response, minify_html
+
+
+class MinifyHtmlTest(SimpleTestCase):
+    def test_indentation_removed_outside_preserved_elements(self):
+        html = (
+            '<div>\n    <p>Текст   з пробілами</p>   \n\n    <pre>  a\n    b</pre>\n'
+            '    <textarea>\n  x\n</textarea>\n    <script>\n  // comment\n  go();\n</script>\n</div>\n'
+        )
+        self.assertEqual(minify_html(html), (
+            '<div>\n<p>Текст   з пробілами</p>\n<pre>  a\n    b</pre>\n'
+            '<textarea>\n  x\n</textarea>\n<script>\n  // comment\n  go();\n</script>\n</div>'
+        ))
+
+
+class CompressResponseTest(SimpleTestCase):
+    def request(self, accept_encoding):
+        return RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept_encoding)
+
+    def test_gzip(self):
+        body = '<p>text</p>\n' * 200
+        response = compress_response(self.request('gzip, deflate'), HttpResponse(body))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content).decode(), body.strip())
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+        self.assertTrue(has_vary_header(response, 'Accept-Encoding'))
+
+    def test_not_accepted(self):
+        response = compress_response(self.request('gzip;q=0, identity'), HttpResponse('<p>text</p>\n' * 200))
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertTrue(has_vary_header(response, 'Accept-Encoding'))
+
+    def test_small_body_and_binary_types_are_skipped(self):
+        response = compress_response(self.request('gzip'), HttpResponse('<p>short</p>'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+        response = compress_response(self.request('gzip'), HttpResponse(b'\0' * 4096, content_type='image/png'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_streaming(self):
+        chunks = [b'line %d\n' % number for number in range(1000)]
+        response = compress_response(self.request('gzip'), StreamingHttpResponse(iter(chunks), content_type='text/plain'))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), b''.join(chunks))
+
+    def test_gzip_length_is_padded(self):
+        body = '<input name="csrfmiddlewaretoken" value="secret">\n' * 50
+        lengths = {len(compress_response(self.request('gzip'), HttpResponse(body)).content) for _ in range(20)}
+        self.assertGreater(len(lengths), 1)
+
+    @skipIf(compression.brotli is None, 'brotli is not installed')
+    def test_per_user_responses_are_not_brotli(self):
+        response = HttpResponse('<p>text</p>\n' * 200)
+        patch_vary_headers(response, ('Cookie',))
+        response = compress_response(self.request('gzip, br'), response)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content).decode(), ('<p>text</p>\n' * 200).strip())
+
+    def test_etag_becomes_weak(self):
+        response = HttpResponse('{"a": 1}' * 200, content_type='application/json')
+        response['ETag'] = '"abc"'
+        response = compress_response(self.request('gzip'), response)
+        self.assertEqual(response['ETag'], 'W/"abc"')
+
+    @skipIf(compression.brotli is None, 'brotli is not installed')
+    def test_brotli_preferred(self):
+        body = '<p>text</p>\n' * 200
+        response = compress_response(self.request('gzip, br'), HttpResponse(body))
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(compression.brotli.decompress(response.content).decode(), body.strip())
+
+        chunks = [b'line %d\n' % number for number in range(1000)]
+        response = StreamingHttpResponse(iter(chunks), content_type='text/plain')
+        response = compress_response(self.request('br'), response)
+        self.assertEqual(compression.brotli.decompress(b''.join(response.streaming_content)), b''.join(chunks))
+
+
+class CompressedPageCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username='testuser', password='testpassword')
+        category = Category.objects.create(title='Test Category', slug='test-category')
+        for number in range(10):
+            Post.objects.create(
+                title=f'Test Post {number}', category=category, content='Test content',
+                slug=f'test-post-{number}', author=user, status='published',
+            )
+
+    def test_cache_stores_compressed_page(self):
+        with mock.patch('myblog.compression.compress', wraps=compression.compress) as compress:
+            first = self.client.get(reverse('index'), HTTP_ACCEPT_ENCODING='gzip, deflate')
+            second = self.client.get(reverse('index'), HTTP_ACCEPT_ENCODING='deflate, gzip')
+        self.assertEqual(compress.call_count, 1)
+        self.assertEqual(second['Content-Encoding'], 'gzip')
+        self.assertEqual(second.content, first.content)
+        self.assertIn('Test Post 9', gzip.decompress(second.content).decode())
+
+        plain = self.client.get(reverse('index'))
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertContains(plain, 'Test Post 9')
+        self.assertIn('\n<main>\n<section class="content">\n', plain.content.decode())
@@ -0,0 +1,111 @@
+import time
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connections
+from django.http import HttpResponse
+from django.test import SimpleTestCase, RequestFactory, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from blog.models import Category, Post
+from myblog.db_router import PIN_COOKIE, PinState, PrimaryReplicaRouter, ReplicaPinningMiddleware, _state
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], REPLICA_PIN_SECONDS=10)
+class PrimaryReplicaRouterTest(SimpleTestCase):
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+        self.factory = RequestFactory()
+        token = _state.set(PinState())
+        self.addCleanup(_state.reset, token)
+
+    def test_reads_go_to_replica(self):
+        self.assertEqual(self.router.db_for_read(Post), 'replica')
+
+    def test_reads_after_write_go_to_primary(self):
+        self.assertEqual(self.router.db_for_write(Post), 'default')
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas(self):
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_migrations_only_on_primary(self):
+        self.assertTrue(self.router.allow_migrate('default', 'blog'))
+        self.assertFalse(self.router.allow_migrate('replica', 'blog'))
+
+    def run_middleware(self, request, write=False):
+        reads = []
+        def view(request):
+            if write:
+                self.router.db_for_write(Post)
+            reads.append(self.router.db_for_read(Post))
+            return HttpResponse()
+        response = ReplicaPinningMiddleware(view)(request)
+        return response, reads[0]
+
+    def test_post_with_write_pins_client(self):
+        response, read = self.run_middleware(self.factory.post('/'), write=True)
+        self.assertEqual(read, 'default')
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+    def test_get_with_write_does_not_pin_client(self):
+        response, _ = self.run_middleware(self.factory.get('/'), write=True)
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_pinned_client_reads_from_primary(self):
+        request = self.factory.get('/')
+        request.COOKIES[PIN_COOKIE] = str(int(time.time()) + 5)
+        _, read = self.run_middleware(request)
+        self.assertEqual(read, 'default')
+
+    def test_expired_pin(self):
+        request = self.factory.get('/')
+        request.COOKIES[PIN_COOKIE] = str(int(time.time()) - 5)
+        _, read = self.run_middleware(request)
+        self.assertEqual(read, 'replica')
+
+
+@skipUnless('replica' in settings.DATABASES, 'needs the replica alias of myblog.test_settings')
+@override_settings(DATABASE_REPLICAS=['replica'], REPLICA_PIN_SECONDS=10)
+class TwoDatabasesTest(TransactionTestCase):
+    # Committed rows: the replica reads through its own connection, like a real one
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.category = Category.objects.create(title='Test Category', slug='test-category')
+        self.post = Post.objects.create(
+            title='Test Post', slug='test-post', category=self.category, content='Test content',
+            author=self.user, status='published',
+        )
+        self.client.login(username='testuser', password='testpassword')
+
+    def queries(self, method, *args, **kwargs):
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            response = method(*args, **kwargs)
+        return response, [query['sql'] for query in primary], [query['sql'] for query in replica]
+
+    def test_get_reads_from_replica(self):
+        response, primary, replica = self.queries(self.client.get, reverse('post_comments', args=['test-post']))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(any('blog_comment' in sql for sql in replica))
+        self.assertFalse(any('blog_comment' in sql for sql in primary))
+
+    def test_comment_post_writes_to_primary_and_pins(self):
+        response, primary, replica = self.queries(
+            self.client.post, reverse('post_comments', args=['test-post']), {'comment': 'Hello'},
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(any(sql.startswith('INSERT INTO "blog_comment"') for sql in primary))
+        self.assertFalse(any(sql.startswith('INSERT') for sql in replica))
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+        # The cookie is kept by the test client: the next reads go to the primary
+        response, primary, replica = self.queries(self.client.get, reverse('post_comments', args=['test-post']))
+        self.assertEqual([comment['comment'] for comment in response.json()['comments']], ['Hello'])
+        self.assertTrue(any('blog_comment' in sql for sql in primary))
+        self.assertEqual(replica, [])
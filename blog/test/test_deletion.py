@@ -0,0 +1,82 @@
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.db.models.signals import post_save
+from django.urls import reverse
+
+from blog.deletion import delete_comments, purge_post
+from blog.models import AuthorStats, Category, Comment, MonthlyPostCount, Post
+
+
+@override_settings(POST_DELETE_CHUNK=3, POST_DELETE_BACKGROUND_COMMENTS=10)
+class PostDeletionTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword', is_staff=True, is_superuser=True)
+        self.category = Category.objects.create(title='Test Category', slug='test-category')
+        self.small = self.create_post('small', comments=7)
+        self.large = self.create_post('large', comments=12)
+        self.client.login(username='testuser', password='testpassword')
+
+    def create_post(self, slug, comments):
+        post = Post.objects.create(
+            title=slug, slug=slug, category=self.category, content='Test content', author=self.user, status='published',
+        )
+        Comment.objects.bulk_create(Comment(post=post, user=self.user, comment=f'{number}') for number in range(comments))
+        return post
+
+    def test_delete_comments_in_chunks(self):
+        with self.assertNumQueries(3):
+            self.assertEqual(delete_comments(self.small.pk), 7)
+        self.assertEqual(Comment.objects.filter(post=self.large).count(), 12)
+
+    def test_small_post_is_deleted_at_once(self):
+        response = self.client.get(reverse('delete_post', kwargs={'pk': self.small.pk}))
+        self.assertRedirects(response, reverse('post_by_author', kwargs={'username': 'testuser'}))
+        self.assertFalse(Post.objects.filter(pk=self.small.pk).exists())
+        self.assertFalse(Comment.objects.filter(post_id=self.small.pk).exists())
+        self.category.refresh_from_db()
+        self.assertEqual((self.category.post_count, self.category.published_count), (1, 1))
+
+    def test_large_post_is_hidden_and_deleted_in_background(self):
+        saved = []
+        receiver = lambda sender, instance, **kwargs: saved.append(instance.pk)
+        post_save.connect(receiver, sender=Post)
+        self.addCleanup(post_save.disconnect, receiver, sender=Post)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client.get(reverse('delete_post', kwargs={'pk': self.large.pk}))
+        # Hidden with an UPDATE: no save path, no related posts recomputed
+        self.assertEqual(saved, [])
+        self.large.refresh_from_db()
+        self.assertEqual(self.large.status, 'deleting')
+        self.assertEqual(self.client.get(reverse('detail_post', kwargs={'slug': 'large'})).status_code, 404)
+        self.assertNotContains(self.client.get(reverse('post_by_author', kwargs={'username': 'testuser'})), 'large')
+        stats = AuthorStats.objects.get(user=self.user)
+        self.assertEqual((stats.post_count, stats.published_count), (2, 1))
+        self.assertEqual(MonthlyPostCount.objects.get().published_count, 1)
+        self.assertTrue(callbacks)
+
+        # The thread's own work, run here: it would not see the test transaction
+        purge_post(self.large.pk)
+        self.assertFalse(Post.objects.filter(pk=self.large.pk).exists())
+        self.assertFalse(Comment.objects.filter(post_id=self.large.pk).exists())
+        stats.refresh_from_db()
+        self.assertEqual((stats.post_count, stats.published_count), (1, 1))
+
+    def test_admin_action(self):
+        changelist = reverse('admin:blog_post_changelist')
+        self.assertNotContains(self.client.get(changelist), 'delete_selected')
+        with self.captureOnCommitCallbacks():
+            self.client.post(changelist, {
+                'action': 'delete_posts_with_comments', '_selected_action': [self.small.pk, self.large.pk],
+            })
+        self.assertFalse(Post.objects.filter(pk=self.small.pk).exists())
+        self.assertEqual(Post.objects.get(pk=self.large.pk).status, 'deleting')
+
+    def test_purge_deleted_posts_command(self):
+        Post.objects.filter(pk=self.large.pk).update(status='deleting')
+        out = StringIO()
+        call_command('purge_deleted_posts', stdout=out)
+        self.assertIn('Deleted 1 posts', out.getvalue())
+        self.assertEqual(list(Post.objects.values_list('slug', flat=True)), ['small'])
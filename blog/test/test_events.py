@@ -0,0 +1,211 @@
+import asyncio
+import json
+import threading
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from unittest import skipUnless
+
+from blog import events
+from blog.analytics import flush_views, record_view
+from blog.models import Category, Comment, Post
+from myblog.asgi import events_application
+
+
+@override_settings(LIVE_EVENTS_BACKEND='local')
+class LocalBusTest(SimpleTestCase):
+    async def test_publish_from_another_thread(self):
+        queue = events.subscribe('post-1')
+        self.addCleanup(events.unsubscribe, 'post-1', queue)
+        other = events.subscribe('post-2')
+        self.addCleanup(events.unsubscribe, 'post-2', other)
+
+        thread = threading.Thread(target=events.publish, args=('post-1', {'type': 'views', 'views': 3}))
+        thread.start()
+        thread.join()
+
+        self.assertEqual(await asyncio.wait_for(queue.get(), 1), {'type': 'views', 'views': 3})
+        self.assertTrue(other.empty())
+
+    async def test_full_queue_drops_events(self):
+        queue = events.subscribe('post-1')
+        self.addCleanup(events.unsubscribe, 'post-1', queue)
+        for views in range(events.SUBSCRIBER_QUEUE_SIZE + 10):
+            events.publish('post-1', {'type': 'views', 'views': views})
+        await asyncio.sleep(0)
+        self.assertEqual(queue.qsize(), events.SUBSCRIBER_QUEUE_SIZE)
+
+    async def test_unsubscribe(self):
+        queue = events.subscribe('post-1')
+        events.unsubscribe('post-1', queue)
+        self.assertNotIn('post-1', events._subscribers)
+
+    def test_payloads_fit_notify_limit(self):
+        batch = [(f'post-{number}', {'type': 'comment', 'comment': 'ї' * 500}) for number in range(40)]
+        payloads = list(events._payloads(batch))
+        self.assertGreater(len(payloads), 1)
+        self.assertTrue(all(len(payload.encode()) <= events.MAX_PAYLOAD for payload in payloads))
+        decoded = [tuple(event) for payload in payloads for event in json.loads(payload)]
+        self.assertEqual(decoded, [(channel, data) for channel, data in batch])
+        self.assertEqual(events.payload_size(*batch[0]), len(next(events._payloads(batch[:1])).encode()))
+        with self.assertRaises(ValueError):
+            list(events._payloads([('post-1', {'type': 'comment', 'comment': 'ї' * events.MAX_PAYLOAD})]))
+
+
+class StreamClient:
+    """
+    Drives an ASGI application like a server would, collecting what it sends.
+    """
+
+    def __init__(self, path, cookie=None):
+        headers = [(b'cookie', cookie.encode())] if cookie else []
+        self.scope = {'type': 'http', 'method': 'GET', 'path': path, 'headers': headers}
+        self.disconnected = asyncio.Event()
+        self.messages = asyncio.Queue()
+
+    async def receive(self):
+        await self.disconnected.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(self, message):
+        await self.messages.put(message)
+
+    def start(self):
+        self.task = asyncio.ensure_future(events_application(self.scope, self.receive, self.send))
+
+    async def next_message(self):
+        return await asyncio.wait_for(self.messages.get(), 2)
+
+    async def next_event(self):
+        while True:
+            body = (await self.next_message())['body']
+            if body.startswith(b'event:'):
+                lines = body.decode().splitlines()
+                return lines[0].split(': ', 1)[1], json.loads(lines[1].split(': ', 1)[1])
+
+    async def close(self):
+        self.disconnected.set()
+        await asyncio.wait_for(self.task, 2)
+
+
+@override_settings(LIVE_EVENTS_BACKEND='local', LIVE_EVENTS_KEEPALIVE=0.05)
+class EventsApplicationTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.category = Category.objects.create(title='Test Category', slug='test-category')
+        self.post = Post.objects.create(
+            title='Test Post',
+            category=self.category,
+            content='This is a test content.',
+            slug='test-post',
+            author=self.user,
+            status='published',
+        )
+        self.client.force_login(self.user)
+        self.cookie = f'sessionid={self.client.cookies["sessionid"].value}'
+        self.path = f'/events/post/{self.post.pk}/'
+
+    def create_comment(self, text):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Comment.objects.create(post=self.post, user=self.user, comment=text)
+
+    async def test_streams_new_comments(self):
+        client = StreamClient(self.path, self.cookie)
+        client.start()
+        start = await client.next_message()
+        self.assertEqual(start['status'], 200)
+        self.assertIn((b'content-type', b'text/event-stream; charset=utf-8'), start['headers'])
+
+        comment = await sync_to_async(self.create_comment)('Live comment')
+        name, data = await client.next_event()
+        self.assertEqual(name, 'comment')
+        self.assertEqual(data['id'], comment.id)
+        self.assertEqual(data['comment'], 'Live comment')
+        self.assertEqual(data['user'], 'testuser')
+
+        await client.close()
+        self.assertNotIn(events.post_channel(self.post.pk), events._subscribers)
+
+    async def test_long_comment_is_sent_by_id(self):
+        client = StreamClient(self.path, self.cookie)
+        client.start()
+        await client.next_message()
+        comment = await sync_to_async(self.create_comment)('a' * 3000)
+        self.assertEqual(await client.next_event(), ('comment', {'type': 'comment', 'id': comment.id}))
+        await client.close()
+
+    async def test_multibyte_comment_over_notify_limit_is_sent_by_id(self):
+        client = StreamClient(self.path, self.cookie)
+        client.start()
+        await client.next_message()
+        # Under LIVE_COMMENT_MAX_LENGTH characters, but four bytes each
+        comment = await sync_to_async(self.create_comment)('😀' * 2000)
+        self.assertEqual(await client.next_event(), ('comment', {'type': 'comment', 'id': comment.id}))
+        await client.close()
+
+    @skipUnless(connection.vendor == 'postgresql', 'NOTIFY needs PostgreSQL')
+    def test_multibyte_comment_is_notified(self):
+        with override_settings(LIVE_EVENTS_BACKEND='postgres'), self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/post/{self.post.slug}/comments/', {'comment': '😀' * 2000})
+        self.assertEqual(response.status_code, 201)
+
+    async def test_keep_alive(self):
+        client = StreamClient(self.path, self.cookie)
+        client.start()
+        await client.next_message()
+        bodies = [(await client.next_message())['body'] for _ in range(2)]
+        self.assertEqual(bodies, [b'retry: 5000\n\n', b': keep-alive\n\n'])
+        await client.close()
+
+    async def test_streams_view_counts_on_flush(self):
+        client = StreamClient(self.path, self.cookie)
+        client.start()
+        await client.next_message()
+
+        def view():
+            Post.objects.filter(pk=self.post.pk).update(views=7)
+            record_view(self.post.pk)
+            flush_views()
+
+        await sync_to_async(view)()
+        self.assertEqual(await client.next_event(), ('views', {'type': 'views', 'views': 7}))
+        await client.close()
+
+    async def test_anonymous_reader(self):
+        client = StreamClient(self.path)
+        client.start()
+        self.assertEqual((await client.next_message())['status'], 401)
+        await client.close()
+
+    async def test_unknown_post(self):
+        client = StreamClient(f'/events/post/{self.post.pk + 100}/', self.cookie)
+        client.start()
+        self.assertEqual((await client.next_message())['status'], 404)
+        await client.close()
+
+
+@skipUnless(connection.vendor == 'postgresql', 'LISTEN/NOTIFY needs PostgreSQL')
+@override_settings(LIVE_EVENTS_BACKEND='local')
+class PostgresListenerTest(SimpleTestCase):
+    databases = {'default'}
+
+    async def test_dispatches_notifications(self):
+        queue = events.subscribe('post-1')
+        self.addCleanup(events.unsubscribe, 'post-1', queue)
+        listener = events.PostgresListener()
+        listener.start()
+        self.addCleanup(listener.stop)
+        self.assertTrue(await asyncio.to_thread(listener.ready.wait, 5))
+
+        def notify():
+            raw = connection.get_new_connection(connection.get_connection_params())
+            raw.autocommit = True
+            with raw.cursor() as cursor:
+                payload = next(events._payloads([('post-1', {'type': 'views', 'views': 5})]))
+                cursor.execute('SELECT pg_notify(%s, %s)', [events.NOTIFY_CHANNEL, payload])
+            raw.close()
+
+        await asyncio.to_thread(notify)
+        self.assertEqual(await asyncio.wait_for(queue.get(), 5), {'type': 'views', 'views': 5})
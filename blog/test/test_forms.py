@@ -39,6 +39,11 @@ class CreatePostFormTest(TestCase):
         self.assertFalse(form.is_valid())
         self.assertIn('title', form.errors)
 
+    def test_content_uses_ckeditor_widget(self):
+        form = CreatePostForm()
+        self.assertEqual(type(form.fields['content'].widget).__name__, 'CKEditorWidget')
+        self.assertIn('ckeditor', str(form.media))
+
     def test_for_not_staff_user(self):
         self.user.is_staff = False
         self.user.save()
@@ -0,0 +1,134 @@
+import asyncio
+import json
+from unittest import mock, skipUnless
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from blog import autocomplete, events, invalidation
+from blog.cache import get_generation
+from blog.models import Category, Post
+
+
+def remote(topic, keys=None):
+    events.dispatch([(invalidation.CHANNEL, {'topic': topic, 'keys': keys, 'origin': 'other-host:1'})])
+
+
+class LocalCacheTest(SimpleTestCase):
+    # invalidate() registers a callback for the end of the transaction
+    databases = {'default'}
+
+    def setUp(self):
+        self.cache = invalidation.LocalCache('test', topics=('test-topic',))
+        self.addCleanup(invalidation._caches['test-topic'].remove, self.cache)
+        self.cache.set('answer', 42)
+        self.calls = []
+        invalidation.listen('test-topic', self.calls.append)
+        self.addCleanup(invalidation._handlers['test-topic'].remove, self.calls.append)
+
+    def test_invalidate_clears_local_caches_of_the_topic(self):
+        invalidation.invalidate('other-topic', [1])
+        self.assertEqual(self.cache.get('answer'), 42)
+        invalidation.invalidate('test-topic', [1])
+        self.assertIsNone(self.cache.get('answer'))
+        # Handlers are for changes made elsewhere
+        self.assertEqual(self.calls, [])
+
+    def test_message_of_another_process(self):
+        remote('test-topic', [1, 2])
+        self.assertIsNone(self.cache.get('answer'))
+        self.assertEqual(self.calls, [[1, 2]])
+
+    def test_own_messages_are_ignored(self):
+        events.dispatch([(invalidation.CHANNEL, {'topic': 'test-topic', 'keys': None, 'origin': invalidation.origin()})])
+        self.assertEqual(self.calls, [])
+
+    def test_reconnect_clears_everything(self):
+        events._reconnected()
+        self.assertIsNone(self.cache.get('answer'))
+        self.assertIn(None, self.calls)
+
+    def test_get_or_set(self):
+        self.assertEqual(self.cache.get_or_set('computed', lambda: 'value'), 'value')
+        self.assertEqual(self.cache.get_or_set('computed', lambda: 'other'), 'value')
+
+
+class RemoteInvalidationTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.category = Category.objects.create(title='Test Category', slug='test-category')
+
+    def test_change_elsewhere_bumps_local_page_generation(self):
+        generation = get_generation()
+        remote('post', [1])
+        self.assertNotEqual(get_generation(), generation)
+
+    def test_navigation_rebuilt_after_remote_change(self):
+        url = reverse('post_by_category', kwargs={'slug': 'test-category'})
+        self.assertContains(self.client.get(url), 'Test Category')
+        # Written by another process: no signal ran here
+        Category.objects.filter(pk=self.category.pk).update(title='Renamed')
+        self.assertNotContains(self.client.get(url), 'Renamed')
+        remote('category', [self.category.pk])
+        self.assertContains(self.client.get(url), 'Renamed')
+
+    @skipUnless(connection.vendor == 'postgresql', 'NOTIFY needs PostgreSQL')
+    def test_many_keys_are_split_under_notify_limit(self):
+        keys = list(range(100000, 102500))
+        with override_settings(LIVE_EVENTS_BACKEND='postgres'), \
+                mock.patch.object(events, '_payloads', wraps=events._payloads) as payloads:
+            invalidation.invalidate('post', keys)
+        sent = list(events._payloads(payloads.call_args.args[0]))
+        self.assertGreater(len(sent), 1)
+        self.assertTrue(all(len(payload.encode()) <= events.MAX_PAYLOAD for payload in sent))
+        received = [key for payload in sent for _, data in json.loads(payload) for key in data['keys']]
+        self.assertEqual(received, keys)
+
+    def test_autocomplete_reloads_changed_posts_only(self):
+        autocomplete.index.loaded_at = None
+        self.addCleanup(setattr, autocomplete.index, 'loaded_at', None)
+        autocomplete.suggest('django')
+        # Committed by another process: the on_commit callbacks of this test never run
+        post = Post.objects.create(
+            title='Django from elsewhere', slug='django-elsewhere', category=self.category,
+            content='Test content', author=self.user, status='published',
+        )
+        self.assertEqual(autocomplete.suggest('django'), [])
+        remote('post', [post.pk])
+        with self.assertNumQueries(1):
+            self.assertEqual(autocomplete.suggest('django'), [('Django from elsewhere', 'django-elsewhere')])
+        with self.assertNumQueries(0):
+            autocomplete.suggest('django')
+
+
+@skipUnless(connection.vendor == 'postgresql', 'LISTEN/NOTIFY needs PostgreSQL')
+@override_settings(LIVE_EVENTS_BACKEND='local')
+class PostgresInvalidationTest(SimpleTestCase):
+    databases = {'default'}
+
+    async def test_notification_clears_local_cache(self):
+        cache = invalidation.LocalCache('test', topics=('test-topic',))
+        self.addCleanup(invalidation._caches['test-topic'].remove, cache)
+        listener = events.PostgresListener()
+        listener.start()
+        self.addCleanup(listener.stop)
+        self.assertTrue(await asyncio.to_thread(listener.ready.wait, 5))
+        cache.set('answer', 42)
+
+        def notify():
+            raw = connection.get_new_connection(connection.get_connection_params())
+            raw.autocommit = True
+            with raw.cursor() as cursor:
+                data = {'topic': 'test-topic', 'keys': [1], 'origin': 'other-host:1'}
+                payload = next(events._payloads([(invalidation.CHANNEL, data)]))
+                cursor.execute('SELECT pg_notify(%s, %s)', [events.NOTIFY_CHANNEL, payload])
+            raw.close()
+
+        await asyncio.to_thread(notify)
+        for _ in range(50):
+            if cache.get('answer') is None:
+                break
+            await asyncio.sleep(0.1)
+        self.assertIsNone(cache.get('answer'))
@@ -0,0 +1,76 @@
+import gzip
+import logging
+import os
+import tempfile
+from pathlib import Path
+
+from django.test import SimpleTestCase
+from myblog.log_handlers import CompressedRotatingFileHandler, QueueFileHandler
+
+
+class CompressedRotatingFileHandlerTest(SimpleTestCase):
+    def setUp(self):
+        self.log_dir = tempfile.TemporaryDirectory()
+        self.filename = Path(self.log_dir.name) / 'logs.log'
+
+    def tearDown(self):
+        self.log_dir.cleanup()
+
+    def test_rotates_by_size_and_compresses(self):
+        handler = CompressedRotatingFileHandler(self.filename, max_bytes=100, backup_count=10)
+        handler.write_batch(['a' * 80 + '\n'])
+        handler.write_batch(['b' * 80 + '\n'])
+        handler.close()
+
+        self.assertEqual(self.filename.read_text(), 'b' * 80 + '\n')
+        backups = list(Path(self.log_dir.name).glob('logs.log.*.gz'))
+        self.assertEqual(len(backups), 1)
+        with gzip.open(backups[0], 'rt') as backup:
+            self.assertEqual(backup.read(), 'a' * 80 + '\n')
+
+    def test_rotates_by_time(self):
+        handler = CompressedRotatingFileHandler(self.filename, when_seconds=60)
+        handler.write_batch(['old\n'])
+        os.utime(self.filename, (0, 0))
+        handler.write_batch(['new\n'])
+        handler.close()
+
+        self.assertEqual(self.filename.read_text(), 'new\n')
+        self.assertEqual(len(list(Path(self.log_dir.name).glob('logs.log.*.gz'))), 1)
+
+    def test_keeps_backup_count(self):
+        handler = CompressedRotatingFileHandler(self.filename, max_bytes=10, backup_count=2)
+        for line in range(5):
+            handler.write_batch([f'line {line} of the log\n'])
+        handler.close()
+        self.assertEqual(len(list(Path(self.log_dir.name).glob('logs.log.*.gz'))), 2)
+
+    def test_reopens_file_rotated_by_another_process(self):
+        handler = CompressedRotatingFileHandler(self.filename)
+        handler.write_batch(['first\n'])
+        os.rename(self.filename, str(self.filename) + '.other')
+        handler.write_batch(['second\n'])
+        handler.close()
+        self.assertEqual(self.filename.read_text(), 'second\n')
+
+
+class QueueFileHandlerTest(SimpleTestCase):
+    def test_records_are_written_by_listener(self):
+        with tempfile.TemporaryDirectory() as log_dir:
+            filename = Path(log_dir) / 'logs.log'
+            handler = QueueFileHandler(filename)
+            handler.setFormatter(logging.Formatter('%(levelname)s %(message)s'))
+            logger = logging.getLogger('blog.test.queue')
+            logger.propagate = False
+            logger.addHandler(handler)
+            try:
+                for line in range(100):
+                    logger.warning('line %s', line)
+                handler.flush()
+            finally:
+                logger.removeHandler(handler)
+                handler.close()
+
+            lines = filename.read_text().splitlines()
+            self.assertEqual(len(lines), 100)
+            self.assertEqual(lines[0], 'WARNING line 0')
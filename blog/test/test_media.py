@@ -0,0 +1,74 @@
+import tempfile
+from pathlib import Path
+
+from django.test import SimpleTestCase, override_settings
+
+
+class ServeMediaTest(SimpleTestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.root = Path(media_root.name)
+        (self.root / 'uploads').mkdir()
+        self.data = bytes(range(256)) * 40
+        (self.root / 'uploads' / 'image.png').write_bytes(self.data)
+        (self.root.parent / 'secret.txt').touch()
+        settings = override_settings(MEDIA_ROOT=str(self.root), MEDIA_SENDFILE='')
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.url = '/media/uploads/image.png'
+
+    def test_whole_file(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.data)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertEqual(response['Content-Length'], str(len(self.data)))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('Last-Modified', response)
+
+    def test_range(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=100-199')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), self.data[100:200])
+        self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(self.data)}')
+        self.assertEqual(response['Content-Length'], '100')
+
+    def test_open_and_suffix_ranges(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10000-')
+        self.assertEqual(b''.join(response.streaming_content), self.data[10000:])
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-24')
+        self.assertEqual(b''.join(response.streaming_content), self.data[-24:])
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={len(self.data)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.data)}')
+
+    def test_if_range_mismatch_sends_whole_file(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"other"')
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, 206)
+
+    def test_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_outside_media_root(self):
+        self.assertEqual(self.client.get('/media/../secret.txt').status_code, 404)
+        self.assertEqual(self.client.get('/media/uploads/missing.png').status_code, 404)
+        self.assertEqual(self.client.get('/media/uploads').status_code, 404)
+
+    @override_settings(MEDIA_SENDFILE='x-accel-redirect', MEDIA_ACCEL_PREFIX='/protected-media/')
+    def test_x_accel_redirect(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/uploads/image.png')
+        self.assertEqual(response.content, b'')
+
+    @override_settings(MEDIA_SENDFILE='x-sendfile')
+    def test_x_sendfile(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Sendfile'], str(self.root / 'uploads' / 'image.png'))
@@ -0,0 +1,49 @@
+import json
+import tempfile
+from pathlib import Path
+
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from django.contrib.auth.models import User
+from blog.models import Category, Post
+
+
+class ProfilingMiddlewareTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.category = Category.objects.create(title='Test Category', slug='test-category')
+        Post.objects.create(
+            title='Test Post',
+            category=self.category,
+            content='This is a test content.',
+            slug='test-post',
+            author=self.user,
+            status='published'
+        )
+
+    @override_settings(PROFILING_SAMPLE_RATE=1.0, PAGE_CACHE_TIMEOUT=0)
+    def test_sampled_request_is_logged(self):
+        with self.assertLogs('blog.profiling', level='INFO') as logs:
+            response = Client().get(reverse('index'))
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['url_name'], 'index')
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['sql_count'], 0)
+        self.assertGreater(record['template_ms'], 0)
+        self.assertEqual(record['response_bytes'], len(response.content))
+
+    @override_settings(PROFILING_SAMPLE_RATE=0.0)
+    def test_disabled_when_not_sampled(self):
+        with self.assertNoLogs('blog.profiling', level='INFO'):
+            Client().get(reverse('index'))
+
+    def test_keeps_slowest_profiles(self):
+        with tempfile.TemporaryDirectory() as profile_dir:
+            with override_settings(PROFILING_SAMPLE_RATE=1.0, PROFILING_CPROFILE_TOP=2,
+                                   PROFILING_CPROFILE_DIR=profile_dir, PAGE_CACHE_TIMEOUT=0):
+                client = Client()
+                with self.assertLogs('blog.profiling', level='INFO'):
+                    for _ in range(4):
+                        client.get(reverse('index'))
+            self.assertEqual(len(list(Path(profile_dir).glob('index-*.prof'))), 2)
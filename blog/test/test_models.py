@@ -1,7 +1,17 @@
 from django.test import TestCase
-from blog.models import Category,Post, Comment
+from blog.models import Category,Post, Comment, PostDailyViews, AuthorStats, MonthlyPostCount
+from blog.moderation import moderate_posts
+from django.core.management import call_command
+from io import StringIO
+from blog.analytics import record_view, flush_views
+from django.utils import timezone
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.models import ProtectedError
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from blog import fields
 
 class CategoryModelTest(TestCase):
     def setUp(self):
@@ -24,6 +34,53 @@ class CategoryModelTest(TestCase):
     def test_auto_slug_category(self):
         self.assertTrue(self.category.slug)
 
+class CategoryTreeTest(TestCase):
+    def setUp(self):
+        self.root = Category.objects.create(title='Root', slug='root')
+        self.child = Category.objects.create(title='Child', slug='child', parent=self.root)
+        self.leaf = Category.objects.create(title='Leaf', slug='leaf', parent=self.child)
+        self.other = Category.objects.create(title='Other', slug='other')
+
+    def paths(self):
+        return dict(Category.objects.values_list('slug', 'path'))
+
+    def test_paths(self):
+        self.assertEqual(self.paths(), {
+            'root': f'{self.root.pk}/',
+            'child': f'{self.root.pk}/{self.child.pk}/',
+            'leaf': f'{self.root.pk}/{self.child.pk}/{self.leaf.pk}/',
+            'other': f'{self.other.pk}/',
+        })
+        self.assertEqual(self.leaf.depth, 2)
+        self.assertEqual(set(self.root.subtree().values_list('slug', flat=True)), {'root', 'child', 'leaf'})
+
+    def test_category_with_subcategories_is_protected(self):
+        with self.assertRaises(ProtectedError):
+            self.root.delete()
+        self.assertEqual(Category.objects.count(), 4)
+        self.leaf.delete()
+        self.assertFalse(Category.objects.filter(pk=self.leaf.pk).exists())
+
+    def test_move_subtree_in_one_update(self):
+        self.child.parent = self.other
+        with CaptureQueriesContext(connection) as queries:
+            self.child.save()
+        self.assertEqual(sum('SET "path"' in query['sql'] for query in queries.captured_queries), 1)
+        self.assertEqual(self.paths()['leaf'], f'{self.other.pk}/{self.child.pk}/{self.leaf.pk}/')
+        self.assertEqual(self.paths()['root'], f'{self.root.pk}/')
+
+        self.child.parent = None
+        self.child.save()
+        self.assertEqual(self.paths()['leaf'], f'{self.child.pk}/{self.leaf.pk}/')
+
+    def test_cannot_move_under_itself(self):
+        self.root.parent = self.leaf
+        with self.assertRaises(ValidationError):
+            self.root.full_clean()
+        with self.assertRaises(ValueError):
+            self.root.save()
+        self.assertEqual(self.paths()['root'], f'{self.root.pk}/')
+
 class PostModelTest(TestCase):
     def setUp(self):
         self.author = User.objects.create_user(username = 'testuser', password = 'testpassword')
@@ -104,3 +161,187 @@ class CommentModelTest(TestCase):
 
     def test_comment_post_relation(self):
         self.assertEqual(self.comment.post, self.post)
+
+class PostDailyViewsTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username = 'testuser', password = 'testpassword')
+        self.category = Category.objects.create(title = 'Test category')
+        self.post = Post.objects.create(
+            title = "test title",
+            content = "test content",
+            category = self.category,
+            author = self.author,
+            status = 'published',
+        )
+        flush_views()
+
+    def test_flush_creates_daily_row(self):
+        for _ in range(3):
+            record_view(self.post.pk)
+        self.assertEqual(flush_views(), 1)
+
+        daily = PostDailyViews.objects.get(post = self.post)
+        self.assertEqual(daily.day, timezone.localdate())
+        self.assertEqual(daily.count, 3)
+
+    def test_flush_adds_to_existing_row(self):
+        record_view(self.post.pk)
+        flush_views()
+        record_view(self.post.pk)
+        record_view(self.post.pk)
+        flush_views()
+
+        self.assertEqual(PostDailyViews.objects.count(), 1)
+        self.assertEqual(PostDailyViews.objects.get(post = self.post).count, 3)
+
+    def test_flush_skips_deleted_posts(self):
+        record_view(self.post.pk)
+        self.post.delete()
+        flush_views()
+        self.assertEqual(PostDailyViews.objects.count(), 0)
+
+    def test_empty_flush(self):
+        self.assertEqual(flush_views(), 0)
+
+class PostCountersTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username = 'testuser', password = 'testpassword')
+        self.category = Category.objects.create(title = 'Test category')
+        self.category2 = Category.objects.create(title = 'Category 2')
+        self.post = Post.objects.create(
+            title = "test title",
+            content = "test content",
+            category = self.category,
+            author = self.author,
+        )
+
+    def assertCounts(self, category, posts, published):
+        category.refresh_from_db()
+        self.assertEqual((category.post_count, category.published_count), (posts, published))
+
+    def assertAuthorCounts(self, posts, published):
+        stats = AuthorStats.objects.get(user = self.author)
+        self.assertEqual((stats.post_count, stats.published_count), (posts, published))
+
+    def test_created_post_is_counted(self):
+        self.assertCounts(self.category, 1, 0)
+        self.assertAuthorCounts(1, 0)
+
+    def test_status_change(self):
+        self.post.status = 'published'
+        self.post.save()
+        self.assertCounts(self.category, 1, 1)
+        self.assertAuthorCounts(1, 1)
+
+        post = Post.objects.get(pk = self.post.pk)
+        post.status = 'checkout'
+        post.save()
+        self.assertCounts(self.category, 1, 0)
+        self.assertAuthorCounts(1, 0)
+
+    def test_category_change(self):
+        self.post.category = self.category2
+        self.post.save()
+        self.assertCounts(self.category, 0, 0)
+        self.assertCounts(self.category2, 1, 0)
+
+    def test_delete(self):
+        self.post.delete()
+        self.assertCounts(self.category, 0, 0)
+        self.assertAuthorCounts(0, 0)
+
+    def test_category_save_keeps_counters(self):
+        category = Category.objects.get(pk = self.category.pk)
+        Post.objects.create(title = "second", content = "test content", category = self.category, author = self.author)
+        category.title = 'Renamed'
+        category.save()
+        self.assertCounts(self.category, 2, 0)
+
+    def test_bulk_moderation(self):
+        moderate_posts([self.post.pk], 'published')
+        self.assertCounts(self.category, 1, 1)
+        self.assertAuthorCounts(1, 1)
+
+    def test_author_cascade_delete(self):
+        self.author.delete()
+        self.assertCounts(self.category, 0, 0)
+        self.assertFalse(AuthorStats.objects.exists())
+
+    def test_reconcile_fixes_drift(self):
+        Category.objects.filter(pk = self.category.pk).update(post_count = 10, published_count = 5)
+        AuthorStats.objects.all().delete()
+        call_command('reconcile_counters', stdout = StringIO())
+        self.assertCounts(self.category, 1, 0)
+        self.assertAuthorCounts(1, 0)
+
+    def monthly_counts(self):
+        return dict(MonthlyPostCount.objects.values_list('month', 'published_count'))
+
+    def test_monthly_counts(self):
+        month = timezone.localdate().replace(day = 1)
+        self.assertEqual(self.monthly_counts(), {})
+        moderate_posts([self.post.pk], 'published')
+        self.assertEqual(self.monthly_counts(), {month: 1})
+
+        second = Post.objects.create(
+            title = "second", content = "test content", category = self.category, author = self.author, status = 'published',
+        )
+        self.assertEqual(self.monthly_counts(), {month: 2})
+        second.title = 'Renamed'
+        second.save()
+        self.assertEqual(self.monthly_counts(), {month: 2})
+
+        second.status = 'rejected'
+        second.save()
+        self.assertEqual(self.monthly_counts(), {month: 1})
+        self.post.refresh_from_db()
+        self.post.delete()
+        self.assertEqual(self.monthly_counts(), {month: 0})
+
+    def test_reconcile_fixes_monthly_counts(self):
+        moderate_posts([self.post.pk], 'published')
+        old_month = timezone.localdate().replace(year = 2020, day = 1)
+        MonthlyPostCount.objects.all().update(published_count = 7)
+        MonthlyPostCount.objects.create(month = old_month, published_count = 3)
+        call_command('reconcile_counters', stdout = StringIO())
+        self.assertEqual(self.monthly_counts(), {timezone.localdate().replace(day = 1): 1, old_month: 0})
+
+
+class CompressedContentTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.category = Category.objects.create(title='Test Category', slug='test-category')
+        self.content = '<p>Освітні тренди та новини EdEra.</p>' * 500
+
+    def create_post(self, content):
+        return Post.objects.create(title=f'Post {len(content)}', category=self.category, content=content,
+                                   slug=f'post-{len(content)}', author=self.user)
+
+    def stored(self, post):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT content FROM blog_post WHERE id = %s', [post.pk])
+            return bytes(cursor.fetchone()[0])
+
+    def test_long_content_is_compressed(self):
+        post = self.create_post(self.content)
+        stored = self.stored(post)
+        self.assertEqual(stored[:1], fields.ZLIB)
+        self.assertLess(len(stored), len(self.content.encode()) / 10)
+        self.assertEqual(Post.objects.get(pk=post.pk).content, self.content)
+        self.assertEqual(Post.objects.values_list('content', flat=True).get(pk=post.pk), self.content)
+
+    def test_short_content_is_stored_raw(self):
+        post = self.create_post('<p>Коротко</p>')
+        self.assertEqual(self.stored(post), fields.RAW + '<p>Коротко</p>'.encode())
+        self.assertEqual(Post.objects.get(pk=post.pk).content, '<p>Коротко</p>')
+
+    def test_rows_stay_readable_when_codec_changes(self):
+        post = self.create_post(self.content)
+        with override_settings(POST_CONTENT_CODEC='zstd'):
+            self.assertEqual(Post.objects.get(pk=post.pk).content, self.content)
+            post.save()
+        self.assertEqual(Post.objects.get(pk=post.pk).content, self.content)
+
+    def test_unknown_codec(self):
+        with self.assertRaises(ValueError):
+            fields.decompress(b'\x09data')
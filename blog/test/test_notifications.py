@@ -0,0 +1,189 @@
+import email
+import socketserver
+import threading
+from io import StringIO
+from unittest import skipUnless
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from blog.deletion import delete_comments
+from blog.models import Category, Comment, CommentNotification, Post
+from blog.notifications import send_digests
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    """
+    A local SMTP server keeping the messages it receives and counting connections.
+    """
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), SMTPHandler)
+        self.messages = []
+        self.connections = 0
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply('220 sink ready')
+        recipients = []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode().strip().upper()
+            if command.startswith(('EHLO', 'HELO')):
+                self.reply('250 sink')
+            elif command.startswith('RCPT'):
+                recipients.append(line.decode().split(':', 1)[1].strip().strip('<>'))
+                self.reply('250 OK')
+            elif command == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                data = []
+                for data_line in iter(self.rfile.readline, b''):
+                    if data_line == b'.\r\n':
+                        break
+                    data.append(data_line[1:] if data_line.startswith(b'..') else data_line)
+                self.server.messages.append((recipients, email.message_from_bytes(b''.join(data))))
+                recipients = []
+                self.reply('250 OK')
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                # MAIL, RSET, NOOP
+                self.reply('250 OK')
+
+
+class NotificationFixtures:
+    def setUp(self):
+        self.sink = SMTPSink()
+        self.addCleanup(self.sink.stop)
+        smtp = override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend', EMAIL_HOST='127.0.0.1',
+            EMAIL_PORT=self.sink.port, EMAIL_USE_TLS=False, EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD='',
+        )
+        smtp.enable()
+        self.addCleanup(smtp.disable)
+
+        self.reader = User.objects.create_user(username='reader', password='testpassword')
+        self.author = User.objects.create_user(username='author', password='testpassword', email='author@example.com')
+        self.other = User.objects.create_user(username='other', password='testpassword', email='other@example.com')
+        self.category = Category.objects.create(title='Test Category', slug='test-category')
+        self.first = self.create_post('first', self.author)
+        self.second = self.create_post('second', self.author)
+        self.third = self.create_post('third', self.other)
+
+    def create_post(self, slug, author):
+        return Post.objects.create(
+            title=f'Post {slug}', slug=slug, category=self.category, content='Test content', author=author,
+            status='published',
+        )
+
+    def comment(self, post, user, text='Nice post'):
+        return Comment.objects.create(post=post, user=user, comment=text)
+
+
+class CommentNotificationTest(NotificationFixtures, TestCase):
+    def test_comment_is_recorded_with_one_query(self):
+        with self.assertNumQueries(2):
+            comment = self.comment(self.first, self.reader)
+        notification = CommentNotification.objects.get()
+        self.assertEqual((notification.recipient, notification.comment), (self.author, comment))
+        # Authors are not told about their own comments
+        self.comment(self.first, self.author)
+        self.assertEqual(CommentNotification.objects.count(), 1)
+
+    def test_comments_via_view_are_recorded(self):
+        self.client.login(username='reader', password='testpassword')
+        response = self.client.post(f'/post/{self.first.slug}/comments/', {'comment': 'Hello'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(CommentNotification.objects.get().recipient, self.author)
+
+    def test_digest_per_author_over_one_connection(self):
+        self.comment(self.first, self.reader, 'First comment')
+        self.comment(self.second, self.reader, 'Second comment')
+        self.comment(self.first, self.other, 'Third comment')
+        self.comment(self.third, self.reader, 'Fourth comment')
+
+        self.assertEqual(send_digests(batch_size=1), (2, 4))
+        self.assertEqual(self.sink.connections, 1)
+        by_recipient = {recipients[0]: message for recipients, message in self.sink.messages}
+        self.assertEqual(set(by_recipient), {'author@example.com', 'other@example.com'})
+        body = by_recipient['author@example.com'].get_payload(decode=True).decode()
+        for text in ['Post first', 'Post second', 'First comment', 'Second comment', 'Third comment', '/post/first/']:
+            self.assertIn(text, body)
+        self.assertNotIn('Fourth comment', body)
+        self.assertEqual(body.count('Post first'), 1)
+        self.assertFalse(CommentNotification.objects.exists())
+
+        # Nothing pending: no connection at all
+        self.assertEqual(send_digests(), (0, 0))
+        self.assertEqual(self.sink.connections, 1)
+
+    def test_authors_without_email_are_skipped(self):
+        no_email = self.create_post('no-email', self.reader)
+        self.comment(no_email, self.other)
+        self.assertEqual(send_digests(), (0, 0))
+        self.assertEqual(self.sink.messages, [])
+        self.assertFalse(CommentNotification.objects.exists())
+
+    def test_command(self):
+        self.comment(self.first, self.reader)
+        out = StringIO()
+        call_command('send_comment_digests', stdout=out)
+        self.assertEqual(out.getvalue().strip(), 'Sent 1 digests with 1 comments')
+        self.assertEqual(len(self.sink.messages), 1)
+
+    def test_chunked_comment_deletion_drops_notifications(self):
+        for number in range(5):
+            self.comment(self.first, self.reader, f'{number}')
+        self.comment(self.second, self.reader)
+        with override_settings(POST_DELETE_CHUNK=2):
+            self.assertEqual(delete_comments(self.first.pk), 5)
+        self.assertEqual(CommentNotification.objects.count(), 1)
+
+
+@skipUnless(connection.features.has_select_for_update_skip_locked, 'needs SELECT ... FOR UPDATE SKIP LOCKED')
+class OverlappingDigestsTest(NotificationFixtures, TransactionTestCase):
+    def test_rows_claimed_by_another_run_are_skipped(self):
+        self.comment(self.first, self.reader, 'First comment')
+        self.comment(self.third, self.reader, 'Second comment')
+        claimed, release = threading.Event(), threading.Event()
+
+        def other_run():
+            # Holds the rows of the author as a run that is still sending would
+            with transaction.atomic():
+                list(CommentNotification.objects.select_for_update().filter(recipient=self.author))
+                claimed.set()
+                release.wait(10)
+            connection.close()
+
+        thread = threading.Thread(target=other_run)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(release.set)
+        self.assertTrue(claimed.wait(10))
+
+        self.assertEqual(send_digests(), (1, 1))
+        self.assertEqual([recipients for recipients, message in self.sink.messages], [['other@example.com']])
+        self.assertEqual(list(CommentNotification.objects.values_list('recipient', flat=True)), [self.author.pk])
@@ -0,0 +1,134 @@
+import threading
+import time
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import TestCase, RequestFactory, override_settings
+from django.urls import reverse
+
+from blog.models import Category, Comment, Post
+from myblog import ratelimit
+
+
+@override_settings(RATELIMITS={'test': [('ip', 2, 60)]})
+class SlidingWindowTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+
+    def check_at(self, now):
+        with mock.patch.object(ratelimit.time, 'time', return_value=now):
+            return ratelimit.check(self.factory.post('/'), 'test')
+
+    def test_limit_within_window(self):
+        self.assertIsNone(self.check_at(6000))
+        self.assertIsNone(self.check_at(6010))
+        # 40 s to the next window, then 30 s until half of this one has slid out
+        self.assertEqual(self.check_at(6020), 70)
+
+    def test_previous_window_is_weighted(self):
+        self.check_at(6000)
+        self.check_at(6010)
+        # Half of the previous window still overlaps: 2 * 0.5 + 1 = 2
+        self.assertIsNone(self.check_at(6090))
+        self.assertEqual(self.check_at(6090), 30)
+        self.assertIsNone(self.check_at(6120))
+
+    def test_limited_requests_are_not_counted(self):
+        for _ in range(5):
+            self.check_at(6000)
+        self.assertIsNone(self.check_at(6120))
+
+    def test_concurrent_burst(self):
+        barrier = threading.Barrier(20)
+        results = []
+
+        def request():
+            barrier.wait()
+            results.append(ratelimit.check(self.factory.post('/'), 'test'))
+
+        get_many = LocMemCache.get_many
+
+        def slow_get_many(cache, *args, **kwargs):
+            # Widens the window between reading the counts and acting on them
+            values = get_many(cache, *args, **kwargs)
+            time.sleep(0.05)
+            return values
+
+        with mock.patch.object(ratelimit.time, 'time', return_value=6000), \
+                mock.patch.object(LocMemCache, 'get_many', slow_get_many):
+            threads = [threading.Thread(target=request) for _ in range(20)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(results.count(None), 2)
+        self.assertIsNone(self.check_at(6120))
+
+    @override_settings(RATELIMITS={'test': [('ip', 20, 60), ('ip', 100, 3600), ('username', 5, 300)]})
+    def test_round_trips(self):
+        request = self.factory.post('/', {'username': 'testuser'})
+        with mock.patch.object(ratelimit.time, 'time', return_value=6000):
+            ratelimit.check(request, 'test')
+            with mock.patch.object(LocMemCache, 'incr', autospec=True, side_effect=LocMemCache.incr) as incr, \
+                    mock.patch.object(LocMemCache, 'get_many', autospec=True, side_effect=LocMemCache.get_many) as get_many:
+                self.assertIsNone(ratelimit.check(request, 'test'))
+        # One per rule plus one, as the module docstring says
+        self.assertEqual((incr.call_count, get_many.call_count), (3, 1))
+
+    def test_keys_are_separate(self):
+        self.check_at(6000)
+        self.check_at(6000)
+        with mock.patch.object(ratelimit.time, 'time', return_value=6000):
+            self.assertIsNone(ratelimit.check(self.factory.post('/', REMOTE_ADDR='10.0.0.1'), 'test'))
+
+
+@override_settings(RATELIMITS={
+    'login': [('username', 2, 300)],
+    'register': [('ip', 1, 3600)],
+    'comment': [('user', 1, 60)],
+})
+class RateLimitedViewsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+
+    def test_login_is_limited_before_authentication(self):
+        url = reverse('login')
+        data = {'username': 'testuser', 'password': 'wrong'}
+        self.assertEqual(self.client.post(url, data).status_code, 200)
+        self.assertEqual(self.client.post(url, data).status_code, 200)
+        with mock.patch('django.contrib.auth.forms.authenticate') as authenticate:
+            response = self.client.post(url, data)
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+        authenticate.assert_not_called()
+        # Pages are still served
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_register(self):
+        url = reverse('register')
+        self.client.post(url, {'username': 'first'})
+        self.assertEqual(self.client.post(url, {'username': 'second'}).status_code, 429)
+
+    def test_comments(self):
+        category = Category.objects.create(title='Test Category', slug='test-category')
+        post = Post.objects.create(title='Test Post', category=category, content='Content', slug='test-post',
+                                   author=self.user, status='published')
+        self.client.login(username='testuser', password='testpassword')
+        url = reverse('post_comments', kwargs={'slug': post.slug})
+        self.assertEqual(self.client.post(url, {'comment': 'first'}).status_code, 201)
+        response = self.client.post(url, {'comment': 'second'})
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('error', response.json())
+        response = self.client.post(reverse('detail_post', kwargs={'slug': post.slug}), {'comment': 'third'})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(Comment.objects.count(), 1)
+
+    @override_settings(RATELIMIT_ENABLED=False)
+    def test_disabled(self):
+        url = reverse('register')
+        self.client.post(url, {'username': 'first'})
+        self.assertNotEqual(self.client.post(url, {'username': 'second'}).status_code, 429)
@@ -0,0 +1,84 @@
+import random
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from blog.models import Category, Post, ReadState
+from blog.readstate import ReadSet, mark_read, read_post_ids
+
+
+class ReadSetTest(SimpleTestCase):
+    def test_runs_merge(self):
+        read = ReadSet()
+        for pk in [5, 3, 4, 10, 12, 11, 1]:
+            self.assertTrue(read.add(pk))
+        self.assertFalse(read.add(4))
+        self.assertEqual(list(zip(read.starts, read.ends)), [(1, 2), (3, 6), (10, 13)])
+        self.assertEqual(len(read), 7)
+        self.assertEqual([pk for pk in range(15) if pk in read], [1, 3, 4, 5, 10, 11, 12])
+
+    def test_bytes_round_trip(self):
+        ids = random.Random(1).sample(range(1, 100_000), 2000)
+        read = ReadSet()
+        for pk in ids:
+            read.add(pk)
+        loaded = ReadSet.from_bytes(read.to_bytes())
+        self.assertEqual((loaded.starts, loaded.ends), (read.starts, read.ends))
+        self.assertEqual(ReadSet.from_bytes(b'').starts, [])
+
+    def test_consecutive_ids_take_a_few_bytes(self):
+        read = ReadSet()
+        for pk in range(1, 5001):
+            read.add(pk)
+        self.assertEqual(len(read.to_bytes()), 3)
+
+    def test_truncated_data(self):
+        with self.assertRaises(ValueError):
+            ReadSet.from_bytes(b'\x01\x80')
+
+
+class ReadStateTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.category = Category.objects.create(title='Test Category', slug='test-category')
+        self.posts = [
+            Post.objects.create(
+                title=f'Post {number}', slug=f'post-{number}', category=self.category,
+                content='Test content', author=self.user, status='published',
+            )
+            for number in range(3)
+        ]
+
+    def test_mark_read(self):
+        self.assertTrue(mark_read(self.user.pk, self.posts[0].pk))
+        # Already read: one SELECT, no write
+        with self.assertNumQueries(1):
+            self.assertFalse(mark_read(self.user.pk, self.posts[0].pk))
+        mark_read(self.user.pk, self.posts[2].pk)
+        ids = [post.pk for post in self.posts]
+        self.assertEqual(read_post_ids(self.user.pk, ids), [self.posts[0].pk, self.posts[2].pk])
+        self.assertEqual(ReadState.objects.count(), 1)
+
+    def test_detail_post_marks_read(self):
+        self.client.login(username='testuser', password='testpassword')
+        self.client.get(reverse('detail_post', args=[self.posts[1].slug]))
+        self.assertEqual(read_post_ids(self.user.pk, [post.pk for post in self.posts]), [self.posts[1].pk])
+
+    def test_read_posts_view(self):
+        url = reverse('read_posts')
+        ids = ','.join(str(post.pk) for post in self.posts)
+        self.assertEqual(self.client.get(url, {'ids': ids}).json(), {'read': None})
+
+        mark_read(self.user.pk, self.posts[1].pk)
+        self.client.login(username='testuser', password='testpassword')
+        # The session and user lookups, then the single ReadState row
+        with self.assertNumQueries(3):
+            response = self.client.get(url, {'ids': ids})
+        self.assertEqual(response.json(), {'read': [self.posts[1].pk]})
+        self.assertEqual(self.client.get(url, {'ids': '1,x'}).status_code, 400)
+
+    def test_listing_has_post_ids(self):
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, f'data-post-id="{self.posts[0].pk}"')
+        self.assertContains(response, reverse('read_posts'))
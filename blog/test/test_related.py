@@ -0,0 +1,82 @@
+import tempfile
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from blog.models import Category, Post, RelatedPost
+from blog.related import build_related_posts, update_related_posts
+
+TOPICS = {
+    'python': 'python django orm queryset migrations python templates',
+    'math': 'algebra geometry theorem proof algebra equations',
+    'school': 'school teacher pupils lessons school homework',
+}
+
+
+class RelatedPostsTest(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(RELATED_POSTS_PATH=Path(directory.name) / 'related.npz', RELATED_POSTS_COUNT=2)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.category = Category.objects.create(title='Test Category', slug='test-category')
+        self.posts = {}
+        for topic, words in TOPICS.items():
+            for number in range(3):
+                self.posts[f'{topic}-{number}'] = Post.objects.create(
+                    title=f'{topic} {number}',
+                    category=self.category,
+                    content=f'<p>{words} &amp; note {number}</p>',
+                    slug=f'{topic}-{number}',
+                    author=self.user,
+                    status='published',
+                )
+
+    def related(self, key):
+        return list(
+            RelatedPost.objects.filter(post=self.posts[key]).order_by('rank').values_list('related__slug', flat=True)
+        )
+
+    def test_build_finds_posts_on_the_same_topic(self):
+        self.assertEqual(build_related_posts(), 9)
+        for key in self.posts:
+            topic = key.split('-')[0]
+            related = self.related(key)
+            self.assertEqual(len(related), 2)
+            self.assertNotIn(key, related)
+            self.assertTrue(all(slug.startswith(topic) for slug in related), (key, related))
+
+    def test_update_single_post(self):
+        build_related_posts()
+        post = self.posts['python-0']
+        post.title = 'Geometry'
+        post.content = '<p>algebra geometry theorem proof</p>'
+        post.save()
+        before = self.related('school-0')
+        update_related_posts(post.pk)
+        self.assertTrue(all(slug.startswith('math') for slug in self.related('python-0')))
+        self.assertEqual(self.related('school-0'), before)
+
+    def test_update_skips_unpublished_neighbours(self):
+        build_related_posts()
+        Post.objects.filter(pk=self.posts['math-1'].pk).update(status='rejected')
+        update_related_posts(self.posts['math-0'].pk)
+        related = self.related('math-0')
+        self.assertEqual(related[0], 'math-2')
+        self.assertNotIn('math-1', related)
+
+    def test_update_without_model(self):
+        update_related_posts(self.posts['math-0'].pk)
+        self.assertEqual(RelatedPost.objects.count(), 0)
+
+    def test_detail_post_shows_related_posts(self):
+        build_related_posts()
+        self.client.login(username='testuser', password='testpassword')
+        response = self.client.get(reverse('detail_post', kwargs={'slug': 'school-0'}))
+        self.assertEqual([post.slug for post in response.context['related_posts']], self.related('school-0'))
+        self.assertContains(response, 'Читайте також')
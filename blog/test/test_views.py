@@ -1,7 +1,17 @@
-from django.test import TestCase, Client
+from io import StringIO
+from datetime import datetime
+from django.utils import timezone
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, Client
 from blog.views import *
 from django.urls import reverse
 from blog.models import *
+from django.utils.cache import has_vary_header
+from blog.signals import posts_moderated
+from myblog.compression import ENCODINGS
+from unittest import mock
 
 class IndexViewsTest(TestCase):
     def setUp(self):
@@ -172,6 +182,101 @@ class PostByCategoryTest(TestCase):
         self.assertIn('tags', response.context)
 
 
+class CategoryTreeViewTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.root = Category.objects.create(title='Root', slug='root')
+        self.child = Category.objects.create(title='Child', slug='child', parent=self.root)
+        self.other = Category.objects.create(title='Other', slug='other')
+        for slug, category in (('root-post', self.root), ('child-post', self.child), ('other-post', self.other)):
+            Post.objects.create(
+                title=slug, slug=slug, category=category, content='Test content', author=self.user, status='published',
+            )
+
+    def slugs(self, category):
+        response = self.client.get(reverse('post_by_category', kwargs={'slug': category}))
+        return {post.slug for post in response.context['page_obj']}
+
+    def test_category_includes_subcategories(self):
+        self.assertEqual(self.slugs('root'), {'root-post', 'child-post'})
+        self.assertEqual(self.slugs('child'), {'child-post'})
+
+        self.child.parent = self.other
+        self.child.save()
+        self.assertEqual(self.slugs('root'), {'root-post'})
+        self.assertEqual(self.slugs('other'), {'other-post', 'child-post'})
+
+    def test_breadcrumbs(self):
+        response = self.client.get(reverse('post_by_category', kwargs={'slug': 'child'}))
+        self.assertEqual(response.context['ancestors'], [self.root])
+
+    def test_navigation_tree_is_cached(self):
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, 'Root (2)')
+        self.assertContains(response, 'Child (1)')
+        tree = response.context['categories']
+        self.assertEqual([node['slug'] for node in tree], ['root', 'other'])
+        self.assertEqual([node['slug'] for node in tree[0]['subcategories']], ['child'])
+
+        # Another page reuses the nav fragment without building the tree
+        with mock.patch('blog.context_processors.category_tree') as build:
+            response = self.client.get(reverse('post_by_category', kwargs={'slug': 'child'}))
+        self.assertContains(response, 'Root (2)')
+        build.assert_not_called()
+
+
+class ArchiveViewTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.category = Category.objects.create(title='Test Category', slug='test-category')
+        self.october = []
+        for number in range(8):
+            self.october.append(self.create_post(f'october-{number}', datetime(2026, 10, 1 + number // 2, 12)))
+        self.create_post('september', datetime(2026, 9, 30, 23, 59))
+        self.create_post('old', datetime(2025, 10, 5))
+        call_command('reconcile_counters', stdout=StringIO())
+
+    def create_post(self, slug, created_at):
+        post = Post.objects.create(
+            title=slug, slug=slug, category=self.category, content='Test content', author=self.user, status='published',
+        )
+        Post.objects.filter(pk=post.pk).update(created_at=timezone.make_aware(created_at))
+        return post
+
+    def test_month_keyset_pages(self):
+        url = reverse('archive_month', kwargs={'year': 2026, 'month': 10})
+        response = self.client.get(url)
+        self.assertTemplateUsed(response, 'archive.html')
+        self.assertEqual(response.context['total'], 8)
+        first = [post.slug for post in response.context['posts']]
+        # Posts of the same day are ordered by id
+        self.assertEqual(first, ['october-7', 'october-6', 'october-5', 'october-4', 'october-3', 'october-2'])
+
+        # The anchor post, the page and the total; the sidebar fragment is cached
+        with self.assertNumQueries(3):
+            response = self.client.get(url, {'before': response.context['next_before']})
+        self.assertEqual([post.slug for post in response.context['posts']], ['october-1', 'october-0'])
+        self.assertIsNone(response.context['next_before'])
+
+    def test_year(self):
+        response = self.client.get(reverse('archive_year', kwargs={'year': 2026}))
+        self.assertEqual(response.context['total'], 9)
+        self.assertEqual([row.month.month for row in response.context['months']], [9, 10])
+
+    def test_invalid_period(self):
+        self.assertEqual(self.client.get('/archive/2026/13/').status_code, 404)
+        self.assertEqual(self.client.get('/archive/9999/').status_code, 404)
+        self.assertEqual(self.client.get('/archive/9999/12/').status_code, 404)
+        self.assertEqual(self.client.get('/archive/9999/11/').status_code, 200)
+
+    def test_sidebar(self):
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, reverse('archive_month', kwargs={'year': 2025, 'month': 10}))
+        self.assertContains(response, '(8)')
+
+
 class PostByAuthorTest(TestCase):
     def setUp(self):
         self.client = Client()
@@ -281,3 +386,261 @@ class PostByTagTest(TestCase):
         self.assertIn('latest_posts', response.context)
         self.assertIn('tag', response.context)
         self.assertIn('tags', response.context)
+
+class AuthorStatsTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.user2 = User.objects.create_user(username='testuser2', password='testpassword2')
+        self.category = Category.objects.create(title='Test Category', slug='test-category')
+        self.post = Post.objects.create(
+            title='Test Post',
+            category=self.category,
+            content='This is a test content.',
+            slug='test-post',
+            author=self.user,
+            status='published'
+        )
+        PostDailyViews.objects.create(post=self.post, day=timezone.localdate(), count=5)
+        PostDailyViews.objects.create(post=self.post, day=timezone.localdate() - timedelta(days=1), count=2)
+        self.url = reverse('author_stats', kwargs={'username': self.user.username})
+
+    def test_author_sees_stats(self):
+        self.client.login(username='testuser', password='testpassword')
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'author_stats.html')
+        self.assertEqual([row['total'] for row in response.context['views_by_day']], [2, 5])
+        self.assertEqual(response.context['views_by_post'][0]['total'], 7)
+
+    def test_other_user_forbidden(self):
+        self.client.login(username='testuser2', password='testpassword2')
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 403)
+
+class PublicPageCacheTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpassword', is_staff=True)
+        self.category = Category.objects.create(title='Test Category', slug='test-category')
+        self.post = Post.objects.create(
+            title='Test Post',
+            category=self.category,
+            content='This is a test content.',
+            slug='test-post',
+            author=self.user,
+            status='published'
+        )
+
+    def test_index_is_public(self):
+        self.client.login(username='testuser', password='testpassword')
+        response = self.client.get(reverse('index'))
+        self.assertIn('public', response['Cache-Control'])
+        self.assertFalse(has_vary_header(response, 'Cookie'))
+        self.assertNotContains(response, 'Вийти')
+
+    def test_cached_page_is_invalidated_on_post_save(self):
+        response = self.client.get(reverse('post_by_category', kwargs={'slug': self.category.slug}))
+        self.assertContains(response, 'Test Post')
+
+        self.post.title = 'Changed Post'
+        self.post.save()
+        response = self.client.get(reverse('post_by_category', kwargs={'slug': self.category.slug}))
+        self.assertContains(response, 'Changed Post')
+
+    def test_user_header_is_private(self):
+        self.client.login(username='testuser', password='testpassword')
+        response = self.client.get(reverse('user_header'))
+        self.assertTemplateUsed(response, 'user_header.html')
+        self.assertContains(response, 'testuser')
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        self.assertIn('private', response['Cache-Control'])
+        self.assertTrue(has_vary_header(response, 'Cookie'))
+
+class ModerationViewTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.staff = User.objects.create_user(username='staff', password='testpassword', is_staff=True)
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.category = Category.objects.create(title='Test Category', slug='test-category')
+        self.posts = [
+            Post.objects.create(
+                title=f'Test Post {i}',
+                category=self.category,
+                content='This is a test content.',
+                slug=f'test-post-{i}',
+                author=self.user,
+            )
+            for i in range(5)
+        ]
+        self.url = reverse('moderation')
+
+    def test_lists_pending_posts(self):
+        self.posts[0].status = 'published'
+        self.posts[0].save()
+        self.client.login(username='staff', password='testpassword')
+        response = self.client.get(self.url)
+        self.assertTemplateUsed(response, 'moderation.html')
+        self.assertEqual(response.context['page_obj'].paginator.count, 4)
+
+    def test_bulk_approve_sends_one_signal(self):
+        calls = []
+        def receiver(sender, post_ids, status, **kwargs):
+            calls.append((sorted(post_ids), status))
+        posts_moderated.connect(receiver)
+        self.addCleanup(posts_moderated.disconnect, receiver)
+
+        self.client.login(username='staff', password='testpassword')
+        selected = [self.posts[0].pk, self.posts[1].pk]
+        response = self.client.post(self.url, {'action': 'approve', 'post_ids': selected})
+
+        self.assertRedirects(response, self.url)
+        self.assertEqual(Post.objects.filter(status='published').count(), 2)
+        self.assertEqual(calls, [(sorted(selected), 'published')])
+
+    def test_reject_all_pending(self):
+        self.client.login(username='staff', password='testpassword')
+        self.client.post(self.url, {'action': 'reject', 'all_pending': '1'})
+        self.assertEqual(Post.objects.filter(status='rejected').count(), 5)
+
+    def test_not_staff_user(self):
+        self.client.login(username='testuser', password='testpassword')
+        response = self.client.post(self.url, {'action': 'approve', 'all_pending': '1'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Post.objects.filter(status='published').count(), 0)
+
+class FragmentCacheTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.category = Category.objects.create(title='Test Category', slug='test-category')
+        self.post = Post.objects.create(
+            title='Test Post',
+            category=self.category,
+            content='This is a test content.',
+            slug='test-post',
+            author=self.user,
+            status='published'
+        )
+
+    def test_view_does_not_touch_updated_at(self):
+        self.client.login(username='testuser', password='testpassword')
+        updated_at = self.post.updated_at
+        self.client.get(reverse('detail_post', kwargs={'slug': self.post.slug}))
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views, 1)
+        self.assertEqual(self.post.updated_at, updated_at)
+
+    def test_nav_on_every_page(self):
+        self.client.login(username='testuser', password='testpassword')
+        response = self.client.get(reverse('detail_post', kwargs={'slug': self.post.slug}))
+        self.assertContains(response, 'Test Category (1)')
+
+    def test_edited_post_card_is_rendered_again(self):
+        with self.settings(PAGE_CACHE_TIMEOUT=0):
+            self.client.get(reverse('index'))
+            self.post.title = 'Changed Post'
+            self.post.save()
+            response = self.client.get(reverse('index'))
+        self.assertContains(response, 'Changed Post')
+
+
+class PostCommentsApiTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.category = Category.objects.create(title='Test Category', slug='test-category')
+        self.post = Post.objects.create(
+            title='Test Post',
+            category=self.category,
+            content='This is a test content.',
+            slug='test-post',
+            author=self.user,
+            status='published',
+        )
+        self.comments = [
+            Comment.objects.create(post=self.post, user=self.user, comment=f'Comment {i}')
+            for i in range(3)
+        ]
+        self.url = reverse('post_comments', kwargs={'slug': self.post.slug})
+        self.client.login(username='testuser', password='testpassword')
+
+    def test_returns_comments_after_id(self):
+        response = self.client.get(self.url, {'after': self.comments[0].id})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([comment['comment'] for comment in data['comments']], ['Comment 1', 'Comment 2'])
+        self.assertEqual(data['comments'][0]['user'], 'testuser')
+        self.assertEqual(data['last_id'], self.comments[2].id)
+
+    def test_no_new_comments_keeps_last_id(self):
+        response = self.client.get(self.url, {'after': self.comments[2].id})
+        self.assertEqual(response.json(), {'comments': [], 'last_id': self.comments[2].id})
+
+    def test_invalid_after(self):
+        response = self.client.get(self.url, {'after': 'abc'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_create_comment(self):
+        response = self.client.post(self.url, {'comment': 'New comment'})
+        self.assertEqual(response.status_code, 201)
+        comment = Comment.objects.latest('id')
+        self.assertEqual(comment.comment, 'New comment')
+        self.assertEqual(comment.user, self.user)
+        self.assertEqual(response.json()['last_id'], comment.id)
+
+    def test_invalid_comment(self):
+        response = self.client.post(self.url, {'comment': ''})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('comment', response.json()['errors'])
+        self.assertEqual(Comment.objects.count(), 3)
+
+    def test_anonymous_user(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+        self.assertEqual(self.client.post(self.url, {'comment': 'New comment'}).status_code, 401)
+        self.assertEqual(Comment.objects.count(), 3)
+
+    def test_detail_post_renders_comments(self):
+        response = self.client.get(reverse('detail_post', kwargs={'slug': self.post.slug}))
+        self.assertContains(response, 'Comment 2')
+        self.assertEqual(response.context['last_comment_id'], self.comments[2].id)
+        self.assertContains(response, f'data-last-id="{self.comments[2].id}"')
+
+
+class WarmCacheCommandTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.category = Category.objects.create(title='Test Category', slug='test-category')
+        self.posts = [
+            Post.objects.create(
+                title=f'Test Post {i}',
+                category=self.category,
+                content='This is a test content.',
+                slug=f'test-post-{i}',
+                author=self.user,
+                status='published',
+                views=i,
+            )
+            for i in range(8)
+        ]
+
+    def test_fills_page_and_fragment_caches(self):
+        out = StringIO()
+        call_command('warm_cache', '--host', 'testserver', '--posts', '2', stdout=out, stderr=StringIO())
+        # index and its second page, the category and its second page in every encoding, two posts
+        pages = 4 * len(ENCODINGS) + 2
+        self.assertIn(f'Warmed {pages} of {pages} pages', out.getvalue())
+
+        url = reverse('post_by_category', kwargs={'slug': 'test-category'})
+        for accept in ['gzip, deflate, br', 'gzip', '']:
+            with self.subTest(accept=accept), self.assertNumQueries(0):
+                response = self.client.get(url, {'page': 2}, HTTP_ACCEPT_ENCODING=accept)
+            self.assertEqual(response.status_code, 200)
+
+        post = self.posts[7]
+        key = make_template_fragment_key('detail_post', [post.pk, post.updated_at.timestamp()])
+        self.assertIsNotNone(cache.get(key))
+        post.refresh_from_db()
+        self.assertEqual(post.views, 7)
@@ -1,19 +1,27 @@
 from django.urls import path
 import blog.views as views
-from django.conf import settings
-from django.conf.urls.static import static
+import blog.api as api
 
 urlpatterns = [
     path('', views.index, name='index'), 
     path('post/<slug:slug>/', views.detail_post, name = 'detail_post'), 
+    path('post/<slug:slug>/comments/', views.post_comments, name = 'post_comments'),
+    path('autocomplete/', views.post_autocomplete, name = 'post_autocomplete'),
     path('post-by-category/<slug:slug>', views.post_by_category, name='post_by_category'),
+    path('archive/<int:year>/', views.archive, name='archive_year'),
+    path('archive/<int:year>/<int:month>/', views.archive, name='archive_month'),
     path('post-by-author/<str:username>/', views.post_by_author, name='post_by_author'),
+    path('post-by-author/<str:username>/stats/', views.author_stats, name='author_stats'),
     path('create-post/',views.create_post, name='create_post' ),
     path('edit-post/<slug:slug>', views.edit_post, name = 'edit_post'),
     path('delete-post/<int:pk>', views.delete_post, name = 'delete_post'),
+    path('header/user/', views.user_header, name = 'user_header'),
+    path('read-posts/', views.read_posts, name = 'read_posts'),
+    path('moderation/', views.moderation, name = 'moderation'),
+    path('api/posts/', api.post_list, name = 'api_post_list'),
+    path('api/posts/<slug:slug>/', api.post_detail, name = 'api_post_detail'),
+    path('api/categories/', api.category_list, name = 'api_category_list'),
+    path('api/authors/', api.author_list, name = 'api_author_list'),
 
 ]
 
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
-    urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
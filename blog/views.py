@@ -1,14 +1,33 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.core.paginator import Paginator
-from .models import Category, Post, Comment
+from .models import Category, Post, Comment, PostDailyViews, AuthorStats, MonthlyPostCount
 from django.contrib.auth.models import User
 from .forms import  CreatePostForm, CommentForm
 from django.contrib.auth.decorators import login_required
 from django.contrib.admin.views.decorators import staff_member_required
-from django.http import HttpResponseForbidden
-from taggit.models import Tag
-from django.db.models import Count
-
+from django.http import Http404, HttpResponseForbidden, JsonResponse, HttpResponseNotAllowed
+from django.conf import settings
+from django.db.models import Sum, F, Q
+from django.utils import timezone
+from datetime import date, datetime, timedelta
+from .analytics import record_view
+from .autocomplete import suggest
+from .cache import public_page
+from .deletion import delete_posts
+from .moderation import moderate_posts
+from .readstate import mark_read, read_post_ids
+from myblog.ratelimit import ratelimit
+from django.views.decorators.cache import never_cache
+from django.views.decorators.vary import vary_on_cookie
+from django.views.decorators.http import require_GET
+from django.urls import reverse
+
+STATS_DAYS = 30
+POSTS_PER_PAGE = 6
+# Post ids one read_posts request may ask about
+READ_POSTS_MAX_IDS = 100
+
+@public_page
 def index(request):
     """
     Presentation a main page of the list posts
@@ -17,7 +36,6 @@ def index(request):
     Posts split into pages using Paginator
 
     Context:
-        categories: list of categories
         page_obj: page object with the list posts for current page
         status: selected post status from the request
         posts: queryset of all posts
@@ -26,44 +44,64 @@ def index(request):
         - index.html
     """
     status = request.GET.get('status', 'published')
-    posts = Post.objects.filter(status=status).order_by('-created_at')
-
-    categories = Category.objects.all()
+    posts = Post.objects.filter(status=status).select_related('author').order_by('-created_at')
 
-    paginator = Paginator(posts, 6)
+    paginator = Paginator(posts, POSTS_PER_PAGE)
     page_number = request.GET.get('page') 
     page_obj = paginator.get_page(page_number)
 
     context = {
-        'categories': categories,
         'page_obj': page_obj, 
         'status':status, 
         'posts':posts
     }
     return render(request, 'index.html', context)
 
+@never_cache
+@vary_on_cookie
+def user_header(request):
+    """
+    Presentation of the per-user part of the page header.
+
+    Pages extending base.html load this fragment on the client side,
+    so the rest of the page does not depend on the user and can be cached once for everyone.
+
+    Template:
+        - user_header.html
+    """
+    return render(request, 'user_header.html')
+
 @login_required
+@ratelimit('comment')
 def detail_post(request, slug):
     """
     Presentation detail information about the product.
 
-    Get a post by slug from database and increment the number of views
-    Ability to leave a comment on the post. After saving comment, user is redirected to detail_post view
+    Get a post by slug from database, increment the number of views and mark it as read by the user
+    Ability to leave a comment on the post. Without JavaScript, after saving comment user is redirected to detail_post view,
+    otherwise comments are posted and polled through post_comments
 
     Context:
         - post: detail information about post
-        - comments: queryset of all products for the product
+        - related_posts: the most similar published posts, precomputed by blog.related
+        - comments: list of comments of the post, oldest first
+        - last_comment_id: id of the newest rendered comment, the first ?after= for post_comments
         - comment_form: form for adding comment
+        - comments_poll_seconds: how often the page asks post_comments for new comments
+          when the live events stream (live_events_url, see myblog/asgi.py) is not connected
     
     Template:
         - detail_post.html
     """
 
-    post = get_object_or_404(Post, slug = slug)
+    post = get_object_or_404(Post.objects.exclude(status = 'deleting').select_related('author'), slug = slug)
+    # Not post.save(): a view must not touch updated_at, which keys the cached fragments
+    Post.objects.filter(pk = post.pk).update(views = F('views') + 1)
     post.views += 1
-    post.save()
+    record_view(post.pk)
+    mark_read(request.user.pk, post.pk)
 
-    comments = post.comments.all()
+    comments = post.comments.select_related('user')
     if request.method == 'POST':
         comment_form = CommentForm(request.POST)
         if comment_form.is_valid():
@@ -75,26 +113,127 @@ def detail_post(request, slug):
     else:
         comment_form = CommentForm()
 
+    comments = list(comments.order_by('id'))
+    # One query on the (post, rank) unique index of RelatedPost
+    related_posts = (
+        Post.objects.filter(related_to__post = post, status = 'published')
+        .order_by('related_to__rank').only('title', 'slug')
+    )
     context = {
         'post':post,
+        'related_posts':related_posts,
         'comments':comments,
-        'comment_form': comment_form
+        'last_comment_id': comments[-1].id if comments else 0,
+        'comment_form': comment_form,
+        'comments_poll_seconds': settings.COMMENTS_POLL_SECONDS,
+        'live_events_url': f'{settings.LIVE_EVENTS_PREFIX}post/{post.pk}/',
     }
     return render(request, 'detail_post.html', context)
 
 
+@ratelimit('comment', json=True)
+def post_comments(request, slug):
+    """
+    JSON API for the comments of a post, used by detail_post to append comments in place.
+
+    GET returns comments with id greater than ?after= (0 by default), oldest first,
+    at most COMMENTS_PAGE_SIZE of them. POST creates a comment from CommentForm data
+    and returns it with status 201, or the form errors with status 400.
+
+    Response:
+        - comments: list of {id, user, comment, created_at}
+        - last_id: id to pass as ?after= on the next poll
+    """
+
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Потрібно увійти'}, status=401)
+
+    post = get_object_or_404(Post.objects.exclude(status = 'deleting').only('pk'), slug = slug)
+
+    if request.method == 'POST':
+        comment_form = CommentForm(request.POST)
+        if not comment_form.is_valid():
+            return JsonResponse({'errors': comment_form.errors.get_json_data()}, status=400)
+        comment = comment_form.save(commit=False)
+        comment.post = post
+        comment.user = request.user
+        comment.save()
+        return JsonResponse({'comments': [comment.to_json()], 'last_id': comment.id}, status=201)
+
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET', 'POST'])
+
+    try:
+        after = int(request.GET.get('after', 0))
+    except ValueError:
+        return JsonResponse({'error': 'after має бути числом'}, status=400)
+
+    # Index scan on (post_id, id): cheap enough to poll
+    comments = list(
+        Comment.objects.filter(post = post, id__gt = after)
+        .select_related('user').only('id', 'comment', 'created_at', 'user__username')
+        .order_by('id')[:settings.COMMENTS_PAGE_SIZE]
+    )
+    return JsonResponse({
+        'comments': [comment.to_json() for comment in comments],
+        'last_id': comments[-1].id if comments else after,
+    })
+
+
+@require_GET
+def post_autocomplete(request):
+    """
+    JSON suggestions of published posts whose title or slug starts with ?q=, for search-as-you-type.
+
+    Answered from the in-memory index in blog/autocomplete.py without querying the database.
+
+    Response:
+        - results: list of {title, slug, url}, at most AUTOCOMPLETE_LIMIT of them
+    """
+    query = request.GET.get('q', '')[:100]
+    results = [
+        {'title': title, 'slug': slug, 'url': reverse('detail_post', kwargs={'slug': slug})}
+        for title, slug in suggest(query)
+    ]
+    return JsonResponse({'results': results})
+
+
+@never_cache
+@vary_on_cookie
+@require_GET
+def read_posts(request):
+    """
+    JSON ids of the posts the current user has read among ?ids=1,2,3, for the unread markers of the listings.
+
+    The listings are cached once for everyone, so like the user header the markers are
+    added on the client side. Answered with one ReadState row, see blog/readstate.py.
+
+    Response:
+        - read: list of post ids, or null for anonymous users, who get no markers
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({'read': None})
+    try:
+        post_ids = [int(pk) for pk in request.GET.get('ids', '').split(',') if pk][:READ_POSTS_MAX_IDS]
+    except ValueError:
+        return JsonResponse({'error': 'ids мають бути числами'}, status=400)
+    return JsonResponse({'read': read_post_ids(request.user.pk, post_ids)})
+
+
+@public_page
 def post_by_category(request, slug):
     """
     Presentation of the posts by category.
 
-    Get a category by slug from database and filter products by this category.
+    Get a category by slug from database and filter products by this category and its subcategories,
+    found by the materialized path of the category in one join.
     Split into pages using Paginator.
 
     Context:
         - category: detail information about category.
+        - ancestors: parent categories from the top-level one, for the breadcrumbs.
         - posts: queryset of all products in this category.
         - page_obj: page object with the list of posts for the current page.
-        - categories: queryset of all categoies
     
     Templates:
         - product_by_category.html"
@@ -103,24 +242,84 @@ def post_by_category(request, slug):
 
     category = get_object_or_404(Category, slug = slug)
 
-    posts = Post.objects.filter(category = category)
+    posts = (
+        Post.objects.filter(category__path__startswith = category.path)
+        .exclude(status = 'deleting').select_related('author').order_by('-created_at')
+    )
 
-    paginator = Paginator(posts, 6)
+    paginator = Paginator(posts, POSTS_PER_PAGE)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
 
-    categories = Category.objects.all()
+    ancestor_ids = [int(pk) for pk in category.path.split('/')[:-2]]
+    ancestors = sorted(Category.objects.filter(pk__in = ancestor_ids).only('title', 'slug', 'path'), key = lambda parent: len(parent.path))
 
     context = {
         'posts':posts,
-        'categories':categories,
         'page_obj':page_obj,
-        'category':category
+        'category':category,
+        'ancestors':ancestors,
     }
 
     return render(request, 'post_by_category.html', context)
 
 
+@public_page
+def archive(request, year, month=None):
+    """
+    Presentation of the published posts of a year or a month, newest first.
+
+    Posts are read through the (status, created_at) index and paged with a keyset:
+    ?before= is the id of the last post of the previous page, so deep pages cost
+    the same as the first one. Counts come from MonthlyPostCount.
+
+    Context:
+        - period: first day of the year or month
+        - month: month number, None for a year archive
+        - posts: list of posts of the page
+        - next_before: ?before= of the next page, None on the last page
+        - total: number of published posts in the period
+        - months: months of the year archive with their counts
+
+    Template:
+        - archive.html
+    """
+    if month is not None and not 1 <= month <= 12:
+        raise Http404
+    try:
+        period = date(year, month or 1, 1)
+        # The end of December 9999 is past date.max
+        if month is None:
+            end = date(year + 1, 1, 1)
+        else:
+            end = date(year + month // 12, month % 12 + 1, 1)
+    except ValueError:
+        raise Http404
+    start_at = timezone.make_aware(datetime.combine(period, datetime.min.time()))
+    end_at = timezone.make_aware(datetime.combine(end, datetime.min.time()))
+
+    posts = Post.objects.filter(status = 'published', created_at__gte = start_at, created_at__lt = end_at)
+    before = request.GET.get('before', '')
+    if before.isdigit():
+        anchor = posts.filter(pk = int(before)).values_list('created_at', flat = True).first()
+        if anchor is not None:
+            posts = posts.filter(created_at__lte = anchor).filter(Q(created_at__lt = anchor) | Q(id__lt = int(before)))
+    posts = list(posts.select_related('author').order_by('-created_at', '-id')[:POSTS_PER_PAGE + 1])
+    next_before = posts[POSTS_PER_PAGE - 1].pk if len(posts) > POSTS_PER_PAGE else None
+
+    months = MonthlyPostCount.objects.filter(month__gte = period, month__lt = end, published_count__gt = 0).order_by('month')
+
+    context = {
+        'period': period,
+        'month': month,
+        'posts': posts[:POSTS_PER_PAGE],
+        'next_before': next_before,
+        'total': months.aggregate(total = Sum('published_count'))['total'] or 0,
+        'months': months if month is None else [],
+    }
+    return render(request, 'archive.html', context)
+
+
 def post_by_author(request, username):
     """
     Presentation of the posts by author.
@@ -130,6 +329,7 @@ def post_by_author(request, username):
 
     Context:
         - author: get auhtor by username.
+        - author_stats: denormalized post counters of the author, if the author has posts.
         - posts: queryset of all products in this category.
         - page_obj: page object with the list of posts for the current page.
     
@@ -138,20 +338,61 @@ def post_by_author(request, username):
     """
     author = get_object_or_404(User, username = username)
 
-    posts = Post.objects.filter(author = author)
+    posts = Post.objects.filter(author = author).exclude(status = 'deleting').select_related('author')
 
-    paginator = Paginator(posts, 6)
+    paginator = Paginator(posts, POSTS_PER_PAGE)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
 
+    author_stats = AuthorStats.objects.filter(user = author).first()
+
     context = {
         'author':author,
+        'author_stats':author_stats,
         'posts':posts,
         'page_obj':page_obj,
     }
 
     return render(request, 'post_by_author.html', context)
 
+@login_required
+def author_stats(request, username):
+    """
+    Presentation of the daily views of the author's posts.
+
+    Reads pre-aggregated PostDailyViews rows for the last STATS_DAYS days,
+    so the cost does not depend on the number of raw views.
+    Only the author and staff members can see the statistics.
+
+    Context:
+        - author: get author by username.
+        - views_by_day: total views of all author's posts per day.
+        - views_by_post: total views per post for the period.
+        - days: length of the period in days.
+
+    Templates:
+        - author_stats.html
+    """
+    author = get_object_or_404(User, username = username)
+
+    if author != request.user and not request.user.is_staff:
+        return HttpResponseForbidden("Ви не маєте права переглядати цю статистику.")
+
+    since = timezone.localdate() - timedelta(days=STATS_DAYS - 1)
+    daily_views = PostDailyViews.objects.filter(post__author = author, day__gte = since)
+
+    views_by_day = daily_views.values('day').annotate(total=Sum('count')).order_by('day')
+    views_by_post = daily_views.values('post__title', 'post__slug').annotate(total=Sum('count')).order_by('-total')
+
+    context = {
+        'author':author,
+        'views_by_day':views_by_day,
+        'views_by_post':views_by_post,
+        'days':STATS_DAYS,
+    }
+
+    return render(request, 'author_stats.html', context)
+
 @staff_member_required
 @login_required
 def create_post(request): 
@@ -200,7 +441,7 @@ def edit_post(request, slug):
     Context:
         - form: form for editing posts
     """
-    post = get_object_or_404(Post, slug=slug)
+    post = get_object_or_404(Post.objects.exclude(status='deleting'), slug=slug)
 
     if request.method == 'POST' and post.author == request.user:
         form = CreatePostForm(request.POST, instance=post)
@@ -222,13 +463,58 @@ def delete_post(request, pk):
     The post is retrieved using its primary key.  
     If the current user is not the post's author and is not a staff member,  
     an HTTP 403 Forbidden response is returned.  
-    Otherwise, the post is deleted, and the user is redirected to their posts page
+    Otherwise, the post is deleted, and the user is redirected to their posts page.
+    Posts with many comments are hidden at once and deleted in the background (see blog/deletion.py).
 
     """
-    post = get_object_or_404(Post, pk = pk)
+    post = get_object_or_404(Post.objects.exclude(status = 'deleting'), pk = pk)
 
     if post.author != request.user and not request.user.is_staff:
         return HttpResponseForbidden("Ви не маєте права видаляти цей пост.")
     
-    post.delete()
-    return redirect('post_by_author', username=request.user.username)
\ No newline at end of file
+    delete_posts([post.pk])
+    return redirect('post_by_author', username=request.user.username)
+
+MODERATION_ACTIONS = {
+    'approve': 'published',
+    'reject': 'rejected',
+}
+
+@login_required
+@staff_member_required
+def moderation(request):
+    """
+    Presentation of the posts pending review.
+
+    Pending posts are listed oldest first through the (status, created_at) index.
+    Staff members can approve or reject the selected posts, or all pending posts at once.
+    Each action is a single UPDATE statement, see blog.moderation.moderate_posts.
+
+    Context:
+        - page_obj: page object with the pending posts for the current page.
+
+    Template:
+        - moderation.html
+    """
+    if request.method == 'POST':
+        status = MODERATION_ACTIONS.get(request.POST.get('action'))
+        if status is not None:
+            if request.POST.get('all_pending'):
+                post_ids = None
+            else:
+                post_ids = [int(pk) for pk in request.POST.getlist('post_ids') if pk.isdigit()]
+            moderate_posts(post_ids, status)
+        return redirect('moderation')
+
+    posts = (
+        Post.objects.filter(status='checkout')
+        .select_related('author', 'category')
+        .only('title', 'slug', 'created_at', 'author__username', 'category__title')
+        .order_by('created_at')
+    )
+
+    paginator = Paginator(posts, 50)
+    page_number = request.GET.get('page')
+    page_obj = paginator.get_page(page_number)
+
+    return render(request, 'moderation.html', {'page_obj': page_obj})
@@ -2,15 +2,121 @@
 ASGI config for myblog project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Requests under LIVE_EVENTS_PREFIX are Server-Sent Events streams served by
+``events_application``, everything else goes to Django.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 """
 
+import asyncio
+import json
 import os
+import re
+from http.cookies import SimpleCookie
+from importlib import import_module
 
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'myblog.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+
+from blog import events
+from blog.models import Post
+
+EVENTS_PATH = re.compile(r'^post/(\d+)/$')
+
+
+def check_access(session_key, post_id):
+    """
+    Return the HTTP status for a stream: readers must be logged in, like for detail_post.
+    """
+    session = import_module(settings.SESSION_ENGINE).SessionStore(session_key)
+    if session.get(SESSION_KEY) is None:
+        return 401
+    if not Post.objects.filter(pk = post_id).exists():
+        return 404
+    return 200
+
+
+async def respond(send, status):
+    await send({'type': 'http.response.start', 'status': status, 'headers': [(b'content-type', b'text/plain')]})
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def wait_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+def format_event(data):
+    body = json.dumps(data, separators=(',', ':'), ensure_ascii=False)
+    return f"event: {data['type']}\ndata: {body}\n\n".encode()
+
+
+async def events_application(scope, receive, send):
+    """
+    Stream the live events of a post: GET {LIVE_EVENTS_PREFIX}post/<id>/.
+
+    The connection subscribes to the in-process bus of blog/events.py and costs
+    nothing while idle apart from a keep-alive comment every LIVE_EVENTS_KEEPALIVE seconds.
+    """
+    match = EVENTS_PATH.match(scope['path'][len(settings.LIVE_EVENTS_PREFIX):])
+    if scope['method'] != 'GET' or match is None:
+        await respond(send, 404)
+        return
+
+    cookies = SimpleCookie()
+    for name, value in scope['headers']:
+        if name == b'cookie':
+            cookies.load(value.decode('latin-1'))
+    session_cookie = cookies.get(settings.SESSION_COOKIE_NAME)
+    post_id = int(match[1])
+    status = await sync_to_async(check_access)(session_cookie and session_cookie.value, post_id)
+    if status != 200:
+        await respond(send, status)
+        return
+
+    channel = events.post_channel(post_id)
+    queue = events.subscribe(channel)
+    disconnect = asyncio.ensure_future(wait_disconnect(receive))
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream; charset=utf-8'),
+                (b'cache-control', b'no-cache'),
+                # Keep nginx from buffering the stream
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+        await send({'type': 'http.response.body', 'body': b'retry: 5000\n\n', 'more_body': True})
+        while True:
+            get = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait(
+                {get, disconnect}, timeout=settings.LIVE_EVENTS_KEEPALIVE, return_when=asyncio.FIRST_COMPLETED,
+            )
+            if get in done:
+                chunk = format_event(get.result())
+            else:
+                get.cancel()
+                if disconnect in done:
+                    break
+                chunk = b': keep-alive\n\n'
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+    finally:
+        events.unsubscribe(channel, queue)
+        disconnect.cancel()
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'].startswith(settings.LIVE_EVENTS_PREFIX):
+        await events_application(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
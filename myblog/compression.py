@@ -0,0 +1,186 @@
+"""
+Minification and compression of responses.
+
+HTML has the template indentation and blank lines removed, except inside <pre>,
+<textarea>, <script> and <style>. Text responses are then compressed with brotli,
+when the brotli package is installed and the client accepts it, or gzip.
+Streaming responses are compressed chunk by chunk, bodies shorter than
+COMPRESS_MIN_BYTES are sent as they are.
+
+Against BREACH, gzip output gets a random-length padding in its header, as
+django.middleware.gzip.GZipMiddleware does. Brotli has no room for padding, so
+responses varying on Cookie, the only ones that can carry a CSRF token or other
+per-user secrets, are always gzipped.
+
+CompressionMiddleware handles every response. blog.cache.public_page compresses
+before the page cache stores the response, so cache hits are sent without
+compressing again and the middleware leaves them alone.
+"""
+import re
+
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import has_vary_header, patch_vary_headers
+from django.utils.text import compress_sequence, compress_string
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Fast enough for pages rendered on every request, still smaller than gzip
+BROTLI_QUALITY = 5
+# What negotiate_encoding() can return: a cached page is stored once for each
+ENCODINGS = ('br', 'gzip', '') if brotli is not None else ('gzip', '')
+
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript', 'application/xml', 'image/svg+xml')
+PRESERVED = re.compile(r'<(pre|textarea|script|style)\b.*?</\1\s*>', re.IGNORECASE | re.DOTALL)
+LINE_BREAK = re.compile(r'[ \t\r\f\v]*\n\s*')
+
+
+def minify_html(text):
+    """
+    Drop indentation, trailing spaces and blank lines outside of whitespace-sensitive elements.
+    """
+    parts, position = [], 0
+    for match in PRESERVED.finditer(text):
+        parts.append(LINE_BREAK.sub('\n', text[position:match.start()]))
+        parts.append(match.group())
+        position = match.end()
+    parts.append(LINE_BREAK.sub('\n', text[position:]))
+    return ''.join(parts).strip()
+
+
+def accepted_codings(header):
+    codings = set()
+    for item in header.split(','):
+        coding, _, parameters = item.partition(';')
+        quality = parameters.strip().removeprefix('q=')
+        try:
+            if parameters and float(quality) == 0:
+                continue
+        except ValueError:
+            continue
+        codings.add(coding.strip().lower())
+    return codings
+
+
+def negotiate_encoding(request):
+    """
+    Return 'br', 'gzip' or '' for the request.
+
+    Accept-Encoding is replaced with the chosen coding, so cached pages
+    varying on it are stored once per coding instead of once per browser.
+    """
+    codings = accepted_codings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    if brotli is not None and 'br' in codings:
+        encoding = 'br'
+    elif 'gzip' in codings or '*' in codings:
+        encoding = 'gzip'
+    else:
+        encoding = ''
+    request.META['HTTP_ACCEPT_ENCODING'] = encoding
+    return encoding
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return compress_string(data, max_random_bytes=GZipMiddleware.max_random_bytes)
+
+
+class BrotliStream:
+    """
+    Compress a stream chunk by chunk with brotli. Every chunk is flushed, so the
+    client gets the data without waiting for the following chunks.
+    """
+
+    def __init__(self):
+        self.compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def chunk(self, data):
+        return self.compressor.process(data) + self.compressor.flush()
+
+    def finish(self):
+        return self.compressor.finish()
+
+
+def is_compressible(response):
+    content_type = response.get('Content-Type', '')
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def compress_response(request, response):
+    """
+    Minify and compress the response in place for the coding the client accepts.
+    """
+    if response.has_header('Content-Encoding') or response.status_code != 200 or not is_compressible(response):
+        return response
+    # Byte ranges refer to the file as stored, they cannot be served from a compressed body
+    if response.has_header('Accept-Ranges'):
+        return response
+    patch_vary_headers(response, ('Accept-Encoding',))
+    encoding = negotiate_encoding(request)
+    if encoding == 'br' and has_vary_header(response, 'Cookie'):
+        # Browsers accepting br all accept gzip, which can be padded
+        encoding = 'gzip'
+
+    if response.streaming:
+        if not encoding:
+            return response
+        response.streaming_content = compress_stream(response, encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        if response['Content-Type'].startswith('text/html'):
+            response.content = minify_html(response.content.decode(response.charset)).encode(response.charset)
+            response['Content-Length'] = str(len(response.content))
+        if not encoding or len(response.content) < settings.COMPRESS_MIN_BYTES:
+            return response
+        compressed = compress(response.content, encoding)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+
+    # The body differs from the uncompressed one, a strong validator would claim they are equal
+    etag = response.get('ETag')
+    if etag and etag.startswith('"'):
+        response['ETag'] = 'W/' + etag
+    response['Content-Encoding'] = encoding
+    return response
+
+
+def compress_stream(response, encoding):
+    content = response.streaming_content
+    max_random_bytes = GZipMiddleware.max_random_bytes
+    if encoding == 'gzip':
+        if not response.is_async:
+            return compress_sequence(content, max_random_bytes=max_random_bytes)
+
+        async def gzip_chunks():
+            # One gzip member per chunk, like GZipMiddleware: members can be concatenated
+            async for data in content:
+                yield compress_string(data, max_random_bytes=max_random_bytes)
+        return gzip_chunks()
+
+    compressor = BrotliStream()
+    if response.is_async:
+        async def chunks():
+            async for data in content:
+                yield compressor.chunk(data)
+            yield compressor.finish()
+    else:
+        def chunks():
+            for data in content:
+                yield compressor.chunk(data)
+            yield compressor.finish()
+    return chunks()
+
+
+class CompressionMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        negotiate_encoding(request)
+        return compress_response(request, self.get_response(request))
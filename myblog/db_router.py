@@ -0,0 +1,92 @@
+"""
+Primary/replica database routing.
+
+Reads go to one of DATABASE_REPLICAS and writes go to 'default'. Once a request
+writes, the rest of it reads from the primary. After a write in a POST (a comment,
+a post, a registration), ReplicaPinningMiddleware sets a cookie that keeps the
+client on the primary for REPLICA_PIN_SECONDS, so users always see their own writes.
+"""
+import random
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+
+PIN_COOKIE = 'primary_pin'
+
+_state = ContextVar('replica_state', default=None)
+
+
+class PinState:
+    """
+    Routing state of the current request, shared with threads the request runs in.
+    """
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+
+
+def _current_state():
+    state = _state.get()
+    if state is None:
+        state = PinState()
+        _state.set(state)
+    return state
+
+
+class PrimaryReplicaRouter:
+    """
+    Send reads to a random replica unless the current request is pinned to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not settings.DATABASE_REPLICAS or _current_state().pinned:
+            return 'default'
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        state = _current_state()
+        state.pinned = True
+        state.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {'default', *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get the schema through replication
+        return db == 'default'
+
+
+class ReplicaPinningMiddleware:
+    """
+    Keep clients that recently wrote something on the primary database.
+
+    Writes made while handling GET requests (view counters, sessions) do not pin
+    the client, only writes made by unsafe methods do.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _state.set(PinState(pinned=self.is_pinned(request)))
+        try:
+            response = self.get_response(request)
+            state = _state.get()
+            if state.wrote and request.method not in ('GET', 'HEAD', 'OPTIONS', 'TRACE'):
+                seconds = settings.REPLICA_PIN_SECONDS
+                response.set_cookie(PIN_COOKIE, str(int(time.time() + seconds)), max_age=seconds, httponly=True, samesite='Lax')
+        finally:
+            _state.reset(token)
+        return response
+
+    def is_pinned(self, request):
+        try:
+            return float(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
@@ -0,0 +1,266 @@
+"""
+Off-thread logging with rotation.
+
+QueueFileHandler formats records on the calling thread and puts the lines on a
+queue. A single listener thread per process takes them off in batches and
+writes each batch with one write() call through CompressedRotatingFileHandler,
+which rotates by size and time and gzips the rotated files.
+"""
+import gzip
+import logging
+import os
+import queue
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from logging.handlers import QueueHandler
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class CompressedRotatingFileHandler(logging.FileHandler):
+    """
+    File handler rotating by size and time and compressing rotated files.
+
+    Several processes may write the same file: every batch is written under an
+    exclusive lock on '<filename>.lock', and a process that finds the file rotated
+    by another one (different inode) reopens it before writing.
+
+    Arguments:
+        - max_bytes: rotate before the file grows above this size (0 disables)
+        - when_seconds: rotate when the last write was in a previous period of
+          this length (0 disables)
+        - backup_count: number of rotated files to keep
+        - compress: gzip rotated files
+    """
+
+    def __init__(self, filename, max_bytes=0, when_seconds=0, backup_count=5, compress=True, encoding='utf-8'):
+        Path(filename).parent.mkdir(parents=True, exist_ok=True)
+        super().__init__(filename, encoding=encoding, delay=True)
+        self.max_bytes = max_bytes
+        self.when_seconds = when_seconds
+        self.backup_count = backup_count
+        self.compress = compress
+        self.lock_path = self.baseFilename + '.lock'
+
+    def emit(self, record):
+        self.emit_batch([record])
+
+    def emit_batch(self, records):
+        lines = []
+        for record in records:
+            try:
+                lines.append(self.format(record) + self.terminator)
+            except Exception:
+                self.handleError(record)
+        self.write_batch(lines)
+
+    def write_batch(self, lines):
+        """
+        Write already formatted lines with one write() call, rotating first if needed.
+        """
+        if not lines:
+            return
+
+        data = ''.join(lines)
+        rotated = None
+        self.acquire()
+        try:
+            with self.file_lock():
+                self.reopen_if_rotated()
+                if self.should_rotate(len(data.encode(self.encoding or 'utf-8'))):
+                    rotated = self.rotate()
+                if self.stream is None:
+                    self.stream = self._open()
+                self.stream.write(data)
+                self.stream.flush()
+        except Exception:
+            self.handleError(logging.makeLogRecord({'msg': data}))
+        finally:
+            self.release()
+
+        if rotated:
+            self.finish_rotation(rotated)
+
+    @contextmanager
+    def file_lock(self):
+        if fcntl is None:
+            yield
+            return
+        with open(self.lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def reopen_if_rotated(self):
+        if self.stream is None:
+            return
+        try:
+            current = os.stat(self.baseFilename).st_ino
+        except FileNotFoundError:
+            current = None
+        if current != os.fstat(self.stream.fileno()).st_ino:
+            self.stream.close()
+            self.stream = None
+
+    def should_rotate(self, incoming):
+        try:
+            stat = os.stat(self.baseFilename)
+        except FileNotFoundError:
+            return False
+        if not stat.st_size:
+            return False
+        if self.max_bytes and stat.st_size + incoming > self.max_bytes:
+            return True
+        if self.when_seconds and stat.st_mtime // self.when_seconds != time.time() // self.when_seconds:
+            return True
+        return False
+
+    def rotate(self):
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+        rotated = f"{self.baseFilename}.{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}.{os.getpid()}"
+        os.rename(self.baseFilename, rotated)
+        return rotated
+
+    def finish_rotation(self, rotated):
+        """
+        Compress the rotated file and drop the oldest backups, outside the file lock.
+        """
+        if self.compress:
+            with open(rotated, 'rb') as source, gzip.open(rotated + '.gz', 'wb') as target:
+                shutil.copyfileobj(source, target)
+            os.remove(rotated)
+
+        base = Path(self.baseFilename)
+        backups = sorted(
+            (path for path in base.parent.glob(base.name + '.*') if path.suffix != '.lock'),
+            key=lambda path: path.stat().st_mtime,
+        )
+        for path in backups[:max(len(backups) - self.backup_count, 0)]:
+            path.unlink(missing_ok=True)
+
+
+class BatchQueueListener:
+    """
+    Thread taking formatted lines off a queue and writing them to the handler in batches.
+    """
+
+    sentinel = None
+
+    def __init__(self, line_queue, handler, batch_size=500):
+        self.queue = line_queue
+        self.handler = handler
+        self.batch_size = batch_size
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.monitor, name='log-listener', daemon=True)
+        self.thread.start()
+
+    def monitor(self):
+        stop = False
+        while not stop:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            if self.sentinel in batch:
+                stop = True
+                lines = [line for line in batch if line is not self.sentinel]
+            else:
+                lines = batch
+            self.handler.write_batch(lines)
+            for _ in batch:
+                self.queue.task_done()
+
+    def is_alive(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def stop(self):
+        if self.is_alive():
+            self.queue.put(self.sentinel)
+            self.thread.join()
+        self.thread = None
+
+
+class QueueFileHandler(QueueHandler):
+    """
+    Logging handler that never writes on the calling thread.
+
+    Formatted records are queued and written by one BatchQueueListener thread per process.
+    The listener is started on first use and restarted after a fork, so the handler
+    works in pre-forking servers. When the queue is full, records are dropped
+    and counted instead of blocking the request.
+
+    The formatter set on this handler is used by the file handler.
+    """
+
+    def __init__(self, filename, max_bytes=0, when_seconds=0, backup_count=5, compress=True,
+                 batch_size=500, queue_size=10000):
+        super().__init__(queue.Queue(queue_size))
+        self.target = CompressedRotatingFileHandler(
+            filename, max_bytes=max_bytes, when_seconds=when_seconds,
+            backup_count=backup_count, compress=compress,
+        )
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.listener = None
+        self.pid = None
+        self.dropped = 0
+
+    def setFormatter(self, fmt):
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        # Format on the calling thread (a few microseconds) so the listener only does I/O,
+        # which releases the GIL, instead of competing with requests for it
+        try:
+            return self.target.format(record) + self.target.terminator
+        except Exception:
+            self.handleError(record)
+            return None
+
+    def ensure_listener(self):
+        if self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            # Threads do not survive fork(): start a fresh queue and listener in the child
+            self.queue = queue.Queue(self.queue_size)
+            self.listener = BatchQueueListener(self.queue, self.target, self.batch_size)
+            self.listener.start()
+            self.pid = os.getpid()
+
+    def enqueue(self, record):
+        if record is None:
+            return
+        self.ensure_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self):
+        if self.pid == os.getpid() and self.listener.is_alive():
+            self.queue.join()
+
+    def close(self):
+        if self.pid == os.getpid():
+            self.listener.stop()
+            self.pid = None
+        self.target.close()
+        super().close()
@@ -0,0 +1,145 @@
+"""
+Serving of uploaded media under MEDIA_ROOT.
+
+With MEDIA_SENDFILE set, the view only resolves the file and hands the transfer
+to the front proxy: 'x-accel-redirect' for nginx (an internal location at
+MEDIA_ACCEL_PREFIX aliased to MEDIA_ROOT), 'x-sendfile' for Apache or lighttpd.
+
+Otherwise the file is sent from Python with ETag and Last-Modified validators,
+Cache-Control and single byte ranges. The response is a FileResponse over the
+open file, so WSGI servers with wsgi.file_wrapper (gunicorn) send it with sendfile().
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class FileRange:
+    """
+    Part of an open file. Reads stop at its end, and fileno() lets servers sendfile() it
+    from the current offset for Content-Length bytes.
+    """
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """
+    Return (start, end) of a single 'bytes=' range, None to send the whole file
+    (no header, several ranges) or False when the range cannot be satisfied.
+    """
+    match = RANGE.match(header.replace(' ', ''))
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            return False
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def if_range_matches(request, etag, mtime):
+    value = request.headers.get('If-Range')
+    if not value:
+        return True
+    if value.startswith('"') or value.startswith('W/'):
+        return value == etag
+    date = parse_http_date_safe(value)
+    return date is not None and date >= int(mtime)
+
+
+@require_safe
+def serve_media(request, path):
+    """
+    Send a file from MEDIA_ROOT, or hand it to the front proxy when MEDIA_SENDFILE is set.
+    """
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    try:
+        stat = os.stat(full_path)
+    except OSError:
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+
+    if settings.MEDIA_SENDFILE == 'x-accel-redirect':
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_PREFIX + quote(path)
+        return response
+    if settings.MEDIA_SENDFILE == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = full_path
+        return response
+
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if response is None:
+        size = stat.st_size
+        byte_range = None
+        if 'Range' in request.headers and if_range_matches(request, etag, stat.st_mtime):
+            byte_range = parse_range(request.headers['Range'], size)
+
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+        start, end = byte_range or (0, size - 1)
+        length = max(0, end - start + 1)
+        if request.method == 'HEAD':
+            response = HttpResponse(content_type=content_type)
+        else:
+            response = FileResponse(FileRange(open(full_path, 'rb'), start, length), content_type=content_type)
+        response['Content-Length'] = length
+        if byte_range:
+            response.status_code = 206
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        if encoding:
+            response['Content-Encoding'] = encoding
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Accept-Ranges'] = 'bytes'
+    patch_cache_control(response, public=True, max_age=settings.MEDIA_CACHE_SECONDS)
+    return response
@@ -0,0 +1,135 @@
+"""
+Sliding-window rate limiting for POST requests, kept in the cache.
+
+Each rule of a scope in settings.RATELIMITS counts requests per key (client IP,
+logged-in user or submitted username) in fixed windows. The sliding count is
+the current window plus the previous one weighted by how much of it still
+overlaps the sliding window. The counters of the current windows are incremented
+first and the decision is made from the returned counts, so a burst of concurrent
+requests cannot all pass on the same stale count; the previous windows are read
+with a single get_many(). A limited request is answered with 429 before the view
+runs, so no form validation or password hashing happens, and is not counted.
+
+A check costs one cache round trip per rule of the scope plus one: the cache API
+has no atomic increment of several keys, and one get_many()/set_many() would let
+concurrent requests pass on the same count. That is 4 round trips for login and
+its 3 rules, 2 for a single rule. A limited request adds one decr() per rule.
+
+The default cache is per process; use a shared cache (Redis, Memcached) in production.
+"""
+import hashlib
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, JsonResponse
+
+LIMITED_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+MESSAGE = 'Забагато запитів. Спробуйте пізніше.'
+
+
+def client_ip(request):
+    if settings.RATELIMIT_IP_HEADER:
+        forwarded = request.META.get(settings.RATELIMIT_IP_HEADER, '')
+        # The last address was added by our own proxy, the ones before it come from the client
+        address = forwarded.split(',')[-1].strip()
+        if address:
+            return address
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def key_value(request, key):
+    if key == 'ip':
+        return client_ip(request)
+    if key == 'user':
+        return str(request.user.pk) if request.user.is_authenticated else None
+    if key == 'username':
+        return request.POST.get('username', '').strip().lower() or None
+    raise ValueError(f'Unknown rate limit key: {key}')
+
+
+def retry_after(limit, window, elapsed, current, previous):
+    """
+    Seconds until a rule has room for one more request.
+    """
+    if current >= limit:
+        # Wait for the next window, then for the weight of this one to shrink enough
+        seconds = window - elapsed + window * (1 - (limit - 1) / current)
+    else:
+        seconds = window - elapsed - (limit - 1 - current) * window / previous
+    return max(1, math.ceil(seconds))
+
+
+def increment(cache, key, timeout):
+    """
+    Add one to a counter and return the new count, creating it if needed.
+    """
+    try:
+        return cache.incr(key)
+    except ValueError:
+        if cache.add(key, 1, timeout):
+            return 1
+        # Created by a concurrent request meanwhile
+        return cache.incr(key)
+
+
+def check(request, scope):
+    """
+    Count the request against the rules of the scope.
+
+    Returns the number of seconds to wait if a rule is exceeded, otherwise None.
+    A limited request is not counted.
+    """
+    cache = caches[settings.RATELIMIT_CACHE]
+    now = time.time()
+    rules = []
+    for key, limit, window in settings.RATELIMITS.get(scope, ()):
+        value = key_value(request, key)
+        if value is None:
+            continue
+        digest = hashlib.blake2b(value.encode(), digest_size=12).hexdigest()
+        number, elapsed = divmod(now, window)
+        prefix = f'ratelimit:{scope}:{key}:{window}:{digest}'
+        rules.append((limit, window, elapsed, f'{prefix}:{int(number)}', f'{prefix}:{int(number) - 1}'))
+    if not rules:
+        return None
+
+    # Incremented before deciding: concurrent requests each see their own count
+    currents = [increment(cache, rule[3], 2 * rule[1]) for rule in rules]
+    previous_counts = cache.get_many([rule[4] for rule in rules])
+    waits = []
+    for (limit, window, elapsed, current_key, previous_key), current in zip(rules, currents):
+        previous = previous_counts.get(previous_key, 0)
+        if previous * (window - elapsed) / window + current > limit:
+            waits.append(retry_after(limit, window, elapsed, current - 1, previous))
+    if not waits:
+        return None
+    for rule in rules:
+        try:
+            cache.decr(rule[3])
+        except ValueError:
+            pass
+    return max(waits)
+
+
+def ratelimit(scope, json=False):
+    """
+    Answer 429 with Retry-After when a POST to the view exceeds the rules of settings.RATELIMITS[scope].
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if settings.RATELIMIT_ENABLED and request.method in LIMITED_METHODS:
+                wait = check(request, scope)
+                if wait is not None:
+                    if json:
+                        response = JsonResponse({'error': MESSAGE}, status=429)
+                    else:
+                        response = HttpResponse(MESSAGE, status=429, content_type='text/plain; charset=utf-8')
+                    response['Retry-After'] = str(wait)
+                    return response
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -16,7 +16,8 @@ from dotenv import load_dotenv
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
-load_dotenv()
+# An explicit path skips the search for .env up from the caller's directory
+load_dotenv(BASE_DIR / '.env')
 
 # SECURITY WARNING: keep the secret key used in production secret!
 SECRET_KEY =  os.getenv('SECRET_KEY')
@@ -45,6 +46,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'blog.middleware.ProfilingMiddleware',
+    'myblog.db_router.ReplicaPinningMiddleware',
+    'myblog.compression.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -60,13 +64,20 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'blog.context_processors.navigation',
+            ],
+            # Compiled templates are always kept in memory, whatever DEBUG is
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
             ],
         },
     },
@@ -93,6 +104,22 @@ TEST: {
     os.getenv('DB_HOST', 'db'),
 }
 
+# Read replicas, e.g. DB_REPLICA_HOSTS=replica1,replica2 (see myblog/db_router.py)
+DATABASE_REPLICAS = []
+for number, host in enumerate(filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(','))):
+    alias = f'replica_{number}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['myblog.db_router.PrimaryReplicaRouter']
+
+# After a write, the client reads from the primary for this many seconds
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', 10))
+
 
 
 # Password validation
@@ -149,6 +176,17 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media/')
 MEDIA_URL = '/media/'
 CKEDITOR_UPLOAD_PATH = 'uploads/ckeditor/'
+# Compression of Post.content, see blog/fields.py. 'zstd' needs the zstandard package and falls back to zlib
+POST_CONTENT_CODEC = os.getenv('POST_CONTENT_CODEC', 'zlib')
+POST_CONTENT_LEVEL = int(os.getenv('POST_CONTENT_LEVEL', 6))
+# Shorter bodies are stored as is
+POST_CONTENT_COMPRESS_MIN_BYTES = int(os.getenv('POST_CONTENT_COMPRESS_MIN_BYTES', 256))
+# How myblog.media.serve_media sends uploads: '' streams them from Python,
+# 'x-accel-redirect' hands them to nginx and 'x-sendfile' to Apache or lighttpd
+MEDIA_SENDFILE = os.getenv('MEDIA_SENDFILE', '')
+# nginx location marked internal and aliased to MEDIA_ROOT
+MEDIA_ACCEL_PREFIX = os.getenv('MEDIA_ACCEL_PREFIX', '/protected-media/')
+MEDIA_CACHE_SECONDS = int(os.getenv('MEDIA_CACHE_SECONDS', 7 * 24 * 60 * 60))
 
 CKEDITOR_CONFIGS = {
     'default': {
@@ -188,12 +226,92 @@ EMAIL_USE_TLS = True
 EMAIL_HOST_USER = os.environ.get("EMAIL_HOST_USER")
 EMAIL_HOST_PASSWORD = os.environ.get("EMAIL_HOST_PASSWORD")
 DEFAULT_FORM_EMAIL = os.environ.get("EMAIL_HOST_USER")
+DEFAULT_FROM_EMAIL = os.environ.get("EMAIL_HOST_USER", 'webmaster@localhost')
+
+# Digest emails of new comments, sent by the send_comment_digests command (see blog/notifications.py).
+# COMMENT_DIGEST_BATCH authors are loaded at a time, all emails of a run share one SMTP connection
+COMMENT_DIGEST_INTERVAL = int(os.getenv('COMMENT_DIGEST_INTERVAL', 15 * 60))
+COMMENT_DIGEST_BATCH = int(os.getenv('COMMENT_DIGEST_BATCH', 100))
 
 DEFAULT_DOMAIN = 'localhost:8000'
 DEFAULT_PROTOCOL = 'http'
 
+# Page, fragment and rate limit caches. Use a cache shared by all workers in production
+# (e.g. django.core.cache.backends.redis.RedisCache), the default one is per process
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
+# Public pages (index, post_by_category) are cached once for everyone, see blog/cache.py
+PAGE_CACHE_TIMEOUT = int(os.getenv('PAGE_CACHE_TIMEOUT', 60))
+# Header and post card fragments, keyed on the page cache generation and Post.updated_at
+FRAGMENT_CACHE_TIMEOUT = int(os.getenv('FRAGMENT_CACHE_TIMEOUT', 60 * 60))
+
+# Daily views are buffered in memory and written in batches (see blog/analytics.py)
+VIEWS_FLUSH_THRESHOLD = int(os.getenv('VIEWS_FLUSH_THRESHOLD', 100))
+VIEWS_FLUSH_INTERVAL = int(os.getenv('VIEWS_FLUSH_INTERVAL', 10))
+
+# Comments on detail_post are appended in place and polled through blog.views.post_comments
+COMMENTS_PAGE_SIZE = int(os.getenv('COMMENTS_PAGE_SIZE', 100))
+COMMENTS_POLL_SECONDS = int(os.getenv('COMMENTS_POLL_SECONDS', 15))
+# Sliding-window limits of POST requests per scope, see myblog/ratelimit.py.
+# Each rule is (key, requests, window in seconds); keys are 'ip', 'user' and 'username' (the submitted one)
+# A check costs one cache round trip per rule plus one, the price of counting before deciding
+RATELIMIT_ENABLED = os.getenv('RATELIMIT_ENABLED', 'True') == 'True'
+RATELIMIT_CACHE = 'default'
+# Set to e.g. 'HTTP_X_FORWARDED_FOR' behind a reverse proxy
+RATELIMIT_IP_HEADER = os.getenv('RATELIMIT_IP_HEADER', '')
+RATELIMITS = {
+    'login': [('ip', 20, 60), ('ip', 100, 60 * 60), ('username', 5, 5 * 60)],
+    'register': [('ip', 5, 60 * 60)],
+    'password_reset': [('ip', 5, 60 * 60)],
+    'comment': [('user', 10, 60), ('ip', 30, 60)],
+}
+
+# Related posts shown on detail_post, built by the build_related_posts command (see blog/related.py)
+RELATED_POSTS_COUNT = int(os.getenv('RELATED_POSTS_COUNT', 5))
+RELATED_POSTS_PATH = Path(os.getenv('RELATED_POSTS_PATH', BASE_DIR / 'var' / 'related_posts.npz'))
+
+# Responses shorter than this are not compressed by myblog/compression.py
+COMPRESS_MIN_BYTES = int(os.getenv('COMPRESS_MIN_BYTES', 512))
+
+# Comments of a deleted post are deleted this many at a time; posts with more comments
+# than POST_DELETE_BACKGROUND_COMMENTS are deleted in a background thread (see blog/deletion.py)
+POST_DELETE_CHUNK = int(os.getenv('POST_DELETE_CHUNK', 5000))
+POST_DELETE_BACKGROUND_COMMENTS = int(os.getenv('POST_DELETE_BACKGROUND_COMMENTS', 20000))
+
+# Title suggestions of blog.views.post_autocomplete, reloaded from the database after AUTOCOMPLETE_MAX_AGE
+# seconds in case a change made in another process was missed (see blog/autocomplete.py)
+AUTOCOMPLETE_LIMIT = int(os.getenv('AUTOCOMPLETE_LIMIT', 8))
+AUTOCOMPLETE_MAX_AGE = int(os.getenv('AUTOCOMPLETE_MAX_AGE', 300))
+
+# Page sizes of the JSON API in blog/api.py
+API_PAGE_SIZE = int(os.getenv('API_PAGE_SIZE', 20))
+API_MAX_PAGE_SIZE = int(os.getenv('API_MAX_PAGE_SIZE', 200))
+# Server-Sent Events for detail_post served by myblog/asgi.py, see blog/events.py, and the
+# cache invalidation messages of blog/invalidation.py. 'postgres' fans events out to every
+# process with LISTEN/NOTIFY, 'local' stays in the process, as in myblog/test_settings.py.
+LIVE_EVENTS_BACKEND = os.getenv('LIVE_EVENTS_BACKEND', 'postgres')
+LIVE_EVENTS_PREFIX = '/events/'
+LIVE_EVENTS_KEEPALIVE = int(os.getenv('LIVE_EVENTS_KEEPALIVE', 15))
+
 LOGGING_DIR = BASE_DIR / 'logs'
-LOGGING_DIR.mkdir(exist_ok=True)
+
+# Share of requests measured by blog.middleware.ProfilingMiddleware (0 disables it)
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', 0))
+PROFILING_LOG_FILE = LOGGING_DIR / 'profiling.jsonl'
+# Keep cProfile dumps of the slowest N sampled requests (0 disables cProfile)
+PROFILING_CPROFILE_TOP = int(os.getenv('PROFILING_CPROFILE_TOP', 0))
+PROFILING_CPROFILE_DIR = LOGGING_DIR / 'profiles'
+
+# Log files are written off the request thread and rotated by size and time (see myblog/log_handlers.py)
+LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024))
+LOG_ROTATE_SECONDS = int(os.getenv('LOG_ROTATE_SECONDS', 24 * 60 * 60))
+LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', 14))
+
 LOGGING = {
     'version':1,
     'disable_existing_loggers':False,
@@ -202,20 +320,41 @@ LOGGING = {
             'format': '%(levelname)s %(asctime)s %(message)s',
             'style': '%',
         },
+        'json_lines':{
+            'format': '%(message)s',
+            'style': '%',
+        },
     },
     'handlers':{
         'file':{
-            'class':'logging.FileHandler',
+            'class':'myblog.log_handlers.QueueFileHandler',
             'filename':LOGGING_DIR / 'logs.log',
+            'max_bytes':LOG_MAX_BYTES,
+            'when_seconds':LOG_ROTATE_SECONDS,
+            'backup_count':LOG_BACKUP_COUNT,
             'level':'INFO',
             'formatter':'verbose',
-        }
+        },
+        'profiling':{
+            'class':'myblog.log_handlers.QueueFileHandler',
+            'filename':PROFILING_LOG_FILE,
+            'max_bytes':LOG_MAX_BYTES,
+            'when_seconds':LOG_ROTATE_SECONDS,
+            'backup_count':LOG_BACKUP_COUNT,
+            'level':'INFO',
+            'formatter':'json_lines',
+        },
     },
     'loggers':{
         'django':{
             'level':'INFO',
             'handlers':['file'],
             'propagate':False,
-        }
+        },
+        'blog.profiling':{
+            'level':'INFO',
+            'handlers':['profiling'],
+            'propagate':False,
+        },
     },
 }
\ No newline at end of file
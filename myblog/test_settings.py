@@ -0,0 +1,12 @@
+"""
+Settings for the test suite: python manage.py test --settings=myblog.test_settings
+"""
+from .settings import *  # noqa: F401,F403
+
+# A replica alias sharing the test database, so the router can be tested with two
+# databases (blog/test/test_db_router.py). Reads are routed to it only where a test
+# sets DATABASE_REPLICAS.
+DATABASES['replica'] = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+
+# A listening connection would keep the test database from being dropped
+LIVE_EVENTS_BACKEND = 'local'
@@ -0,0 +1,58 @@
+// Search-as-you-type in the page header, suggestions come from blog.views.post_autocomplete.
+// Requests wait for a short pause in typing and answers to older queries are ignored.
+(function () {
+    var input = document.getElementById('search');
+    var results = document.getElementById('search-results');
+    if (!input || !results) {
+        return;
+    }
+
+    var timer = null;
+    var latest = '';
+
+    function show(items) {
+        results.replaceChildren();
+        items.forEach(function (item) {
+            var link = document.createElement('a');
+            link.href = item.url;
+            link.textContent = item.title;
+            var entry = document.createElement('li');
+            entry.append(link);
+            results.append(entry);
+        });
+        results.hidden = items.length === 0;
+    }
+
+    function suggest() {
+        var query = input.value.trim();
+        latest = query;
+        if (!query) {
+            show([]);
+            return;
+        }
+        fetch(input.dataset.url + '?q=' + encodeURIComponent(query))
+            .then(function (response) { return response.json(); })
+            .then(function (data) {
+                if (query === latest) {
+                    show(data.results);
+                }
+            });
+    }
+
+    input.addEventListener('input', function () {
+        clearTimeout(timer);
+        timer = setTimeout(suggest, 120);
+    });
+    input.addEventListener('keydown', function (event) {
+        if (event.key === 'Enter' && results.firstChild) {
+            window.location = results.firstChild.firstChild.href;
+        } else if (event.key === 'Escape') {
+            show([]);
+        }
+    });
+    document.addEventListener('click', function (event) {
+        if (!results.contains(event.target) && event.target !== input) {
+            results.hidden = true;
+        }
+    });
+})();
@@ -0,0 +1,111 @@
+// Posts comments through blog.views.post_comments and appends new ones in place.
+// New comments and view counts arrive over the live events stream (myblog/asgi.py);
+// while it is not connected the page polls for comments newer than the last one shown.
+(function () {
+    var list = document.getElementById('comments');
+    var form = document.getElementById('comment-form');
+    if (!list) {
+        return;
+    }
+
+    var lastId = parseInt(list.dataset.lastId, 10) || 0;
+    var pollMilliseconds = (parseInt(list.dataset.pollSeconds, 10) || 15) * 1000;
+    var polling = false;
+    var streaming = false;
+
+    function paragraph(className, children) {
+        var element = document.createElement('p');
+        element.className = className;
+        children.forEach(function (child) { element.append(child); });
+        return element;
+    }
+
+    function append(comments) {
+        comments.forEach(function (comment) {
+            if (comment.id <= lastId) {
+                return;
+            }
+            var user = document.createElement('span');
+            user.className = 'comment_user';
+            user.textContent = comment.user;
+            var time = document.createElement('time');
+            time.dateTime = comment.created_at;
+            time.textContent = new Date(comment.created_at).toLocaleString();
+
+            var item = document.createElement('li');
+            item.className = 'comment';
+            item.dataset.id = comment.id;
+            item.append(paragraph('comment_meta', [user, ' - ', time]), paragraph('comment_text', [comment.comment]));
+            list.appendChild(item);
+            lastId = comment.id;
+        });
+    }
+
+    function fetchNew() {
+        return fetch(list.dataset.url + '?after=' + lastId, {credentials: 'same-origin'})
+            .then(function (response) { return response.ok ? response.json() : {comments: []}; })
+            .then(function (data) { append(data.comments); });
+    }
+
+    function poll() {
+        if (polling || streaming || document.hidden) {
+            return;
+        }
+        polling = true;
+        fetchNew()
+            .catch(function () {})
+            .then(function () { polling = false; });
+    }
+
+    setInterval(poll, pollMilliseconds);
+
+    if (window.EventSource && list.dataset.eventsUrl) {
+        var source = new EventSource(list.dataset.eventsUrl);
+        source.addEventListener('open', function () {
+            streaming = true;
+            // Catch up with comments posted while the stream was not connected
+            fetchNew().catch(function () {});
+        });
+        source.addEventListener('error', function () {
+            streaming = source.readyState === EventSource.OPEN;
+        });
+        source.addEventListener('comment', function (event) {
+            var data = JSON.parse(event.data);
+            if (data.comment === undefined) {
+                // Long comments are announced by id only
+                fetchNew().catch(function () {});
+            } else {
+                append([data]);
+            }
+        });
+        source.addEventListener('views', function (event) {
+            var views = document.getElementById('post-views');
+            if (views) {
+                views.textContent = JSON.parse(event.data).views;
+            }
+        });
+    }
+    document.addEventListener('visibilitychange', poll);
+
+    if (form) {
+        form.addEventListener('submit', function (event) {
+            event.preventDefault();
+            fetch(list.dataset.url, {method: 'POST', body: new FormData(form), credentials: 'same-origin'})
+                .then(function (response) { return response.json().then(function (data) { return [response.ok, data]; }); })
+                .then(function (result) {
+                    if (result[0]) {
+                        form.reset();
+                        // Also picks up comments posted by others since the last poll, keeping the list ordered
+                        return fetchNew().catch(function () { append(result[1].comments); });
+                    } else if (result[1].error) {
+                        alert(result[1].error);
+                    } else if (result[1].errors) {
+                        alert(Object.values(result[1].errors).map(function (errors) {
+                            return errors.map(function (error) { return error.message; }).join(' ');
+                        }).join('\n'));
+                    }
+                })
+                .catch(function () { form.submit(); });
+        });
+    }
+})();
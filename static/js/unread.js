@@ -0,0 +1,25 @@
+// Unread markers of the post listings, read ids come from blog.views.read_posts.
+// The listings are cached for everyone, so the markers of the current user are added here.
+(function () {
+    var list = document.querySelector('[data-read-url]');
+    if (!list) {
+        return;
+    }
+    var cards = list.querySelectorAll('[data-post-id]');
+    if (!cards.length) {
+        return;
+    }
+    var ids = Array.prototype.map.call(cards, function (card) { return card.dataset.postId; });
+
+    fetch(list.dataset.readUrl + '?ids=' + ids.join(','), {credentials: 'same-origin'})
+        .then(function (response) { return response.json(); })
+        .then(function (data) {
+            if (data.read === null) {
+                return;
+            }
+            var read = new Set(data.read.map(String));
+            cards.forEach(function (card) {
+                card.classList.toggle('unread', !read.has(card.dataset.postId));
+            });
+        });
+})();